@@ -46,6 +46,7 @@ def main() -> None:
 		# Log the state of each agent at the end of the tournament:
 		exp_dir = os.path.join("../LOGS", experiment_name)
 		log_tournament(experiment_dir=exp_dir, tournament=tournament)
+		tournament.close()
 		# Print winners
 		print("Winners are:")
 		for winner in winners:
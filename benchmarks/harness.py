@@ -0,0 +1,163 @@
+import json
+import os
+import platform
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+
+def percentile(samples: Sequence[float], q: float) -> Optional[float]:
+	"""
+	Compute a percentile of samples, interpolating linearly between the closest ranks.
+
+	Args:
+		samples (Sequence[float]): The samples.
+		q (float): The percentile, between 0 and 100.
+
+	Returns:
+		Optional[float]: The percentile, or None if there are no samples.
+	"""
+	if not samples:
+		return None
+	ordered = sorted(samples)
+	position = (len(ordered) - 1) * q / 100
+	lower = int(position)
+	upper = min(lower + 1, len(ordered) - 1)
+	return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, Optional[float]]:
+	"""
+	Summarize latency samples.
+
+	Args:
+		samples (Sequence[float]): The samples, in seconds.
+
+	Returns:
+		Dict[str, Optional[float]]: The number of samples, their total, mean, minimum, maximum and 50th, 90th and
+			99th percentiles.
+	"""
+	return {
+		"count": len(samples),
+		"total": sum(samples),
+		"mean": sum(samples) / len(samples) if samples else None,
+		"min": min(samples) if samples else None,
+		"max": max(samples) if samples else None,
+		"p50": percentile(samples, 50),
+		"p90": percentile(samples, 90),
+		"p99": percentile(samples, 99),
+	}
+
+
+class BenchmarkResults:
+	"""
+	Collects the latency samples of a benchmark run and writes them as JSON.
+
+	Attributes:
+		samples (Dict[str, List[float]]): Latency samples in seconds, by benchmark name.
+		counters (Dict[str, Any]): Other measurements, e.g. throughput, by name.
+	"""
+
+	def __init__(self):
+		"""
+		Initialize empty results.
+		"""
+		self.samples: Dict[str, List[float]] = {}
+		self.counters: Dict[str, Any] = {}
+
+	def add(self, name: str, seconds: float) -> None:
+		"""
+		Add a latency sample.
+
+		Args:
+			name (str): The benchmark name, e.g. "solver_load.cold".
+			seconds (float): The latency.
+		"""
+		self.samples.setdefault(name, []).append(seconds)
+
+	@contextmanager
+	def timer(self, name: str) -> Iterator[None]:
+		"""
+		Time a block and add its latency as a sample.
+
+		Args:
+			name (str): The benchmark name.
+		"""
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.add(name, time.perf_counter() - start)
+
+	def repeat(self, name: str, function: Callable[[], Any], repeat: int) -> List[Any]:
+		"""
+		Time a function several times.
+
+		Args:
+			name (str): The benchmark name.
+			function (Callable[[], Any]): The function to time.
+			repeat (int): How many times to call it.
+
+		Returns:
+			List[Any]: The function's return values.
+		"""
+		values = []
+		for _ in range(repeat):
+			with self.timer(name):
+				values.append(function())
+		return values
+
+	def to_dict(self, parameters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+		"""
+		Render the results, with percentiles, together with the environment they were measured in.
+
+		Args:
+			parameters (Optional[Dict[str, Any]]): The parameters of the run.
+
+		Returns:
+			Dict[str, Any]: The results.
+		"""
+		return {
+			"timestamp": datetime.now().isoformat(timespec="seconds"),
+			"commit": git_commit(),
+			"python": platform.python_version(),
+			"platform": platform.platform(),
+			"parameters": parameters or {},
+			"latency_seconds": {name: summarize(samples) for name, samples in self.samples.items()},
+			"counters": self.counters,
+		}
+
+	def write(self, path: str, parameters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+		"""
+		Write the results as JSON.
+
+		Args:
+			path (str): The output file.
+			parameters (Optional[Dict[str, Any]]): The parameters of the run.
+
+		Returns:
+			Dict[str, Any]: The results written.
+		"""
+		directory = os.path.dirname(path)
+		if directory and not os.path.exists(directory):
+			os.makedirs(directory)
+		results = self.to_dict(parameters)
+		with open(path, "w") as file:
+			json.dump(results, file, indent=2)
+		return results
+
+
+def git_commit() -> Optional[str]:
+	"""
+	Get the commit the benchmarks run on, so that results can be compared across changes.
+
+	Returns:
+		Optional[str]: The commit hash, or None outside a git checkout.
+	"""
+	try:
+		return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+							  check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
@@ -0,0 +1,254 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+from benchmarks.harness import BenchmarkResults
+from llms.fake_llm import FakeLLM
+from src.agent import Agent
+from src.agent_store import expand_json_paths
+from src.metrics import Metrics
+from src.program_cache import ProgramCache
+from src.prolog_pool import PrologServerPool
+from src.solver import Solver
+from src.tournament import Tournament
+from src.utils import read_file
+from src.validator import Validator
+
+'''
+Offline benchmarks of the tournament pipeline. Agents are loaded from the recorded agents of experiment 2, and
+autoformalization is answered by a fake language model replaying their game rules, so no API is called. Run from the
+repository root:
+
+	python -m benchmarks.run_benchmarks --sizes 5 20 50 --out LOGS/benchmarks/results.json
+
+With --metrics, the latency of every solver query by kind and of every LLM call is also written, in the Prometheus
+text format, next to the results.
+
+Results hold the 50th, 90th and 99th percentile latencies of every measurement, tagged with the commit they were
+measured on, so that runs before and after a change can be compared.
+'''
+
+AGENTS_PATH = "DATA/AGENTS/EXPERIMENT_2"
+SOLVER_PATH = "src/solver.pl"
+STRATEGY_PATH = "DATA/STRATEGIES/tit-for-tat.pl"
+CLONE_STRATEGY_PATH = "DATA/STRATEGIES/anti-tit-for-tat.pl"
+MATRICES_PATH = "DATA/MISC/matrices.json"
+PAYOFFS_PATH = "DATA/MISC/payoff_sums_adjusted.csv"
+VALIDATORS_PATH = "DATA/EVAL"
+
+
+def load_recorded_agents(agents_path: str) -> List[Dict[str, Any]]:
+	"""
+	Load the recorded agents, one per game.
+
+	Args:
+		agents_path (str): Directory of per-game directories of agent JSON files.
+
+	Returns:
+		List[Dict[str, Any]]: The agents' JSON contents, with the path of their file under "path".
+	"""
+	records = []
+	for json_path in expand_json_paths([agents_path]):
+		with open(json_path, "r") as file:
+			records.append({**json.load(file), "path": json_path})
+	return records
+
+
+def bench_solver_load(results: BenchmarkResults, records: List[Dict[str, Any]], repeat: int) -> None:
+	"""
+	Time loading the solver of every recorded agent, validating the program (cold) or reusing the program
+	cache (warm).
+	"""
+	solver_string = read_file(SOLVER_PATH)
+	strategy = read_file(STRATEGY_PATH)
+	warm_cache = ProgramCache()
+	for record in records:
+		for _ in range(repeat):
+			for name, cache in (("solver_load.cold", ProgramCache()), ("solver_load.warm", warm_cache)):
+				with results.timer(name):
+					solver = Solver(solver_string, record["game_rules"], strategy, cache=cache)
+				solver.close()
+
+
+def bench_agent_creation(results: BenchmarkResults, records: List[Dict[str, Any]], repeat: int) -> None:
+	"""
+	Time creating agents from their JSON files, and by autoformalizing their game rules with a fake model.
+	"""
+	for record in records:
+		for _ in range(repeat):
+			with results.timer("agent_creation.json"):
+				agent = Agent(agent_json=record["path"], solver_path=SOLVER_PATH, llm=FakeLLM())
+			agent.close()
+
+			llm = FakeLLM(f"@{record['game_rules']}@", save_history=True)
+			with results.timer("agent_creation.autoformalized"):
+				agent = Agent(game_string="A recorded game.", strategy_path=STRATEGY_PATH, solver_path=SOLVER_PATH,
+							  llm=llm)
+			agent.close()
+
+
+def bench_rounds(results: BenchmarkResults, records: List[Dict[str, Any]], num_rounds: int) -> None:
+	"""
+	Time every round of a match between each recorded agent and its anti-tit-for-tat clone, played in Python.
+	"""
+	for record in records:
+		agent = Agent(agent_json=record["path"], solver_path=SOLVER_PATH, llm=FakeLLM())
+		clone = Agent(strategy_path=CLONE_STRATEGY_PATH, game_rules=agent.game.game_rules, solver_path=SOLVER_PATH,
+					  llm=FakeLLM())
+		agent.reset_for_match()
+		clone.reset_for_match()
+		for _ in range(num_rounds):
+			with results.timer("round"):
+				move_agent, move_clone = agent.play(), clone.play()
+				valid = (move_agent and move_clone and agent.update_payoff(move_clone)
+						 and clone.update_payoff(move_agent))
+			if not valid:
+				results.counters["round_failures"] = results.counters.get("round_failures", 0) + 1
+				break
+		agent.close()
+		clone.close()
+
+
+def bench_round_robin(results: BenchmarkResults, agents_path: str, sizes: List[int], num_rounds: int,
+					  repeat: int) -> None:
+	"""
+	Time creating and playing round-robin tournaments of N copies of a recorded agent, for every size N.
+	"""
+	game_dir = os.path.join(agents_path, sorted(os.listdir(agents_path))[0])
+	for size in sizes:
+		for _ in range(repeat):
+			tournament = Tournament(num_agents=size, num_rounds=num_rounds, solver_path=SOLVER_PATH,
+									jsons_path=game_dir, use_default_strategy=True, clones=False,
+									llm_factory=FakeLLM)
+			with results.timer(f"round_robin.create_agents.n{size}"):
+				tournament.create_agents()
+			with results.timer(f"round_robin.play.n{size}"):
+				tournament.play_tournament()
+
+			num_agents = len(tournament.agents)
+			num_matches = num_agents * (num_agents + 1) // 2
+			play_seconds = results.samples[f"round_robin.play.n{size}"][-1]
+			results.counters[f"round_robin.matches.n{size}"] = num_matches
+			results.counters.setdefault(f"round_robin.matches_per_second.n{size}", []).append(
+				num_matches / play_seconds if play_seconds else None)
+			tournament.close()
+
+
+def bench_parallel_leases(results: BenchmarkResults, agents_path: str, num_rounds: int) -> None:
+	"""
+	Check that a parallel tournament in which a worker plays more matches than its Prolog server has leases for two
+	agents per match completes without disqualifications, and time it.
+
+	Raises:
+		RuntimeError: If a pair was disqualified, e.g. because a worker ran out of leases.
+	"""
+	game_dir = os.path.join(agents_path, sorted(os.listdir(agents_path))[0])
+	parallelism = 2
+	leases_per_server = PrologServerPool().leases_per_server
+	# Every worker's server lends two leases per match, and the busiest worker plays at least half the pairs
+	size = 1
+	while size * (size + 1) // 2 <= parallelism * leases_per_server // 2:
+		size += 1
+
+	tournament = Tournament(num_agents=size, num_rounds=num_rounds, solver_path=SOLVER_PATH, jsons_path=game_dir,
+							use_default_strategy=True, clones=False, parallelism=parallelism, llm_factory=FakeLLM)
+	tournament.create_agents()
+	with results.timer(f"parallel_leases.play.n{size}"):
+		tournament.play_tournament()
+
+	disqualified = [agent.name for agent in tournament.agents if getattr(agent, "state", None) == 'disqualified']
+	results.counters["parallel_leases.matches"] = size * (size + 1) // 2
+	results.counters["parallel_leases.disqualified"] = len(disqualified)
+	tournament.close()
+	if disqualified:
+		raise RuntimeError(f"Agents disqualified in the parallel tournament: {', '.join(disqualified)}")
+
+
+def bench_validation(results: BenchmarkResults, records: List[Dict[str, Any]], repeat: int) -> None:
+	"""
+	Time validating the recorded agents, logged as if they had played the first game of their type.
+	"""
+	with open(MATRICES_PATH, "r") as file:
+		game_files = sorted(json.load(file))
+
+	agents_dir = tempfile.mkdtemp(prefix="validation_benchmark_")
+	try:
+		for record in records:
+			game_type = os.path.basename(os.path.dirname(record["path"])).lower()
+			# The validator identifies the game by the first three parts of the tournament directory's name
+			game_file = next((name for name in game_files
+							  if name.startswith(f"{game_type}_") and len(name[:-4].split("_")) == 3), None)
+			if game_file is None:
+				continue
+			tournament_dir = os.path.join(agents_dir, f"{game_file[:-4]}_{datetime.now():%Y%m%d_%H%M%S}")
+			os.makedirs(tournament_dir, exist_ok=True)
+			shutil.copy(record["path"], tournament_dir)
+
+		for _ in range(repeat):
+			validator = Validator(agents_dir, MATRICES_PATH, PAYOFFS_PATH, VALIDATORS_PATH)
+			# The validator's defaults are relative to a subdirectory of the repository
+			validator.solver_path = SOLVER_PATH
+			validator.strategy = STRATEGY_PATH
+			validator.general_agent_file = "DATA/MISC/general_agent.pl"
+			with results.timer("validation.validate_all"):
+				frame = validator.validate_all(progress=False)
+			results.counters["validation.agents"] = len(frame)
+	finally:
+		shutil.rmtree(agents_dir, ignore_errors=True)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Offline benchmarks of agent creation, play and validation.")
+	parser.add_argument("--agents", default=AGENTS_PATH, help="Directory of recorded agents.")
+	parser.add_argument("--sizes", type=int, nargs="+", default=[5, 20, 50], help="Round-robin tournament sizes.")
+	parser.add_argument("--rounds", type=int, default=10, help="Rounds per match.")
+	parser.add_argument("--repeat", type=int, default=3, help="Repetitions of every measurement.")
+	parser.add_argument("--only", nargs="+", default=None,
+						choices=["solver_load", "agent_creation", "rounds", "round_robin", "parallel_leases",
+								 "validation"],
+						help="Benchmarks to run (default is all).")
+	parser.add_argument("--out", default=os.path.join("LOGS", "benchmarks", f"{datetime.now():%Y%m%d_%H%M%S}.json"),
+						help="Output JSON file.")
+	parser.add_argument("--metrics", action="store_true",
+						help="Record solver query and LLM call metrics and write them next to the results.")
+	args = parser.parse_args()
+	if args.metrics:
+		Metrics.get_metrics().enable()
+
+	records = load_recorded_agents(args.agents)
+	results = BenchmarkResults()
+	benchmarks = {
+		"solver_load": lambda: bench_solver_load(results, records, args.repeat),
+		"agent_creation": lambda: bench_agent_creation(results, records, args.repeat),
+		"rounds": lambda: bench_rounds(results, records, args.rounds),
+		"round_robin": lambda: bench_round_robin(results, args.agents, args.sizes, args.rounds, args.repeat),
+		"parallel_leases": lambda: bench_parallel_leases(results, args.agents, args.rounds),
+		"validation": lambda: bench_validation(results, records, args.repeat),
+	}
+
+	for name, benchmark in benchmarks.items():
+		if args.only and name not in args.only:
+			continue
+		print(f"Running {name}...")
+		start = time.perf_counter()
+		benchmark()
+		print(f"Finished {name} in {time.perf_counter() - start:.2f}s")
+
+	written = results.write(args.out, parameters=vars(args))
+	for name, summary in written["latency_seconds"].items():
+		print(f"{name}: n={summary['count']} p50={summary['p50']:.4f}s p90={summary['p90']:.4f}s "
+			  f"p99={summary['p99']:.4f}s")
+	print(f"Results written to {args.out}")
+	if args.metrics:
+		metrics_path = f"{os.path.splitext(args.out)[0]}.prom"
+		Metrics.get_metrics().write_prometheus(metrics_path)
+		print(f"Metrics written to {metrics_path}")
+
+
+if __name__ == "__main__":
+	main()
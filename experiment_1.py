@@ -1,4 +1,7 @@
 import configparser
+import itertools
+from llms.cached_llm import CachedLLM, LLMResponseStore
+from llms.gpt4 import GPT4
 from src.tournament import Tournament
 from src.utils import read_file, log_tournament
 import logging
@@ -31,6 +34,12 @@ def main():
 	num_agents = config.getint("Params", "num_agents")
 	num_rounds = config.getint("Params", "num_rounds")
 	max_attempts = config.getint("Params", "max_attempts")
+	llm_cache_path = config.get("Paths", "LLM_CACHE_PATH", fallback=None)
+	llm_replay_only = config.getboolean("Params", "llm_replay_only", fallback=False)
+	log_format = config.get("Params", "log_format", fallback="json")
+
+	# Memoize LLM responses so that re-running the experiment needs no API calls
+	llm_store = LLMResponseStore(os.path.normpath(llm_cache_path)) if llm_cache_path else None
 
 	# Step 3: Load game descriptions
 	games_payoffs = pd.read_csv("DATA/MISC/payoff_sums_adjusted.csv")
@@ -41,22 +50,33 @@ def main():
 		game_desc_file = row["Game File"]
 		game_desc = read_file(os.path.join(GAME_DIR, game_desc_file))
 		target_payoffs = [row["Row Player Payoff Sum"]]*num_agents
+		llm_factory = None
+		if llm_store:
+			# Agents are created in order, so the n-th model of every tournament replays the n-th agent's sample
+			sample_ids = itertools.count()
+			llm_factory = lambda: CachedLLM(GPT4(save_history=True), llm_store, replay_only=llm_replay_only,
+											sample_id=next(sample_ids))
 		# Create and play tournament
 		tournament = Tournament(game_desc, target_payoffs=target_payoffs, num_agents=num_agents,
 								max_attempts=max_attempts, num_rounds=num_rounds, solver_path=solver_path,
 								prompt_path=template_path, feedback_prompt_path=feedback_template_path,
-								use_default_strategy=True, clones=True)
+								use_default_strategy=True, clones=True, llm_factory=llm_factory)
 		tournament.create_agents()
 		tournament.play_tournament()
 		winners = tournament.get_winners()
 
 		exp_dir = os.path.join("LOGS", experiment_name)
-		log_tournament(experiment_dir=exp_dir, tournament=tournament, tournament_name=game_desc_file[:-4])
+		log_tournament(experiment_dir=exp_dir, tournament=tournament, tournament_name=game_desc_file[:-4],
+					   log_format=log_format)
+		tournament.close()
 		# Print winners
 		print("Winners are:")
 		for winner in winners:
 			print(f"Agent {winner.name} with strategy {winner.strategy_name} and payoff {winner.get_total_payoff()}")
 
+	if llm_store:
+		logging.debug(f"LLM cache: {llm_store.metrics()}")
+
 
 if __name__ == "__main__":
 	main()
@@ -44,6 +44,7 @@ def main():
 		exp_dir = os.path.join("LOGS", experiment_name)
 		agent_name = agent
 		log_tournament(experiment_dir=exp_dir, tournament=tournament, tournament_name=agent_name)
+		tournament.close()
 		# Print winners
 		print("Winners are:")
 		for winner in winners:
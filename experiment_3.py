@@ -42,6 +42,7 @@ def main():
 
 	exp_dir = os.path.join("LOGS", experiment_name)
 	log_tournament(experiment_dir=exp_dir, tournament=tournament, tournament_name="strategies")
+	tournament.close()
 	# Print winners
 	print("Winners are:")
 	for winner in winners:
@@ -0,0 +1,321 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from src.base_llm import BaseLLM
+from src.metrics import Metrics
+from src.setup_logger import logger
+from typing import Dict, List, Optional, Union
+
+
+class LLMResponseStore:
+	"""
+	A SQLite-backed store of language model responses, shared by all `CachedLLM` wrappers of an experiment.
+
+	Attributes:
+		path (str): Path of the SQLite database.
+		ttl_seconds (Optional[float]): Age after which a response is no longer used (None keeps responses forever).
+		max_entries (Optional[int]): Maximum number of responses kept; least recently used ones are evicted.
+	"""
+
+	def __init__(self, path: str = "LOGS/llm_cache.sqlite", ttl_seconds: Optional[float] = None,
+				 max_entries: Optional[int] = None):
+		"""
+		Open (or create) the store.
+
+		Args:
+			path (str): Path of the SQLite database (default is "LOGS/llm_cache.sqlite").
+			ttl_seconds (Optional[float]): Age after which a response expires (default is None, i.e. never).
+			max_entries (Optional[int]): Maximum number of responses kept (default is None, i.e. unbounded).
+		"""
+		self.path = path
+		self.ttl_seconds = ttl_seconds
+		self.max_entries = max_entries
+		directory = os.path.dirname(path)
+		if directory and not os.path.exists(directory):
+			os.makedirs(directory)
+
+		self._lock = threading.Lock()
+		self._connection = sqlite3.connect(path, check_same_thread=False)
+		self._connection.execute(
+			"CREATE TABLE IF NOT EXISTS responses ("
+			"key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL, accessed REAL)")
+		self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+		self._connection.commit()
+
+		# Metrics
+		self.hits = 0
+		self.misses = 0
+		self.stores = 0
+		self.evictions = 0
+
+	@staticmethod
+	def key_for(model: str, temperature: Optional[float], messages: List[Dict[str, str]], max_tokens: int,
+				sample_id: Optional[Union[int, str]] = None) -> str:
+		"""
+		Compute the key of a request.
+
+		Args:
+			model (str): The model name.
+			temperature (Optional[float]): The sampling temperature.
+			messages (List[Dict[str, str]]): The full message list sent to the model.
+			max_tokens (int): Maximum number of tokens to generate.
+			sample_id (Optional[Union[int, str]]): Distinguishes independent samples of the same request
+				(default is None).
+
+		Returns:
+			str: The hexadecimal SHA-256 digest of the request.
+		"""
+		request = {"model": model, "temperature": temperature, "messages": messages, "max_tokens": max_tokens}
+		if sample_id is not None:
+			request["sample"] = sample_id
+		return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+	def get(self, key: str) -> Optional[str]:
+		"""
+		Look up a response.
+
+		Args:
+			key (str): The request key.
+
+		Returns:
+			Optional[str]: The stored response, or None if there is none or it has expired.
+		"""
+		now = time.time()
+		with self._lock:
+			row = self._connection.execute("SELECT response, created FROM responses WHERE key = ?",
+										   (key,)).fetchone()
+			if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+				self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+				self._connection.commit()
+				self.evictions += 1
+				row = None
+			if row is None:
+				self.misses += 1
+				return None
+			self._connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+			self._connection.commit()
+			self.hits += 1
+			return row[0]
+
+	def put(self, key: str, model: str, response: str) -> None:
+		"""
+		Store a response, evicting the least recently used ones if the store is full.
+
+		Args:
+			key (str): The request key.
+			model (str): The model name.
+			response (str): The response.
+		"""
+		now = time.time()
+		with self._lock:
+			self._connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+									 (key, model, response, now, now))
+			self.stores += 1
+			if self.max_entries is not None:
+				cursor = self._connection.execute(
+					"DELETE FROM responses WHERE key IN "
+					"(SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+				self.evictions += max(cursor.rowcount, 0)
+			self._connection.commit()
+
+	def clear(self) -> None:
+		"""
+		Remove all responses.
+		"""
+		with self._lock:
+			self._connection.execute("DELETE FROM responses")
+			self._connection.commit()
+
+	def metrics(self) -> Dict[str, int]:
+		"""
+		Get the store's size and hit/miss counters.
+
+		Returns:
+			Dict[str, int]: Store metrics.
+		"""
+		with self._lock:
+			entries = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+			return {"entries": entries, "hits": self.hits, "misses": self.misses, "stores": self.stores,
+					"evictions": self.evictions}
+
+	def close(self) -> None:
+		"""
+		Close the database connection.
+		"""
+		with self._lock:
+			self._connection.close()
+
+
+class CachedLLM(BaseLLM):
+	"""
+	Wraps a language model and memoizes its responses in an `LLMResponseStore`.
+
+	Requests are keyed on the model, temperature, full message list, max_tokens and sample id, so a re-run experiment
+	replays the same responses without calling the API. Agents sampling the same prompt independently, e.g. at a
+	non-zero temperature, need distinct sample ids, or they would all get the first agent's response. On a hit, the wrapped model's history is updated as if it had answered.
+	"""
+
+	def __init__(self, llm: BaseLLM, store: LLMResponseStore, replay_only: bool = False,
+				 sample_id: Optional[Union[int, str]] = None):
+		"""
+		Initialize the wrapper.
+
+		Args:
+			llm (BaseLLM): The wrapped language model.
+			store (LLMResponseStore): The response store, usually shared by all agents of an experiment.
+			replay_only (bool): Never call the wrapped model; a request that is not in the store fails.
+			sample_id (Optional[Union[int, str]]): Sample id added to the request keys, e.g. the agent's index
+				(default is None).
+		"""
+		# The conversation history belongs to the wrapped model, so BaseLLM.__init__ is not called
+		self.llm = llm
+		self.store = store
+		self.replay_only = replay_only
+		self.sample_id = sample_id
+		self.error_response = llm.error_response
+
+	@property
+	def messages(self) -> List[Dict[str, str]]:
+		"""The wrapped model's conversation history."""
+		return self.llm.messages
+
+	@property
+	def save_history(self) -> bool:
+		"""Indicates whether conversation history should be saved."""
+		return self.llm.save_history
+
+	@property
+	def context(self) -> Optional[str]:
+		"""Returns the wrapped model's context."""
+		return self.llm.context
+
+	def prompt(self, instruction: str, max_tokens: int = 1024) -> str:
+		"""
+		Return the stored response to an instruction, prompting the wrapped model on a miss.
+
+		Args:
+			instruction (str): The instruction to prompt the language model.
+			max_tokens (int): Maximum number of tokens to generate in the response.
+
+		Returns:
+			str: The response, or the wrapped model's error response if a replay-only request is not stored.
+		"""
+		key = self.__key(instruction, max_tokens)
+		response = self.store.get(key)
+		Metrics.get_metrics().increment("llm_cache_hits" if response is not None else "llm_cache_misses",
+										self.get_name())
+		if response is not None:
+			self.llm.record_exchange(instruction, response)
+			return response
+
+		if self.replay_only:
+			logger.error(f"No stored response for a request to {self.get_name()} in replay-only mode.")
+			return self.error_response
+
+		response = self.llm.prompt(instruction, max_tokens)
+		self.__store(key, response)
+		return response
+
+	async def aprompt(self, instruction: str, max_tokens: int = 1024) -> str:
+		"""
+		Return the stored response to an instruction, prompting the wrapped model asynchronously on a miss.
+
+		Args:
+			instruction (str): The instruction to prompt the language model.
+			max_tokens (int): Maximum number of tokens to generate in the response.
+
+		Returns:
+			str: The response.
+
+		Raises:
+			LookupError: If the request is not stored in replay-only mode.
+		"""
+		key = self.__key(instruction, max_tokens)
+		response = self.store.get(key)
+		Metrics.get_metrics().increment("llm_cache_hits" if response is not None else "llm_cache_misses",
+										self.get_name())
+		if response is not None:
+			self.llm.record_exchange(instruction, response)
+			return response
+
+		if self.replay_only:
+			raise LookupError(f"No stored response for a request to {self.get_name()} in replay-only mode.")
+
+		response = await self.llm.aprompt(instruction, max_tokens)
+		self.__store(key, response)
+		return response
+
+	def __key(self, instruction: str, max_tokens: int) -> str:
+		"""
+		Compute the key of prompting the wrapped model with an instruction in its current state.
+
+		Args:
+			instruction (str): The instruction.
+			max_tokens (int): Maximum number of tokens to generate.
+
+		Returns:
+			str: The request key.
+		"""
+		messages = self.llm.preview_messages(instruction)
+		return self.store.key_for(self.get_name(), getattr(self.llm, "temperature", None), messages, max_tokens,
+								  self.sample_id)
+
+	def __store(self, key: str, response: Optional[str]) -> None:
+		"""
+		Store a response unless it signals an error.
+
+		Args:
+			key (str): The request key.
+			response (Optional[str]): The response.
+		"""
+		if response is not None and response != self.error_response:
+			self.store.put(key, self.get_name(), response)
+
+	def add_response(self, response: str) -> None:
+		"""
+		Add a response to the wrapped model's conversation history.
+
+		Args:
+			response (str): The response to be added to the history.
+		"""
+		self.llm.add_response(response)
+
+	def preview_messages(self, instruction: str) -> List[Dict[str, str]]:
+		"""
+		Get the message list that prompting with an instruction would send, without sending it.
+
+		Args:
+			instruction (str): The instruction.
+
+		Returns:
+			List[Dict[str, str]]: The messages.
+		"""
+		return self.llm.preview_messages(instruction)
+
+	def record_exchange(self, instruction: str, response: str) -> None:
+		"""
+		Update the wrapped model's history as if it had answered an instruction with a response.
+
+		Args:
+			instruction (str): The instruction.
+			response (str): The response.
+		"""
+		self.llm.record_exchange(instruction, response)
+
+	def clear_context(self) -> None:
+		"""
+		Clear the wrapped model's conversation context.
+		"""
+		self.llm.clear_context()
+
+	def get_name(self) -> str:
+		"""
+		Get the name of the wrapped model.
+
+		Returns:
+			str: The model name.
+		"""
+		return self.llm.get_name()
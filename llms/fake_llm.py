@@ -0,0 +1,176 @@
+import asyncio
+import time
+from src.base_llm import BaseLLM
+from src.metrics import record_llm_call
+from src.setup_logger import logger
+from typing import Callable, Dict, List, Optional, Union
+
+
+class FakeLLM(BaseLLM):
+	"""
+	An offline language model returning canned responses, for tests and benchmarks that must not call an API.
+	"""
+
+	def __init__(
+			self,
+			responses: Union[str, List[str], Callable[[str], str]] = "",
+			latency: float = 0.0,
+			save_history: bool = False,
+			model: str = "fake-llm",
+			context: Optional[str] = None
+	) -> None:
+		"""
+		Initialize the fake model.
+
+		Args:
+			responses (Union[str, List[str], Callable[[str], str]]): The response to every prompt, a list of responses
+				returned in turn (cycling when exhausted), or a function mapping the instruction to a response.
+			latency (float): Seconds to wait before answering, to simulate a remote model.
+			save_history (bool): Whether to retain the conversation history for subsequent prompts.
+			model (str): The name reported by `get_name`.
+			context (Optional[str]): Initial context message content.
+		"""
+		super().__init__()
+		self.responses = responses
+		self.latency = latency
+		self._save_history = save_history
+		self.model = model
+		self._context = context
+		self.messages: List[Dict[str, str]] = []
+		self.calls = 0
+		self.__set_messages()
+
+	@property
+	def save_history(self) -> bool:
+		"""Indicates whether conversation history should be saved."""
+		return self._save_history
+
+	@property
+	def context(self) -> Optional[str]:
+		"""Returns the current context message."""
+		return self._context
+
+	def prompt(self, instruction: str, max_tokens: int = 1024) -> str:
+		"""
+		Return the canned response for an instruction after the configured latency.
+
+		Args:
+			instruction (str): The instruction to prompt the language model.
+			max_tokens (int): Ignored.
+
+		Returns:
+			str: The canned response.
+		"""
+		start = time.perf_counter()
+		if self.latency:
+			time.sleep(self.latency)
+		response = self.__respond(instruction)
+		record_llm_call(self.model, time.perf_counter() - start)
+		return response
+
+	async def aprompt(self, instruction: str, max_tokens: int = 1024) -> str:
+		"""
+		Return the canned response for an instruction after the configured latency, without blocking the event loop.
+
+		Args:
+			instruction (str): The instruction to prompt the language model.
+			max_tokens (int): Ignored.
+
+		Returns:
+			str: The canned response.
+		"""
+		start = time.perf_counter()
+		if self.latency:
+			await asyncio.sleep(self.latency)
+		response = self.__respond(instruction)
+		record_llm_call(self.model, time.perf_counter() - start)
+		return response
+
+	def __respond(self, instruction: str) -> str:
+		"""
+		Pick the response to an instruction and record the exchange.
+
+		Args:
+			instruction (str): The instruction.
+
+		Returns:
+			str: The response.
+		"""
+		logger.debug(f"Prompting instruction: {instruction}")
+		if callable(self.responses):
+			content = self.responses(instruction)
+		elif isinstance(self.responses, list):
+			content = self.responses[self.calls % len(self.responses)] if self.responses else ""
+		else:
+			content = self.responses
+		self.calls += 1
+		self.record_exchange(instruction, content)
+		return content
+
+	def add_response(self, response: str) -> None:
+		"""
+		Add a response to the conversation history.
+
+		Args:
+			response (str): The response content to be added.
+		"""
+		self.messages.append({"role": "assistant", "content": response})
+
+	def preview_messages(self, instruction: str) -> List[Dict[str, str]]:
+		"""
+		Get the message list that prompting with an instruction would send, without sending it.
+
+		Args:
+			instruction (str): The instruction.
+
+		Returns:
+			List[Dict[str, str]]: The messages.
+		"""
+		history = self.messages if self.save_history else self.__initial_messages()
+		return history + [{"role": "user", "content": instruction}]
+
+	def record_exchange(self, instruction: str, response: str) -> None:
+		"""
+		Update the conversation history as if the model had answered an instruction with a response.
+
+		Args:
+			instruction (str): The instruction.
+			response (str): The response.
+		"""
+		if not self.save_history:
+			self.__set_messages()
+		self.messages.append({"role": "user", "content": instruction})
+		if self.save_history:
+			self.add_response(response)
+
+	def __initial_messages(self) -> List[Dict[str, str]]:
+		"""
+		Get the messages a conversation starts with, based on the context.
+
+		Returns:
+			List[Dict[str, str]]: The initial messages.
+		"""
+		if self._context:
+			return [{"role": "system", "content": self._context}]
+		return []
+
+	def __set_messages(self) -> None:
+		"""
+		Initialize or reset the conversation messages based on the context.
+		"""
+		self.messages = self.__initial_messages()
+
+	def clear_context(self) -> None:
+		"""
+		Clear the context of the conversation, resetting the message history.
+		"""
+		self.__set_messages()
+
+	def get_name(self) -> str:
+		"""
+		Get the name of the fake model.
+
+		Returns:
+			str: The model name.
+		"""
+		return self.model
@@ -1,6 +1,8 @@
+import time
 from src.base_llm import BaseLLM
+from src.metrics import record_llm_call
 from src.setup_logger import logger
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from typing import List, Optional, Dict
 
 
@@ -9,6 +11,8 @@ class GPT4(BaseLLM):
 	GPT-4 class for managing interactions specific to the GPT-4 model.
 	"""
 
+	error_response = "An error occurred while generating the response."
+
 	def __init__(
 			self,
 			save_history: bool = False,
@@ -27,6 +31,7 @@ class GPT4(BaseLLM):
 		"""
 		super().__init__()
 		self.client = OpenAI()
+		self.async_client: Optional[AsyncOpenAI] = None  # Created on first asynchronous prompt
 		self._save_history = save_history
 		self.temperature = temperature
 		self.model = model
@@ -66,6 +71,7 @@ class GPT4(BaseLLM):
 		self.messages.append(user_message)
 
 		# Generate response from GPT-4
+		start = time.perf_counter()
 		try:
 			response = self.client.chat.completions.create(
 				model=self.model,
@@ -73,6 +79,7 @@ class GPT4(BaseLLM):
 				max_tokens=max_tokens,
 				temperature=self.temperature
 			)
+			record_llm_call(self.model, time.perf_counter() - start, usage=getattr(response, "usage", None))
 			content = response.choices[0].message.content
 			logger.debug(f"Received response: {content}")
 
@@ -82,8 +89,51 @@ class GPT4(BaseLLM):
 
 			return content
 		except Exception as e:
+			record_llm_call(self.model, time.perf_counter() - start, error=True)
 			logger.error(f"Error while prompting GPT-4: {e}")
-			return "An error occurred while generating the response."
+			return self.error_response
+
+	async def aprompt(self, instruction: str, max_tokens: int = 1024) -> str:
+		"""
+		Prompt the GPT-4 model asynchronously. Unlike `prompt`, API errors are raised so that the caller can retry,
+		and the conversation history is only updated once a response has been received.
+
+		Args:
+			instruction (str): The instruction to prompt the language model.
+			max_tokens (int): Maximum number of tokens to generate in the response.
+
+		Returns:
+			str: The response from the GPT-4 model.
+		"""
+		logger.debug(f"Prompting instruction: {instruction}")
+		if self.async_client is None:
+			self.async_client = AsyncOpenAI()
+
+		user_message = {"role": "user", "content": instruction}
+		if not self.save_history:
+			self.__set_messages()  # Reset messages if history is not saved
+		messages = self.messages + [user_message]
+
+		start = time.perf_counter()
+		try:
+			response = await self.async_client.chat.completions.create(
+				model=self.model,
+				messages=messages,
+				max_tokens=max_tokens,
+				temperature=self.temperature
+			)
+		except Exception:
+			record_llm_call(self.model, time.perf_counter() - start, error=True)
+			raise
+		record_llm_call(self.model, time.perf_counter() - start, usage=getattr(response, "usage", None))
+		content = response.choices[0].message.content
+		logger.debug(f"Received response: {content}")
+
+		self.messages = messages
+		if self.save_history:
+			self.add_response(content)
+
+		return content
 
 	def add_response(self, response: str) -> None:
 		"""
@@ -95,14 +145,49 @@ class GPT4(BaseLLM):
 		wrapped_response = {"role": "assistant", "content": response}
 		self.messages.append(wrapped_response)
 
+	def preview_messages(self, instruction: str) -> List[Dict[str, str]]:
+		"""
+		Get the message list that prompting with an instruction would send, without sending it.
+
+		Args:
+			instruction (str): The instruction.
+
+		Returns:
+			List[Dict[str, str]]: The messages.
+		"""
+		history = self.messages if self.save_history else self.__initial_messages()
+		return history + [{"role": "user", "content": instruction}]
+
+	def record_exchange(self, instruction: str, response: str) -> None:
+		"""
+		Update the conversation history as if the model had answered an instruction with a response.
+
+		Args:
+			instruction (str): The instruction.
+			response (str): The response.
+		"""
+		if not self.save_history:
+			self.__set_messages()
+		self.messages.append({"role": "user", "content": instruction})
+		if self.save_history:
+			self.add_response(response)
+
+	def __initial_messages(self) -> List[Dict[str, str]]:
+		"""
+		Get the messages a conversation starts with, based on the context.
+
+		Returns:
+			List[Dict[str, str]]: The initial messages.
+		"""
+		if self._context:
+			return [{"role": "system", "content": self._context}]
+		return []
+
 	def __set_messages(self) -> None:
 		"""
 		Initialize or reset the conversation messages based on the context.
 		"""
-		if self._context:
-			self.messages = [{"role": "system", "content": self._context}]
-		else:
-			self.messages = []
+		self.messages = self.__initial_messages()
 
 	def clear_context(self) -> None:
 		"""
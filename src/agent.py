@@ -1,12 +1,18 @@
+import asyncio
+import copy
 import os
 import json
-from typing import List, Optional, Tuple
+from collections import Counter, deque
+from typing import Any, Generator, List, Mapping, Optional, Tuple
 from llms.gpt4 import GPT4
+from src.base_llm import BaseLLM
 from src.game import Game
 from src.utils import generate_agent_name
-from src.solver import Solver
+from src.solver import DEFAULT_INFERENCE_LIMIT, DEFAULT_QUERY_TIMEOUT, Solver
+from src.prolog_pool import PrologServerPool
+from src.rate_limiter import RequestThrottle
 from src.setup_logger import logger
-from src.utils import read_file, parse_axioms, process_trace, process_trace_messages
+from src.utils import read_file, read_file_cached, parse_axioms, process_trace, process_trace_messages
 
 
 class Agent:
@@ -24,17 +30,41 @@ class Agent:
 				 prompt_path: str = "DATA/PROMPTS/prompt_template.txt",
 				 feedback_prompt_path: str = "DATA/PROMPTS/feedback_prompt_template.txt",
 				 game_path: Optional[str] = None,
+				 game_rules: Optional[str] = None,
 				 strategy_string: Optional[str] = None,
 				 strategy_prompt_path: Optional[str] = None,
 				 max_attempts: int = 1,
-				 agent_json: Optional[str] = None):
+				 agent_json: Optional[str] = None,
+				 agent_record: Optional[Mapping[str, Any]] = None,
+				 verify_payoffs: bool = False,
+				 llm: Optional[BaseLLM] = None,
+				 initialize: bool = True,
+				 query_timeout: Optional[float] = DEFAULT_QUERY_TIMEOUT,
+				 inference_limit: Optional[int] = DEFAULT_INFERENCE_LIMIT,
+				 track_history: bool = False,
+				 keep_history: bool = True):
 		"""
 		Initializes the Agent with a name, strategy, game, and other configurations.
+
+		Args:
+			agent_record (Optional[Mapping[str, Any]]): A stored agent to load instead of `agent_json`, e.g. from an
+				`AgentStore`.
+			llm (Optional[BaseLLM]): Language model used for autoformalization (default is GPT-4 with history).
+			initialize (bool): Whether to autoformalize and load the solver now. If False, the agent is left
+				uninitialized until `initialize_async` is awaited, so that many agents can be created concurrently.
+			query_timeout (Optional[float]): Wall-clock seconds a solver query may take (None disables the timeout).
+			inference_limit (Optional[int]): Inferences a solver query may use (None disables the limit).
+			track_history (bool): Whether the solver keeps the opponent's full move history in `history/3`, in
+				addition to `last_move/2`, for strategies with a longer memory.
+			keep_history (bool): Whether to keep every move and payoff. If False, only the last round and running
+				aggregates (`total_payoff`, `rounds_played`, `move_counts`) are kept, so memory does not grow with the
+				number of rounds.
 		"""
 		self.name = generate_agent_name(3)
-		self.payoffs = []  # List to store the agent's payoffs over time
-		self.moves = []  # List to store the agent's moves
-		self.opponent_moves = []  # List to store the opponent's moves
+		self.keep_history = keep_history
+		self._reset_history()
+		self.payoff_table = {}  # Payoff for each (own move, opponent move), compiled from the solver
+		self.verify_payoffs = verify_payoffs  # Cross-check payoffs from the table against the solver
 		self.game = Game(game_string)  # Game information object
 		self.initialized = False
 
@@ -45,8 +75,15 @@ class Agent:
 		self.prompt_path = prompt_path  # Path to prompt template
 		self.feedback_prompt_path = feedback_prompt_path
 		self.strategy_prompt_path = strategy_prompt_path
-		self.llm = GPT4(save_history=True)
+		self.llm = llm if llm else GPT4(save_history=True)
 		self.trace_messages = []
+		self.solver = None  # Solver object
+		self.solver_pool = None  # Prolog server pool for the solver (None uses the shared pool)
+		self.query_timeout = query_timeout
+		self.inference_limit = inference_limit
+		self.runtime_error_type = None  # Budget exceeded when a runtime error occurred: "timeout" or "inference_limit"
+		self.status: Optional[str] = None  # Set from the outcome of initialization, see `_set_status_from_validity`
+		self.track_history = track_history
 
 		# Agent strategy
 		self.strategy = ""
@@ -56,6 +93,9 @@ class Agent:
 		if agent_json:
 			self.load_agent_from_json(agent_json)
 			self.initialized = True
+		elif agent_record is not None:
+			self.load_agent_from_record(agent_record)
+			self.initialized = True
 
 		else:
 			if strategy_path:
@@ -67,21 +107,58 @@ class Agent:
 			self.strategy = strategy_string
 			self.strategy_formalize = True
 
+		# Arguments of the pending call to `init`, if any
+		self.pending_init: Optional[Tuple[Optional[str], Optional[str]]] = None
+
 		if not self.initialized:
 			self.default_move = None
 			self.player_name = None
 			self.opponent_name = None
-			self.solver = None  # Solver object
-			self.valid = self.init(game_path)
+			self.pending_init = (game_path, game_rules)
 
-		if agent_json and self.strategy_formalize:
+		if (agent_json or agent_record is not None) and self.strategy_formalize:
 			self.strategy = strategy_string
+			if self.solver:
+				self.solver.close()
 			self.solver = None
-			self.valid = self.init(game_rules_string=self.game.game_rules)
+			self.pending_init = (None, self.game.game_rules)
+
+		if self.pending_init and initialize:
+			self.valid = self.init(*self.pending_init)
+			self.pending_init = None
+		elif self.pending_init:
+			self.valid = False
 
-		self.status = "correct" if self.valid else "syntactic_error"
+		self._set_status_from_validity()
 		self.initialized = True
 
+	async def initialize_async(self, throttle: Optional[RequestThrottle] = None) -> bool:
+		"""
+		Run the initialization deferred by `initialize=False`, prompting the LLM asynchronously.
+
+		Args:
+			throttle (Optional[RequestThrottle]): Limits concurrency and rate of LLM requests and retries failures.
+
+		Returns:
+			bool: True if the agent is valid, False otherwise.
+		"""
+		if self.pending_init:
+			game_rules_path, game_rules_string = self.pending_init
+			self.pending_init = None
+			self.valid = await self.ainit(game_rules_path, game_rules_string, throttle)
+			self._set_status_from_validity()
+		return self.valid
+
+	def _set_status_from_validity(self) -> None:
+		"""
+		Set the agent's status once it is initialized: "correct" if it is valid, otherwise the error recorded while
+		initializing it, e.g. an instruction-following error, or "syntactic_error" if none was.
+		"""
+		if self.valid:
+			self.status = "correct"
+		elif self.status in (None, "correct"):
+			self.status = "syntactic_error"
+
 	def load_agent_from_json(self, path_to_json: str) -> None:
 		"""
 		Load all agent parameters from a JSON file.
@@ -91,17 +168,99 @@ class Agent:
 		"""
 		with open(path_to_json, 'r') as file:
 			data = json.load(file)
+		self.load_agent_from_record(data)
+
+	def load_agent_from_record(self, data: Mapping[str, Any]) -> None:
+		"""
+		Load all agent parameters from a stored agent, i.e. the contents of an agent JSON file.
+
+		Args:
+			data (Mapping[str, Any]): The stored agent.
+		"""
 		self.strategy_name = data['strategy_name']
 		self.strategy = data['strategy']
 		self.game.set_rules(data['game_rules'])
 		self.trace_messages = data.get('trace_messages', [])
+		self.status = None
 		self.valid = self.load_solver()
-		self.status = "correct" if self.valid else "syntactic_error"
+		self._set_status_from_validity()
 
 	def init(self, game_rules_path: Optional[str] = None, game_rules_string: Optional[str] = None) -> bool:
 		"""
 		Initialize the agent with game rules and strategy.
 
+		Args:
+			game_rules_path (Optional[str]): Path to game rules file.
+			game_rules_string (Optional[str]): Game rules as a string.
+
+		Returns:
+			bool: True if the initialization is successful, False otherwise.
+		"""
+		steps = self._initialization_steps(game_rules_path, game_rules_string)
+		reply = None
+		try:
+			while True:
+				request, payload = steps.send(reply)
+				if request == "prompt":
+					reply = self.llm.prompt(payload)
+				else:
+					reply = self.load_solver()
+		except StopIteration as stop:
+			return stop.value
+
+	async def ainit(self, game_rules_path: Optional[str] = None, game_rules_string: Optional[str] = None,
+					throttle: Optional[RequestThrottle] = None) -> bool:
+		"""
+		Initialize the agent like `init`, but await the LLM so that many agents can autoformalize concurrently.
+		Solvers are loaded in a worker thread to keep the event loop responsive.
+
+		Args:
+			game_rules_path (Optional[str]): Path to game rules file.
+			game_rules_string (Optional[str]): Game rules as a string.
+			throttle (Optional[RequestThrottle]): Limits concurrency and rate of LLM requests and retries failures.
+
+		Returns:
+			bool: True if the initialization is successful, False otherwise.
+		"""
+		steps = self._initialization_steps(game_rules_path, game_rules_string)
+		reply = None
+		try:
+			while True:
+				request, payload = steps.send(reply)
+				if request == "prompt":
+					reply = await self._aprompt(payload, throttle)
+				else:
+					reply = await asyncio.to_thread(self.load_solver)
+		except StopIteration as stop:
+			return stop.value
+
+	async def _aprompt(self, prompt: str, throttle: Optional[RequestThrottle] = None) -> Optional[str]:
+		"""
+		Prompt the LLM asynchronously, through the throttle if one is given.
+
+		Args:
+			prompt (str): The prompt.
+			throttle (Optional[RequestThrottle]): Limits concurrency and rate of LLM requests and retries failures.
+
+		Returns:
+			Optional[str]: The response, or None if the request failed, which the initialization steps treat as an
+				instruction-following error, as `init` does with the error response of a failed synchronous prompt.
+		"""
+		try:
+			if throttle:
+				return await throttle.run(lambda: self.llm.aprompt(prompt))
+			return await self.llm.aprompt(prompt)
+		except Exception as e:
+			logger.error(f"Agent {self.name} failed to prompt the LLM: {e}")
+			return None
+
+	def _initialization_steps(self, game_rules_path: Optional[str] = None, game_rules_string: Optional[str] = None
+							  ) -> Generator[Tuple[str, Optional[str]], Any, bool]:
+		"""
+		The initialization logic shared by `init` and `ainit`, written as a generator so that it can be driven
+		synchronously or asynchronously. It yields ("prompt", prompt) when it needs an LLM response and
+		("load", None) when it needs the result of `load_solver`.
+
 		Args:
 			game_rules_path (Optional[str]): Path to game rules file.
 			game_rules_string (Optional[str]): Game rules as a string.
@@ -111,12 +270,14 @@ class Agent:
 		"""
 		logger.debug(f"Agent {self.name} with strategy {self.strategy_name} is initializing.")
 
+		self.status = None
 		self.attempts = 0
 		solver_correct = False
 		trace = None
 
 		while self.attempts < self.max_attempts and not solver_correct:
 			self.attempts += 1
+			self.status = None  # Only an error of the last attempt is reported
 
 			if game_rules_string:
 				self.game.set_rules(game_rules_string)
@@ -125,7 +286,7 @@ class Agent:
 				# First attempt or no solver was created
 				logger.debug(f"Agent {self.name} is autoformalizing rules.")
 				if self.solver is None:
-					game_rules = self.autoformalize(self.prompt_path, ["game_description"], [self.game.game_string])
+					game_rules = yield from self._autoformalize_steps(self.prompt_path, ["game_description"], [self.game.game_string])
 					if game_rules:
 						self.game.set_rules(game_rules)
 					else:
@@ -138,8 +299,8 @@ class Agent:
 						logger.debug(f"Agent {self.name} is correcting rules.")
 						logger.debug(f"Messages:\n {lines_to_correct}")
 						self.trace_messages.append(lines_to_correct)
-						game_rules = self.autoformalize(self.feedback_prompt_path, ["code", "messages"],
-														[self.game.game_rules, lines_to_correct])
+						game_rules = yield from self._autoformalize_steps(self.feedback_prompt_path, ["code", "messages"],
+																		  [self.game.game_rules, lines_to_correct])
 						if game_rules:
 							self.game.set_rules(game_rules)
 						else:
@@ -154,8 +315,8 @@ class Agent:
 				# First attempt or no solver was created
 				if self.solver is None:
 					logger.debug(f"Agent {self.name} is autoformalizing strategy.")
-					strategy_rules = self.autoformalize(self.strategy_prompt_path, ["strategy_description"],
-														[self.strategy])
+					strategy_rules = yield from self._autoformalize_steps(self.strategy_prompt_path,
+																		  ["strategy_description"], [self.strategy])
 					if strategy_rules:
 						self.strategy = strategy_rules
 					else:
@@ -168,13 +329,14 @@ class Agent:
 						logger.debug(f"Agent {self.name} is correcting strategy.")
 						logger.debug(f"Messages:\n {lines_to_correct}")
 						self.trace_messages.append(lines_to_correct)
-						strategy_rules = self.autoformalize(self.feedback_prompt_path, ["code", "messages"],
-															[self.strategy, lines_to_correct])
+						strategy_rules = yield from self._autoformalize_steps(self.feedback_prompt_path,
+																			  ["code", "messages"],
+																			  [self.strategy, lines_to_correct])
 						if strategy_rules:
 							self.strategy = strategy_rules
 						else:
 							continue
-			solver_correct, trace = self.load_solver()
+			solver_correct, trace = yield "load", None
 
 		return solver_correct
 
@@ -186,25 +348,31 @@ class Agent:
 			Tuple[bool, Optional[str]]: A tuple where the first element indicates if the solver is valid,
 										and the second element is the trace message if any issues occur.
 		"""
-		# Step 1: Read the solver string from the file
-		solver_string = read_file(self.solver_path)
+		# Step 1: Read the solver string, which is only read from disk again when the file changes
+		solver_string = read_file_cached(self.solver_path)
 		if not solver_string or not self.game:
 			return False, None
 
-		# Step 2: Initialize the solver with the game rules and strategy
-		self.solver = Solver(solver_string, self.game.game_rules, self.strategy)
+		# Step 2: Release the previous solver and initialize a new one with the game rules and strategy
+		if self.solver:
+			self.solver.close()
+		self.solver = Solver(solver_string, self.game.game_rules, self.strategy, pool=self.solver_pool,
+							 query_timeout=self.query_timeout, inference_limit=self.inference_limit,
+							 track_history=self.track_history)
 
 		# Step 3: Validate the solver and process the trace if it exists
 		if not self.solver or self.solver.trace:
 			return self.solver.valid, self.solver.trace if self.solver else (False, None)
 
-		# Step 4: Extract game variables (moves and player names)
-		if not self._extract_game_variables():
-			return False, self.solver.trace
+		# Step 4: Reuse the game variables cached with an identical program, if any
+		variables = self.solver.get_cached_variables()
+		if variables:
+			self._apply_game_variables(variables)
 
-		# Step 5: Extract the default move if available
-		if not self._extract_default_move():
-			return False, self.solver.trace
+		else:
+			# Step 5: Extract moves, player names, default move and payoffs with a single introspection query
+			if not self._extract_game_variables():
+				return False, self.solver.trace
 
 		logger.debug(
 			f"Agent {self.name} has possible moves {self.game.get_possible_moves()} and default move {self.default_move}. "
@@ -213,39 +381,134 @@ class Agent:
 
 		return True, None
 
+	def close(self) -> None:
+		"""
+		Release the agent's solver. The agent's moves and payoffs are kept, but it cannot play afterwards.
+		"""
+		if self.solver:
+			self.solver.close()
+			self.solver = None
+
+	def reset_for_match(self) -> bool:
+		"""
+		Prepare the agent for a new match by restoring the solver's initial state.
+
+		The solver's `initially/2` facts are restored from the snapshot taken after loading and its move history is
+		cleared, which is one round-trip instead of reloading the program. Moves and payoffs are kept, as they accumulate over the tournament.
+		If the state cannot be restored, the solver is reloaded.
+
+		Returns:
+			bool: True if the agent is ready to play, False otherwise.
+		"""
+		if self.solver and self.solver.reset_state():
+			logger.debug("Agent %s reset its solver state.", self.name)
+			return True
+		valid, _ = self.load_solver()
+		return valid
+
+	def copy_for_match(self, pool: Optional[PrologServerPool] = None) -> 'Agent':
+		"""
+		Create a copy of the agent with its own solver and an empty history, so that the copy can play a match
+		concurrently with other matches of the same agent.
+
+		The copy's program is loaded from the program cache, so it is neither consulted nor validated again.
+
+		Args:
+			pool (Optional[PrologServerPool]): The pool to lease the copy's solver from (default is the shared pool).
+
+		Returns:
+			Agent: The copy.
+		"""
+		agent_copy = copy.copy(self)
+		agent_copy.game = copy.copy(self.game)
+		agent_copy._reset_history()
+		agent_copy.solver = None
+		agent_copy.solver_pool = pool
+		agent_copy.load_solver()
+		return agent_copy
+
+	def merge_match(self, agent_copy: 'Agent') -> None:
+		"""
+		Append the moves and payoffs of a match played by a copy of the agent, and release the copy's solver if it
+		still holds one.
+
+		Args:
+			agent_copy (Agent): The copy created by `copy_for_match`.
+		"""
+		self.moves.extend(agent_copy.moves)
+		self.opponent_moves.extend(agent_copy.opponent_moves)
+		self.payoffs.extend(agent_copy.payoffs)
+		self.total_payoff += agent_copy.total_payoff
+		self.rounds_played += agent_copy.rounds_played
+		self.move_counts.update(agent_copy.move_counts)
+		if agent_copy.status != "correct":
+			self.status = agent_copy.status
+			self.runtime_error_type = agent_copy.runtime_error_type
+		agent_copy.close()
+
 	def _extract_game_variables(self) -> bool:
 		"""
-		Extract the possible moves and player names from the solver.
+		Extract the possible moves, player names, default move and payoff table from the solver, and cache them
+		with the solver's program.
 
 		Returns:
-			bool: True if both possible moves and player names are successfully extracted, False otherwise.
+			bool: True if the possible moves, player names and default move are successfully extracted,
+				False otherwise.
 		"""
-		possible_moves = self.solver.get_variable_values("possible(move(_,X), s0).")
-		player_names = self.solver.get_variable_values("holds(player(N), s0).")
+		variables = self.solver.get_game_variables()
+		if not variables:
+			return False
 
-		if possible_moves and player_names:
-			self.player_name = player_names[0]
-			self.opponent_name = player_names[1]
-			self.game.set_players(player_names)
-			self.game.set_possible_moves(list(set(possible_moves)))
-			return True
+		possible_moves = variables["possible_moves"]
+		player_names = variables["player_names"]
+		if not possible_moves or len(player_names) < 2 or variables["default_move"] is None:
+			return False
+
+		variables = {
+			"possible_moves": list(dict.fromkeys(possible_moves)),
+			"player_names": player_names,
+			"default_move": variables["default_move"],
+			"payoff_table": self._compile_payoff_table(variables["payoff_table"])
+		}
+		self._apply_game_variables(variables)
+		self.solver.cache_variables(variables)
+		return True
+
+	def _apply_game_variables(self, variables: dict) -> None:
+		"""
+		Set the possible moves, player names and default move from previously extracted values.
 
-		return False
+		Args:
+			variables (dict): Values stored by `Solver.cache_variables`.
+		"""
+		player_names = variables["player_names"]
+		self.player_name = player_names[0]
+		self.opponent_name = player_names[1]
+		self.game.set_players(list(player_names))
+		self.game.set_possible_moves(list(variables["possible_moves"]))
+		self.default_move = variables["default_move"]
+		self.payoff_table = {(move, opponent_move): payoff
+							 for move, opponent_move, payoff in variables.get("payoff_table", [])}
 
-	def _extract_default_move(self) -> bool:
+	def _compile_payoff_table(self, rows: list) -> list:
 		"""
-		Extract the default move for the agent from the solver.
+		Keep the well-formed rows of the payoff table extracted from the solver.
+
+		In simultaneous-move games the payoff depends only on the two moves, so rounds can then be scored with a
+		dictionary lookup instead of a solver query.
+
+		Args:
+			rows (list): `[move, opponent_move, payoff]` rows for every combination of possible moves.
 
 		Returns:
-			bool: True if a default move is successfully extracted, False otherwise.
+			list: One `[move, opponent_move, payoff]` row per pair of moves with a numeric payoff.
 		"""
-		default_move = self.solver.get_variable_values(
-			f"initially(default_move({self.player_name}, X), s0).", 1
-		)
-		if default_move:
-			self.default_move = default_move[0]
-			return True
-		return False
+		payoff_table = {}
+		for row in rows or []:
+			if isinstance(row, list) and len(row) == 3 and isinstance(row[2], (int, float)):
+				payoff_table.setdefault((row[0], row[1]), float(row[2]))
+		logger.debug(f"Agent {self.name} compiled payoff table: {payoff_table}")
+		return [[move, opponent_move, payoff] for (move, opponent_move), payoff in payoff_table.items()]
 
 	def update_strategy(self, strategy_path: str) -> None:
 		"""
@@ -280,6 +543,27 @@ class Agent:
 		# Step 3: Parse the response to extract formalized game/strategy rules
 		return self._parse_response(response)
 
+	def _autoformalize_steps(self, prompt_path: str, placeholders: List[str], replace_strings: List[str]
+							 ) -> Generator[Tuple[str, Optional[str]], Any, Optional[str]]:
+		"""
+		The steps of `autoformalize` as a generator yielding ("prompt", prompt) for the LLM response.
+
+		Args:
+			prompt_path (str): Path to the prompt template.
+			placeholders (List[str]): List of placeholders in the template to be replaced.
+			replace_strings (List[str]): List of strings to replace the placeholders.
+
+		Returns:
+			Optional[str]: The formalized rules if successful, or None if an error occurs.
+		"""
+		prompt = self._prepare_prompt(prompt_path, placeholders, replace_strings)
+		response = yield "prompt", prompt
+		if response is None:
+			# A failed request, e.g. one `_aprompt` gave up on, is an error like the error response of `prompt`
+			self._set_instruction_following_error()
+			return None
+		return self._parse_response(response)
+
 	def _prepare_prompt(self, prompt_path: str, placeholders: List[str], replace_strings: List[str]) -> str:
 		"""
 		Prepare the prompt by reading a template file and replacing placeholders.
@@ -312,10 +596,16 @@ class Agent:
 			return rules
 		except ValueError:
 			# Log error if response parsing fails
-			logger.debug(f"Agent {self.name} experienced an instruction-following error!")
-			self.status = 'instruction_following_error'
+			self._set_instruction_following_error()
 			return None
 
+	def _set_instruction_following_error(self) -> None:
+		"""
+		Mark the agent as having an instruction-following error, i.e. no rules could be obtained from the LLM.
+		"""
+		logger.debug(f"Agent {self.name} experienced an instruction-following error!")
+		self.status = 'instruction_following_error'
+
 	def play(self) -> Optional[str]:
 		"""
 		The agent makes a move in the tournament.
@@ -328,23 +618,41 @@ class Agent:
 		"""
 		if not self.solver:
 			logger.debug(f"Agent {self.name} is unable to play due to an uninitialized solver.")
-			self.status = 'runtime_error'
+			self.set_runtime_error()
 			return None
 
-		logger.debug(f"Agent {self.name} with strategy {self.strategy_name} is making a move.")
+		logger.debug("Agent %s with strategy %s is making a move.", self.name, self.strategy_name)
 
 		# Step 1: Attempt to get a move using the solver
 		move = self._select_move()
 		if move:
-			self.moves.append(move)
-			logger.debug(f"Agent {self.name} with strategy {self.strategy_name} made move: {move}")
+			self.record_move(move)
+			logger.debug("Agent %s with strategy %s made move: %s", self.name, self.strategy_name, move)
 			return move
 
 		# If no move is selected, log the error and update status
 		logger.debug(f"Agent {self.name} did not select a move!")
-		self.status = 'runtime_error'
+		self.set_runtime_error()
 		return None
 
+	def set_runtime_error(self, error_type: Optional[str] = None) -> None:
+		"""
+		Mark the agent as having a runtime error.
+
+		Args:
+			error_type (Optional[str]): The budget that was exceeded, "timeout" or "inference_limit" (default is the
+				budget exceeded by the solver's last query, if any).
+		"""
+		self.status = 'runtime_error'
+		self.runtime_error_type = error_type or (self.solver.last_violation if self.solver else None)
+
+	def _check_budget_violation(self) -> None:
+		"""
+		Mark the agent as having a runtime error if the solver's last query exceeded its timeout or inference limit.
+		"""
+		if self.solver and self.solver.last_violation:
+			self.set_runtime_error(self.solver.last_violation)
+
 	def _select_move(self) -> Optional[str]:
 		"""
 		Use the solver to select the agent's move.
@@ -372,24 +680,26 @@ class Agent:
 		"""
 		if not self.solver:
 			logger.debug(f"Agent {self.name} cannot update payoff due to an uninitialized solver.")
-			self.status = 'runtime_error'
+			self.set_runtime_error()
 			return False
 
 		# Step 1: Log the opponent's move
 		self.opponent_moves.append(opponent_move)
 
-		# Step 2: Calculate payoff using the solver
+		# Step 2: Calculate payoff using the solver; a payoff of 0 is valid, as in matches played in the engine
 		payoff = self._calculate_payoff()
-		if not payoff:
+		if payoff is None:
+			self._check_budget_violation()
 			return False
 
 		# Step 3: Update the solver state with the opponent's last move
 		if not self._update_solver_state(opponent_move):
+			self._check_budget_violation()
 			return False
 
 		# Step 4: Log the successful update and store the payoff
-		self.payoffs.append(payoff)
-		logger.debug(f"Agent {self.name} received payoff: {payoff} and logged opponent's move: {opponent_move}")
+		self.record_payoff(payoff)
+		logger.debug("Agent %s received payoff: %s and logged opponent's move: %s", self.name, payoff, opponent_move)
 		return True
 
 	def _calculate_payoff(self) -> Optional[float]:
@@ -402,6 +712,24 @@ class Agent:
 		if not self.moves or not self.opponent_moves:
 			return None
 
+		# Score the round locally if the payoff table covers the moves
+		payoff = self.payoff_table.get((self.moves[-1], self.opponent_moves[-1]))
+		if payoff is not None and not self.verify_payoffs:
+			return payoff
+
+		solver_payoff = self._query_payoff()
+		if payoff is not None and solver_payoff != payoff:
+			logger.warning(f"Agent {self.name} payoff table gives {payoff} but the solver gives {solver_payoff} "
+						   f"for moves {self.moves[-1]} and {self.opponent_moves[-1]}.")
+		return solver_payoff
+
+	def _query_payoff(self) -> Optional[float]:
+		"""
+		Query the solver for the agent's payoff given the last moves of both players.
+
+		Returns:
+			Optional[float]: The payoff if the solver derives one, otherwise None.
+		"""
 		query = (
 			f"finally(goal({self.player_name}, U), "
 			f"do(move({self.player_name}, '{self.moves[-1]}'), "
@@ -410,9 +738,56 @@ class Agent:
 		payoff = self.solver.get_variable_values(query, 1)
 		return float(payoff[0]) if payoff else None
 
+	def record_round(self, move: str, opponent_move: str, payoff: float) -> None:
+		"""
+		Record a round that was played without `play` and `update_payoff`, e.g. inside the engine.
+
+		Args:
+			move (str): The agent's move.
+			opponent_move (str): The opponent's move.
+			payoff (float): The agent's payoff for the round.
+		"""
+		self.record_move(move)
+		self.opponent_moves.append(opponent_move)
+		self.record_payoff(payoff)
+
+	def record_move(self, move: str) -> None:
+		"""
+		Store a move of the agent and count it.
+
+		Args:
+			move (str): The agent's move.
+		"""
+		self.moves.append(move)
+		self.move_counts[move] += 1
+
+	def record_payoff(self, payoff: float) -> None:
+		"""
+		Store the agent's payoff for a round and add it to the running aggregates.
+
+		Args:
+			payoff (float): The agent's payoff.
+		"""
+		self.payoffs.append(payoff)
+		self.total_payoff += payoff
+		self.rounds_played += 1
+
+	def _reset_history(self) -> None:
+		"""
+		Clear the moves, payoffs and running aggregates. Without `keep_history`, the move and payoff sequences only
+		hold the last round, which is all that computing the next payoff needs.
+		"""
+		history = list if self.keep_history else (lambda: deque(maxlen=1))
+		self.payoffs = history()  # The agent's payoffs over time
+		self.moves = history()  # The agent's moves
+		self.opponent_moves = history()  # The opponent's moves
+		self.total_payoff = 0
+		self.rounds_played = 0
+		self.move_counts = Counter()  # Number of times the agent played each move
+
 	def _update_solver_state(self, opponent_move: str) -> bool:
 		"""
-		Update the solver state with the opponent's last move.
+		Update the solver state with the opponent's last move, and its move history if the agent tracks it.
 
 		Args:
 			opponent_move (str): The move made by the opponent.
@@ -420,8 +795,7 @@ class Agent:
 		Returns:
 			bool: True if the solver state was successfully updated, otherwise False.
 		"""
-		query = f"initialise(last_move({self.opponent_name}, '{opponent_move}'), s0)."
-		return self.solver.apply_predicate(query)
+		return self.solver.observe(self.opponent_name, opponent_move)
 
 	def update_default_move(self, move: str) -> bool:
 		"""
@@ -485,6 +859,6 @@ class Agent:
 		Returns:
 			float: The total sum of payoffs.
 		"""
-		total = sum(self.payoffs)
-		logger.debug(f"Total payoff for agent {self.name}: {total}")
+		total = self.total_payoff
+		logger.debug("Total payoff for agent %s: %s", self.name, total)
 		return total
@@ -0,0 +1,255 @@
+import json
+import mmap
+import os
+import struct
+from typing import Any, Container, Dict, Iterable, Iterator, List, Mapping, Optional
+
+# Layout of a store file: the magic bytes, the JSON-encoded large fields of every agent, the JSON index, and the
+# offset of the index as an unsigned little-endian 64-bit integer
+MAGIC = b"AGSTORE1"
+FOOTER = struct.Struct("<Q")
+
+# Fields kept in the data section and decoded on first access; all other fields are kept in the index
+LARGE_FIELDS = ("strategy", "game_rules", "trace_messages", "moves", "payoffs")
+
+
+class StoredAgent(Mapping):
+	"""
+	A read-only view of an agent in an `AgentStore`, with the same keys as an `agent_*.json` log.
+
+	Small fields are read from the index; large fields are decoded from the memory-mapped store on first access.
+	"""
+
+	def __init__(self, store: 'AgentStore', entry: Dict[str, Any]):
+		"""
+		Initialize the view.
+
+		Args:
+			store (AgentStore): The store holding the agent.
+			entry (Dict[str, Any]): The agent's index entry.
+		"""
+		self._store = store
+		self._meta = entry["meta"]
+		self._offsets = entry["offsets"]
+		self._loaded: Dict[str, Any] = {}
+
+	def __getitem__(self, key: str) -> Any:
+		if key in self._meta:
+			return self._meta[key]
+		if key not in self._offsets:
+			raise KeyError(key)
+		if key not in self._loaded:
+			offset, length = self._offsets[key]
+			self._loaded[key] = json.loads(self._store.read_bytes(offset, length))
+		return self._loaded[key]
+
+	def __iter__(self) -> Iterator[str]:
+		yield from self._meta
+		yield from self._offsets
+
+	def __len__(self) -> int:
+		return len(self._meta) + len(self._offsets)
+
+	def __repr__(self) -> str:
+		return f"StoredAgent({self._meta.get('name')!r})"
+
+
+class AgentStore(Mapping):
+	"""
+	A single-file store of agents for an experiment, e.g. to reload thousands of agents for re-tournaments without
+	parsing one JSON file per agent.
+
+	The store is memory-mapped and only its index, which holds the small fields of every agent and the offsets of the
+	large ones (rules, strategies, traces, moves and payoffs), is parsed when it is opened. Agents are looked up by key
+	and their large fields are decoded lazily, see `StoredAgent`. An agent's key is its name, suffixed with "#2",
+	"#3", ... if an agent written before it has the same name, as random names collide among thousands of agents.
+
+	Attributes:
+		path (str): Path of the store file.
+	"""
+
+	def __init__(self, path: str):
+		"""
+		Open a store written by `AgentStore.write`.
+
+		Args:
+			path (str): Path of the store file.
+
+		Raises:
+			ValueError: If the file is not an agent store.
+		"""
+		self.path = path
+		self._file = open(path, "rb")
+		try:
+			self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+			if len(self._data) < len(MAGIC) + FOOTER.size or self._data[:len(MAGIC)] != MAGIC:
+				raise ValueError(f"{path} is not an agent store.")
+			index_offset, = FOOTER.unpack(self._data[-FOOTER.size:])
+			self._index = json.loads(self._data[index_offset:-FOOTER.size])
+		except Exception:
+			self.close()
+			raise
+
+	@staticmethod
+	def write(path: str, records: Iterable[Mapping[str, Any]]) -> int:
+		"""
+		Write agents to a new store, replacing any existing file atomically.
+
+		Args:
+			path (str): Path of the store file.
+			records (Iterable[Mapping[str, Any]]): The agents, as dictionaries with the keys of an `agent_*.json` log,
+				including a "name".
+
+		Returns:
+			int: The number of agents written.
+		"""
+		directory = os.path.dirname(path)
+		if directory and not os.path.exists(directory):
+			os.makedirs(directory)
+
+		index = {}
+		temporary_path = f"{path}.tmp"
+		try:
+			with open(temporary_path, "wb") as file:
+				file.write(MAGIC)
+				for record in records:
+					key = unique_key(record["name"], index)
+					offsets = {}
+					for field in LARGE_FIELDS:
+						if field in record:
+							blob = json.dumps(record[field]).encode()
+							offsets[field] = [file.tell(), len(blob)]
+							file.write(blob)
+					meta = {key: value for key, value in record.items() if key not in LARGE_FIELDS}
+					index[key] = {"meta": meta, "offsets": offsets}
+
+				index_offset = file.tell()
+				file.write(json.dumps(index).encode())
+				file.write(FOOTER.pack(index_offset))
+			os.replace(temporary_path, path)
+		except Exception:
+			if os.path.exists(temporary_path):
+				os.remove(temporary_path)
+			raise
+		return len(index)
+
+	@staticmethod
+	def import_json(path: str, json_paths: Iterable[str]) -> int:
+		"""
+		Write the agents logged as `agent_*.json` files to a new store.
+
+		Args:
+			path (str): Path of the store file.
+			json_paths (Iterable[str]): Paths of the JSON files, or of directories to search for them recursively.
+
+		Returns:
+			int: The number of agents written.
+		"""
+		def records() -> Iterator[Dict[str, Any]]:
+			for json_path in expand_json_paths(json_paths):
+				with open(json_path, "r") as file:
+					yield json.load(file)
+
+		return AgentStore.write(path, records())
+
+	def read_bytes(self, offset: int, length: int) -> bytes:
+		"""
+		Read a slice of the store.
+
+		Args:
+			offset (int): The offset of the slice.
+			length (int): The length of the slice.
+
+		Returns:
+			bytes: The slice.
+		"""
+		return self._data[offset:offset + length]
+
+	def names(self) -> List[str]:
+		"""
+		Get the keys of the stored agents, in the order they were written.
+
+		Returns:
+			List[str]: The agent keys, i.e. their names, disambiguated if several agents have the same name.
+		"""
+		return list(self._index)
+
+	def __getitem__(self, key: str) -> StoredAgent:
+		return StoredAgent(self, self._index[key])
+
+	def __iter__(self) -> Iterator[str]:
+		return iter(self._index)
+
+	def __len__(self) -> int:
+		return len(self._index)
+
+	def close(self) -> None:
+		"""
+		Unmap and close the store file.
+		"""
+		data = getattr(self, "_data", None)
+		if data is not None:
+			data.close()
+		self._file.close()
+
+	def __enter__(self) -> 'AgentStore':
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback) -> None:
+		self.close()
+
+
+def unique_key(name: str, taken: Container[str]) -> str:
+	"""
+	Get a key for an agent that is not taken yet: its name, or its name suffixed with the first free "#<n>".
+
+	Args:
+		name (str): The agent's name.
+		taken (Container[str]): The keys already taken.
+
+	Returns:
+		str: The key.
+	"""
+	key = name
+	suffix = 1
+	while key in taken:
+		suffix += 1
+		key = f"{name}#{suffix}"
+	return key
+
+
+def is_agent_store(path: Optional[str]) -> bool:
+	"""
+	Check whether a path is an agent store file, as opposed to e.g. a directory of JSON agents.
+
+	Args:
+		path (Optional[str]): The path.
+
+	Returns:
+		bool: True if the file starts with the store's magic bytes, False otherwise.
+	"""
+	if not path or not os.path.isfile(path):
+		return False
+	with open(path, "rb") as file:
+		return file.read(len(MAGIC)) == MAGIC
+
+
+def expand_json_paths(json_paths: Iterable[str]) -> List[str]:
+	"""
+	Expand directories to the `agent_*.json` files they contain, recursively and in sorted order.
+
+	Args:
+		json_paths (Iterable[str]): Paths of JSON files or directories.
+
+	Returns:
+		List[str]: Paths of JSON files.
+	"""
+	expanded = []
+	for json_path in json_paths:
+		if not os.path.isdir(json_path):
+			expanded.append(json_path)
+			continue
+		for directory, _, files in sorted(os.walk(json_path)):
+			expanded += [os.path.join(directory, file) for file in sorted(files)
+						 if file.startswith("agent") and file.endswith(".json")]
+	return expanded
@@ -12,11 +12,11 @@ class RandomAgent(Agent):
 			move = self.solver.get_variable_values(f"select(_,_,[{possible_moves}],M).", 1)
 			if move:
 				move = move[0]
-				self.moves.append(move)
+				self.record_move(move)
 				logger.debug(f"Agent {self.name} with strategy {self.strategy_name} made move: {move}")
 				return move
 
 		logger.debug(f"Agent {self.name} didn't select move!")
-		self.status = 'runtime_error'
+		self.set_runtime_error()
 		# runtime error
 		return None
@@ -1,5 +1,6 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Dict, List, Optional
 
 
 class BaseLLM(ABC):
@@ -10,6 +11,9 @@ class BaseLLM(ABC):
 	manage context, and handle conversation history.
 	"""
 
+	# The response returned by `prompt` when the model could not be reached, if the implementation returns one
+	error_response: Optional[str] = None
+
 	def __init__(self) -> None:
 		"""
 		Initialize the Language Model Manager.
@@ -52,6 +56,45 @@ class BaseLLM(ABC):
 		"""
 		pass
 
+	async def aprompt(self, instruction: str, max_tokens: int = 1024) -> str:
+		"""
+		Prompt the language model asynchronously. The default implementation runs `prompt` in a worker thread;
+		implementations with an asynchronous client should override it and raise on errors so that callers can retry.
+
+		Args:
+			instruction (str): The instruction to prompt the language model with.
+			max_tokens (int): Maximum number of tokens to generate in the response.
+
+		Returns:
+			str: The response generated by the language model.
+		"""
+		return await asyncio.to_thread(self.prompt, instruction, max_tokens)
+
+	def preview_messages(self, instruction: str) -> List[Dict[str, str]]:
+		"""
+		Get the message list that prompting with an instruction would send, without sending it.
+
+		Args:
+			instruction (str): The instruction.
+
+		Returns:
+			List[Dict[str, str]]: The messages.
+		"""
+		history = list(self.messages) if self.save_history else []
+		return history + [{"role": "user", "content": instruction}]
+
+	def record_exchange(self, instruction: str, response: str) -> None:
+		"""
+		Update the conversation history as if the model had answered an instruction with a response.
+
+		Args:
+			instruction (str): The instruction.
+			response (str): The response.
+		"""
+		if self.save_history:
+			self.messages.append({"role": "user", "content": instruction})
+			self.add_response(response)
+
 	@abstractmethod
 	def clear_context(self) -> None:
 		"""
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from itertools import zip_longest
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+try:
+	import pyarrow as pa
+	import pyarrow.parquet as pq
+except ImportError:  # Columnar logs are optional
+	pa = None
+	pq = None
+
+if TYPE_CHECKING:
+	import pandas as pd
+	from src.tournament import Tournament
+
+# Layout of a columnar experiment directory: one file per tournament in every table
+ROUNDS_DIR = "rounds"  # One row per agent and round
+AGENTS_DIR = "agents"  # One row per agent, with its texts replaced by hashes
+TEXTS_DIR = "texts"  # Content-addressed strategies, game rules and traces
+
+
+def require_pyarrow() -> None:
+	"""
+	Check that pyarrow is installed.
+
+	Raises:
+		ImportError: If pyarrow is not installed.
+	"""
+	if pa is None:
+		raise ImportError("Columnar tournament logs require pyarrow, install it with `pip install pyarrow`.")
+
+
+def content_hash(text: Optional[str]) -> Optional[str]:
+	"""
+	Compute the content address of a text.
+
+	Args:
+		text (Optional[str]): The text.
+
+	Returns:
+		Optional[str]: The hexadecimal SHA-256 digest of the text, or None if there is no text.
+	"""
+	if text is None:
+		return None
+	return hashlib.sha256(text.encode()).hexdigest()
+
+
+def write_tournament(
+	experiment_dir: str,
+	tournament: 'Tournament',
+	tournament_name: str = "tournament"
+) -> str:
+	"""
+	Log a tournament as Parquet tables instead of one JSON file per agent.
+
+	Every table of an experiment lives in its own directory, with one file per tournament, so that loading a whole
+	experiment is a single columnar read per table, see `load_experiment`. Strategies, game rules and trace messages
+	are stored once per tournament in the texts table and referenced from the agents table by their hash.
+
+	Args:
+		experiment_dir (str): The directory where the tournament logs will be saved.
+		tournament (Tournament): The tournament object containing all relevant data.
+		tournament_name (str): The name of the tournament (default is "tournament").
+
+	Returns:
+		str: The tournament's identifier, i.e. its name and timestamp, as used in the `tournament` column.
+
+	Raises:
+		ImportError: If pyarrow is not installed.
+	"""
+	require_pyarrow()
+	timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+	tournament_id = f"{tournament_name}_{timestamp}"
+
+	rounds = {"tournament": [], "agent": [], "round": [], "move": [], "opponent_move": [], "payoff": []}
+	agents = {key: [] for key in ("tournament", "name", "strategy_name", "strategy_hash", "game_rules_hash",
+								   "trace_messages_hash", "game_moves", "game_players", "status",
+								   "runtime_error_type", "total_payoff", "default_move", "attempts",
+								   "history_complete", "target_payoff", "winner")}
+	texts: Dict[str, Tuple[str, str]] = {}  # hash -> (kind, text)
+
+	winners = {winner.name for winner in tournament.get_winners()}
+	target_payoffs = tournament.target_payoffs or []
+	for index, agent in enumerate(tournament.agents + tournament.invalid_agents):
+		# Step 1: Record the rounds
+		for round_num, (move, opponent_move, payoff) in enumerate(
+				zip_longest(agent.moves, agent.opponent_moves, agent.payoffs)):
+			rounds["tournament"].append(tournament_id)
+			rounds["agent"].append(agent.name)
+			rounds["round"].append(round_num)
+			rounds["move"].append(move)
+			rounds["opponent_move"].append(opponent_move)
+			rounds["payoff"].append(None if payoff is None else float(payoff))
+
+		# Step 2: Deduplicate the agent's texts
+		hashes = {}
+		trace_messages = json.dumps(agent.trace_messages) if agent.trace_messages else None
+		for kind, text in (("strategy", agent.strategy), ("game_rules", agent.game.game_rules),
+						   ("trace_messages", trace_messages)):
+			hashes[kind] = content_hash(text)
+			if hashes[kind] is not None:
+				texts.setdefault(hashes[kind], (kind, text))
+
+		# Step 3: Record the agent
+		agents["tournament"].append(tournament_id)
+		agents["name"].append(agent.name)
+		agents["strategy_name"].append(agent.strategy_name)
+		agents["strategy_hash"].append(hashes["strategy"])
+		agents["game_rules_hash"].append(hashes["game_rules"])
+		agents["trace_messages_hash"].append(hashes["trace_messages"])
+		agents["game_moves"].append(list(agent.game.possible_moves or []))
+		agents["game_players"].append(list(agent.game.player_names or []))
+		agents["status"].append(agent.status)
+		agents["runtime_error_type"].append(agent.runtime_error_type)
+		agents["total_payoff"].append(float(agent.get_total_payoff()))
+		agents["default_move"].append(agent.default_move)
+		agents["attempts"].append(agent.attempts)
+		agents["history_complete"].append(agent.keep_history)
+		# Target payoffs are given for the valid agents, in order
+		has_target = index < min(len(target_payoffs), len(tournament.agents))
+		agents["target_payoff"].append(float(target_payoffs[index]) if has_target else None)
+		agents["winner"].append(agent.name in winners)
+
+	tables = {
+		ROUNDS_DIR: pa.table(rounds, schema=pa.schema([
+			("tournament", pa.string()), ("agent", pa.string()), ("round", pa.int32()), ("move", pa.string()),
+			("opponent_move", pa.string()), ("payoff", pa.float64())])),
+		AGENTS_DIR: pa.table(agents, schema=pa.schema([
+			("tournament", pa.string()), ("name", pa.string()), ("strategy_name", pa.string()),
+			("strategy_hash", pa.string()), ("game_rules_hash", pa.string()), ("trace_messages_hash", pa.string()),
+			("game_moves", pa.list_(pa.string())), ("game_players", pa.list_(pa.string())), ("status", pa.string()),
+			("runtime_error_type", pa.string()), ("total_payoff", pa.float64()), ("default_move", pa.string()),
+			("attempts", pa.int32()), ("history_complete", pa.bool_()), ("target_payoff", pa.float64()),
+			("winner", pa.bool_())])),
+		TEXTS_DIR: pa.table({"hash": list(texts), "kind": [kind for kind, _ in texts.values()],
+							 "text": [text for _, text in texts.values()]},
+							schema=pa.schema([("hash", pa.string()), ("kind", pa.string()), ("text", pa.string())]))
+	}
+	for table_dir, table in tables.items():
+		os.makedirs(os.path.join(experiment_dir, table_dir), exist_ok=True)
+		pq.write_table(table, os.path.join(experiment_dir, table_dir, f"{tournament_id}.parquet"))
+	return tournament_id
+
+
+def load_experiment(experiment_dir: str) -> Tuple['pd.DataFrame', 'pd.DataFrame', 'pd.DataFrame']:
+	"""
+	Load every tournament of a columnar experiment directory.
+
+	Args:
+		experiment_dir (str): The directory the tournaments were logged to by `write_tournament`.
+
+	Returns:
+		Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]: The rounds, the agents and the deduplicated texts, where the
+			texts are indexed by hash, e.g. `texts.loc[agents.strategy_hash, "text"]`.
+
+	Raises:
+		ImportError: If pyarrow is not installed.
+	"""
+	require_pyarrow()
+	rounds, agents, texts = (pq.read_table(os.path.join(experiment_dir, table_dir)).to_pandas()
+							 for table_dir in (ROUNDS_DIR, AGENTS_DIR, TEXTS_DIR))
+	texts = texts.drop_duplicates("hash").set_index("hash")
+	return rounds, agents, texts
+
+
+def load_texts(experiment_dir: str, hashes: List[str]) -> Dict[str, str]:
+	"""
+	Look up texts by hash without loading the rounds and agents of an experiment.
+
+	Args:
+		experiment_dir (str): The directory the tournaments were logged to by `write_tournament`.
+		hashes (List[str]): The hashes to look up.
+
+	Returns:
+		Dict[str, str]: The texts found, by hash.
+
+	Raises:
+		ImportError: If pyarrow is not installed.
+	"""
+	require_pyarrow()
+	table = pq.read_table(os.path.join(experiment_dir, TEXTS_DIR), columns=["hash", "text"],
+						  filters=[("hash", "in", list(hashes))])
+	return dict(zip(table.column("hash").to_pylist(), table.column("text").to_pylist()))
@@ -0,0 +1,226 @@
+:- module(engine, [
+    load_program/3,
+    load_shared_solver/3,
+    load_shared_program/3,
+    prepare_module/2,
+    defined_predicate/2,
+    introspect/7,
+    copy_module/2,
+    snapshot_state/1,
+    reset_state/1,
+    observe/4,
+    bounded_call/2,
+    play_match/6,
+    release_module/2
+]).
+
+% Helpers run inside every pooled SWI-Prolog server. Each agent's game rules
+% and strategy live in their own module, which inherits the shared,
+% domain-independent solver from a module loaded once per server.
+
+% Load program text into a module without touching the disk. Id is used as
+% the source file name, so messages report their line numbers against it.
+load_program(Module, Id, Text):-
+    setup_call_cleanup(open_string(Text, Stream),
+                       load_files(Module:Id, [stream(Stream)]),
+                       close(Stream)).
+
+% Load the domain-independent solver into a shared module.
+load_shared_solver(SolverModule, Id, Text):-
+    load_shared_program(SolverModule, Id, Text).
+
+% Load a program into a module shared by all threads of the server, e.g.
+% a template that is copied into agent modules by copy_module/2.
+load_shared_program(Module, Id, Text):-
+    with_mutex(engine_load, load_program(Module, Id, Text)).
+
+% Create (or reuse) an agent module inheriting from the shared solver,
+% with the solver's dynamic predicates declared locally so that they can be
+% (re)initialised per agent.
+prepare_module(Module, SolverModule):-
+    add_import_module(Module, SolverModule, start),
+    forall(( predicate_property(SolverModule:Head, dynamic),
+             \+ predicate_property(SolverModule:Head, imported_from(_)),
+             functor(Head, Name, Arity)
+           ),
+           dynamic(Module:Name/Arity)).
+
+% A predicate is defined if the module or one of its default modules
+% defines it. Autoloadable library predicates do not count.
+defined_predicate(Module, Name/Arity):-
+    default_module(Module, Source),
+    current_predicate(Source:Name/Arity), !.
+
+% Inspect an agent's program in one call: the required predicates it does
+% not define (as atoms), its possible moves, its player names, the first
+% player's default move ([] or [Move]) and that player's payoff for every
+% pair of moves as [Move1, Move2, Payoff]. Errors raised by the program
+% while it is inspected leave the affected values empty, but running out of
+% time or inferences aborts the query, see catch_program/1.
+introspect(Module, Predicates, Missing, Moves, Players, DefaultMove, Payoffs):-
+    findall(Text,
+            ( member(Predicate, Predicates),
+              \+ defined_predicate(Module, Predicate),
+              term_to_atom(Predicate, Text)
+            ),
+            Missing),
+    findall(Move, catch_program(Module:possible(move(_, Move), s0)), Moves),
+    findall(Name, catch_program(Module:holds(player(Name), s0)), Players),
+    (   Players = [Player|_],
+        catch_program(once(Module:initially(default_move(Player, Default), s0)))
+    ->  DefaultMove = [Default]
+    ;   DefaultMove = []
+    ),
+    (   Players = [Player1, Player2|_]
+    ->  findall([Move1, Move2, Payoff],
+                catch_program(Module:( possible(move(Player1, Move1), s0),
+                                       possible(move(Player2, Move2), s0),
+                                       once(finally(goal(Player1, Payoff),
+                                                    do(move(Player1, Move1), do(move(Player2, Move2), s0))))
+                                     )),
+                Payoffs)
+    ;   Payoffs = []
+    ).
+
+% Run a goal of an agent's program, failing if it raises an error, except
+% when the query runs out of its time or inference budget: that error is
+% rethrown so that the caller sees the violation.
+catch_program(Goal):-
+    catch(Goal, Error, ( budget_error(Error) -> throw(Error) ; fail )).
+
+budget_error(time_limit_exceeded).
+budget_error(time_limit_exceeded(_)).
+budget_error(inference_limit_exceeded).
+
+% Copy the local predicates of one module into another, so that a program
+% loaded once can be instantiated again without consulting its sources.
+copy_module(From, To):-
+    findall(Head,
+            ( current_predicate(From:Name/Arity),
+              functor(Head, Name, Arity),
+              \+ predicate_property(From:Head, imported_from(_))
+            ),
+            Heads),
+    forall(member(Head, Heads), copy_predicate(From, To, Head)).
+
+copy_predicate(From, To, Head):-
+    functor(Head, Name, Arity),
+    dynamic(To:Name/Arity),
+    forall(clause(From:Head, Body), assertz(To:(Head :- Body))).
+
+% Remember the initial situation of an agent, i.e. its initially/2 clauses,
+% so that it can be restored between matches without reloading the program.
+snapshot_state(Module):-
+    dynamic(Module:initially_snapshot/2),
+    retractall(Module:initially_snapshot(_, _)),
+    forall(clause(Module:initially(Fluent, Situation), Body),
+           assertz(Module:initially_snapshot(initially(Fluent, Situation), Body))).
+
+% Restore the initial situation saved by snapshot_state/1 and forget the
+% observed history.
+reset_state(Module):-
+    retractall(Module:initially(_, _)),
+    forall(Module:initially_snapshot(Head, Body), assertz(Module:(Head :- Body))),
+    retractall(Module:history(_, _, _)),
+    retractall(Module:history_rounds(_)).
+
+% Let an agent observe its opponent's move: overwrite last_move/2 and, if
+% History is true, append the move to history/3 in constant time.
+observe(Module, Opponent, Move, History):-
+    Module:initialise(last_move(Opponent, Move), s0),
+    (   History == true
+    ->  (   retract(Module:history_rounds(Rounds0))
+        ->  true
+        ;   Rounds0 = 0
+        ),
+        Rounds is Rounds0 + 1,
+        assertz(Module:history_rounds(Rounds)),
+        assertz(Module:history(Opponent, Rounds, Move))
+    ;   true
+    ).
+
+% Run Goal within an inference budget, throwing inference_limit_exceeded
+% if the budget runs out, so that a looping program cannot stall a query.
+bounded_call(Limit, Goal):-
+    call_with_inference_limit(Goal, Limit, Result),
+    (   Result == inference_limit_exceeded
+    ->  throw(inference_limit_exceeded)
+    ;   true
+    ).
+
+% Play Rounds rounds between two agents loaded into modules of this server.
+% An agent is agent(Module, Player, Opponent, History), where History tells
+% whether the agent tracks its opponent's moves in history/3. Every select and update step
+% may use at most Limit inferences (inf for no limit). Results holds [Move1,
+% Move2, Payoff1, Payoff2] for every completed round; Outcome is completed,
+% or failed(Stage, Agent) / exceeded(Stage, Agent) for the first stage
+% (select or update) that failed or ran out of inferences.
+play_match(A, B, Limit, Rounds, Results, Outcome):-
+    (   Rounds =< 0
+    ->  Results = [], Outcome = completed
+    ;   match_round(A, B, Limit, Round, Status),
+        (   Status == ok
+        ->  Results = [Round|Rest],
+            Remaining is Rounds - 1,
+            play_match(A, B, Limit, Remaining, Rest, Outcome)
+        ;   Results = [], Outcome = Status
+        )
+    ).
+
+% A round mirrors Tournament._play_match: both agents select a move, then
+% each one scores the round and observes the opponent's move in turn.
+match_round(A, B, Limit, [M1, M2, U1, U2], Status):-
+    run_steps([ step(select, 1, select_move(A, M1)),
+                step(select, 2, select_move(B, M2)),
+                step(update, 1, update_agent(A, M1, M2, U1)),
+                step(update, 2, update_agent(B, M2, M1, U2))
+              ], Limit, Status).
+
+run_steps([], _, ok).
+run_steps([step(Stage, Agent, Goal)|Steps], Limit, Status):-
+    bounded_once(Limit, Goal, Result),
+    (   Result == true
+    ->  run_steps(Steps, Limit, Status)
+    ;   Result == false
+    ->  Status = failed(Stage, Agent)
+    ;   Status = exceeded(Stage, Agent)
+    ).
+
+% Result is true if Goal succeeds within Limit inferences, false if it
+% fails and exceeded if it runs out of inferences.
+bounded_once(inf, Goal, Result):- !,
+    (   once(Goal)
+    ->  Result = true
+    ;   Result = false
+    ).
+bounded_once(Limit, Goal, Result):-
+    (   call_with_inference_limit(Goal, Limit, Outcome)
+    ->  (   Outcome == inference_limit_exceeded
+        ->  Result = exceeded
+        ;   Result = true
+        )
+    ;   Result = false
+    ).
+
+select_move(agent(Module, Player, _, _), Move):-
+    once(Module:select(Player, _, s0, Move)).
+
+update_agent(agent(Module, Player, Opponent, History), Move, OpponentMove, Payoff):-
+    once(Module:finally(goal(Player, Payoff),
+                        do(move(Player, Move), do(move(Opponent, OpponentMove), s0)))),
+    observe(Module, Opponent, OpponentMove, History).
+
+% Unload the sources loaded into an agent module and wipe its predicates,
+% leaving an empty module that can be handed to the next agent.
+release_module(Module, Files):-
+    forall(member(File, Files), unload_file(File)),
+    findall(Name/Arity,
+            ( current_predicate(Module:Name/Arity),
+              functor(Head, Name, Arity),
+              \+ predicate_property(Module:Head, imported_from(_))
+            ),
+            Predicates),
+    forall(member(Predicate, Predicates), abolish(Module:Predicate)),
+    findall(Import, import_module(Module, Import), Imports),
+    forall(member(Import, Imports), delete_import_module(Module, Import)),
+    add_import_module(Module, user, end).
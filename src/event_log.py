@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+class RoundEventLog:
+	"""
+	A buffered JSONL stream of the events of a tournament, written while the matches are played.
+
+	Events are appended to a buffer and written out once `flush_every` events have accumulated or `flush_interval`
+	seconds have passed since the last write, so a tournament that crashes leaves a record of every round up to the
+	last flush. The log is thread-safe, so matches played in parallel can share it.
+
+	Every line is a JSON object with an "event" field: "round" events carry the match number (the index of the agent
+	pair), the round number, both agents' names, moves and payoffs; "match_end" events carry whether both agents stayed
+	valid.
+
+	Attributes:
+		path (str): Path of the JSONL file; events are appended to it.
+		flush_every (int): Number of buffered events that triggers a write.
+		flush_interval (float): Seconds after which buffered events are written at the next event.
+		events (int): Number of events recorded.
+	"""
+
+	def __init__(self, path: str, flush_every: int = 1000, flush_interval: float = 5.0):
+		"""
+		Open the log.
+
+		Args:
+			path (str): Path of the JSONL file; events are appended to it.
+			flush_every (int): Number of buffered events that triggers a write (default is 1000).
+			flush_interval (float): Seconds after which buffered events are written (default is 5.0).
+		"""
+		self.path = path
+		self.flush_every = flush_every
+		self.flush_interval = flush_interval
+		self.events = 0
+		directory = os.path.dirname(path)
+		if directory and not os.path.exists(directory):
+			os.makedirs(directory)
+
+		self._lock = threading.Lock()
+		self._buffer: List[str] = []
+		self._last_flush = time.monotonic()
+		self._file = open(path, "a")
+
+	def record(self, event: str, **fields: Any) -> None:
+		"""
+		Record an event.
+
+		Args:
+			event (str): The event type, e.g. "round".
+			**fields (Any): The event's JSON-serializable fields.
+		"""
+		line = json.dumps({"event": event, **fields})
+		with self._lock:
+			self._buffer.append(line)
+			self.events += 1
+			if (len(self._buffer) >= self.flush_every
+					or time.monotonic() - self._last_flush >= self.flush_interval):
+				self._write()
+
+	def record_round(self, match_num: Optional[int], round_num: int, agent1_name: str, agent2_name: str,
+					 move_1: str, move_2: str, payoff_1: float, payoff_2: float) -> None:
+		"""
+		Record a round of a match.
+
+		Args:
+			match_num (Optional[int]): The index of the agent pair in the tournament.
+			round_num (int): The round number within the match.
+			agent1_name (str): The first agent's name.
+			agent2_name (str): The second agent's name.
+			move_1 (str): The first agent's move.
+			move_2 (str): The second agent's move.
+			payoff_1 (float): The first agent's payoff.
+			payoff_2 (float): The second agent's payoff.
+		"""
+		self.record("round", match=match_num, round=round_num, agent_1=agent1_name, agent_2=agent2_name,
+					move_1=move_1, move_2=move_2, payoff_1=payoff_1, payoff_2=payoff_2)
+
+	def flush(self) -> None:
+		"""
+		Write all buffered events.
+		"""
+		with self._lock:
+			self._write()
+
+	def _write(self) -> None:
+		"""
+		Write the buffered events; the caller holds the lock.
+		"""
+		if self._buffer and not self._file.closed:
+			self._file.write("\n".join(self._buffer) + "\n")
+			self._file.flush()
+		self._buffer = []
+		self._last_flush = time.monotonic()
+
+	def close(self) -> None:
+		"""
+		Write all buffered events and close the file.
+		"""
+		with self._lock:
+			self._write()
+			self._file.close()
+
+	def __enter__(self) -> 'RoundEventLog':
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback) -> None:
+		self.close()
+
+
+def read_events(path: str) -> List[Dict[str, Any]]:
+	"""
+	Read the events of a log, skipping a truncated last line left by a crash.
+
+	Args:
+		path (str): Path of the JSONL file.
+
+	Returns:
+		List[Dict[str, Any]]: The events, in the order they were written.
+	"""
+	events = []
+	with open(path) as file:
+		for line in file:
+			try:
+				events.append(json.loads(line))
+			except json.JSONDecodeError:
+				break
+	return events
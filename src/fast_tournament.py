@@ -0,0 +1,288 @@
+import hashlib
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from src.agent import Agent
+from src.setup_logger import logger
+from src.strategy_compiler import StrategyCompiler
+from src.tournament import Tournament
+from src.utils import read_file_cached, set_normalized_path
+
+# Deterministic strategies as automata over the two moves of a game. Given the index of the default move (0 or 1),
+# each automaton gives the move played after the opponent played move 0, after it played move 1, and in the first
+# round. Moves are indexed in sorted order of their names.
+STRATEGY_AUTOMATA = {
+	"tit-for-tat": lambda default: (0, 1, default),
+	"anti-tit-for-tat": lambda default: (1, 0, default),
+	"default_move": lambda default: (default, default, default),
+	"anti-default-move": lambda default: (1 - default, 1 - default, 1 - default),
+}
+
+# The index of the "no move yet" state in an automaton's transitions
+FIRST_ROUND = 2
+
+# Directory of the strategy programs the automata describe, relative to the tournament's root
+STRATEGIES_DIR = "DATA/STRATEGIES"
+
+
+def simulate_matches(
+		transitions_a: np.ndarray,
+		transitions_b: np.ndarray,
+		payoffs_a: np.ndarray,
+		payoffs_b: np.ndarray,
+		num_rounds: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+	"""
+	Simulate a batch of iterated 2x2 matches between strategy automata, all pairs at once.
+
+	Args:
+		transitions_a (np.ndarray): (P, 3) moves of the first player of every pair, see `STRATEGY_AUTOMATA`.
+		transitions_b (np.ndarray): (P, 3) moves of the second player of every pair.
+		payoffs_a (np.ndarray): (P, 2, 2) payoff of the first player, indexed by its own and the opponent's move.
+		payoffs_b (np.ndarray): (P, 2, 2) payoff of the second player, indexed by its own and the opponent's move.
+		num_rounds (int): The number of rounds of every match.
+
+	Returns:
+		Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: (P, num_rounds) moves of the first and second players,
+			followed by their (P, num_rounds) payoffs.
+	"""
+	num_pairs = transitions_a.shape[0]
+	pairs = np.arange(num_pairs)
+	moves_a = np.empty((num_pairs, num_rounds), dtype=np.int8)
+	moves_b = np.empty((num_pairs, num_rounds), dtype=np.int8)
+	rewards_a = np.empty((num_pairs, num_rounds), dtype=np.float64)
+	rewards_b = np.empty((num_pairs, num_rounds), dtype=np.float64)
+
+	last_a = np.full(num_pairs, FIRST_ROUND, dtype=np.int64)
+	last_b = np.full(num_pairs, FIRST_ROUND, dtype=np.int64)
+	for round_num in range(num_rounds):
+		move_a = transitions_a[pairs, last_b]
+		move_b = transitions_b[pairs, last_a]
+		moves_a[:, round_num] = move_a
+		moves_b[:, round_num] = move_b
+		rewards_a[:, round_num] = payoffs_a[pairs, move_a, move_b]
+		rewards_b[:, round_num] = payoffs_b[pairs, move_b, move_a]
+		last_a, last_b = move_a, move_b
+
+	return moves_a, moves_b, rewards_a, rewards_b
+
+
+def simulate_matrix_sweep(
+		matrices: np.ndarray,
+		strategies: Sequence[str],
+		num_rounds: int,
+		default_move: int = 0
+) -> np.ndarray:
+	"""
+	Play every pair of strategies on every payoff matrix, e.g. to sweep thousands of games in one call.
+
+	Args:
+		matrices (np.ndarray): (M, 2, 2, 2) payoffs, where `matrices[m, i, j]` holds the row player's and the column
+			player's payoff when they play moves i and j.
+		strategies (Sequence[str]): Names of strategies in `STRATEGY_AUTOMATA`.
+		num_rounds (int): The number of rounds of every match.
+		default_move (int): The index of both players' default move (default is 0).
+
+	Returns:
+		np.ndarray: (M, S, S, 2) total payoffs of the row and the column player, for every matrix and every pair of
+			row and column strategies.
+
+	Raises:
+		ValueError: If a strategy has no automaton.
+	"""
+	unknown = [name for name in strategies if name not in STRATEGY_AUTOMATA]
+	if unknown:
+		raise ValueError(f"No automaton for strategies {unknown}.")
+
+	matrices = np.asarray(matrices, dtype=np.float64)
+	num_matrices, num_strategies = matrices.shape[0], len(strategies)
+	automata = np.array([STRATEGY_AUTOMATA[name](default_move) for name in strategies], dtype=np.int64)
+
+	# One pair per (matrix, row strategy, column strategy), in C order
+	matrix_index, row_index, column_index = (index.ravel() for index in np.meshgrid(
+		np.arange(num_matrices), np.arange(num_strategies), np.arange(num_strategies), indexing="ij"))
+	payoffs_row = matrices[matrix_index, :, :, 0]
+	payoffs_column = matrices[matrix_index, :, :, 1].transpose(0, 2, 1)
+
+	_, _, rewards_row, rewards_column = simulate_matches(automata[row_index], automata[column_index],
+														 payoffs_row, payoffs_column, num_rounds)
+	totals = np.stack([rewards_row.sum(axis=1), rewards_column.sum(axis=1)], axis=-1)
+	return totals.reshape(num_matrices, num_strategies, num_strategies, 2)
+
+
+class FastTournament(Tournament):
+	"""
+	A tournament that simulates matches between agents with known deterministic strategies in 2x2 games as batched
+	NumPy operations.
+
+	When the agent pairs are generated, every pairing of agents whose strategy program is one of those described in
+	`STRATEGY_AUTOMATA` and whose payoff table covers both moves is simulated once, all pairings together. Matches between such agents are then
+	recorded from the simulation, in the same order as if they were played, and all other matches are played in
+	Prolog as usual. Anti-tit-for-tat assumes that the opposite of a move is the game's other move. A strategy is only
+	recognized if its program is identical to the file in DATA/STRATEGIES, not by its name alone, so an autoformalized
+	strategy named after a known one is still played as written. Every payoff in the table, including 0, is scored
+	as it is when the match is played in Python or in the engine; only a missing payoff sends the match to Prolog.
+
+	Other strategies, e.g. autoformalized ones, can be simulated too if `compile_strategies` is set: they are then
+	characterized once by a `StrategyCompiler`, and simulated if they turn out to be deterministic.
+
+	Attributes:
+		simulated_matches (int): Number of matches recorded from the simulation.
+		compiler (Optional[StrategyCompiler]): Compiles unknown strategies to automata, if enabled.
+	"""
+
+	def __init__(self, *args, compile_strategies: bool = False, **kwargs):
+		"""
+		Initialize the tournament. Takes the same arguments as `Tournament`, and:
+
+		Args:
+			compile_strategies (bool): Whether to compile strategies without a known automaton by probing them
+				(default is False).
+		"""
+		super().__init__(*args, **kwargs)
+		self.compiler = StrategyCompiler() if compile_strategies else None
+		self.simulated_matches = 0
+		self._counter_lock = threading.Lock()
+		self._simulated: Dict[tuple, Tuple[List[str], List[str], List[float], List[float]]] = {}
+		self._strategy_hashes: Dict[str, Optional[str]] = {}
+
+	def _generate_agent_pairs(self) -> List[Tuple[Agent, Agent]]:
+		"""
+		Generate the agent pairs and simulate all matches between agents with known strategies.
+
+		Returns:
+			List[Tuple[Agent, Agent]]: A list of tuples representing agent pairs.
+		"""
+		agent_pairs = super()._generate_agent_pairs()
+		self._simulate_known_matches(agent_pairs)
+		return agent_pairs
+
+	def _simulate_known_matches(self, agent_pairs: List[Tuple[Agent, Agent]]) -> None:
+		"""
+		Simulate every distinct pairing of strategy automata among the agent pairs in one batch.
+
+		Args:
+			agent_pairs (List[Tuple[Agent, Agent]]): List of tuples representing pairs of agents.
+		"""
+		keys = []
+		for agent1, agent2 in agent_pairs:
+			key = self._match_key(agent1, agent2)
+			if key is not None and key not in self._simulated and key not in keys:
+				keys.append(key)
+		if not keys:
+			return
+
+		transitions_a = np.array([automaton1[1] for automaton1, _ in keys], dtype=np.int64)
+		transitions_b = np.array([automaton2[1] for _, automaton2 in keys], dtype=np.int64)
+		payoffs_a = np.array([automaton1[2] for automaton1, _ in keys], dtype=np.float64).reshape(-1, 2, 2)
+		payoffs_b = np.array([automaton2[2] for _, automaton2 in keys], dtype=np.float64).reshape(-1, 2, 2)
+		moves_a, moves_b, rewards_a, rewards_b = simulate_matches(transitions_a, transitions_b,
+																  payoffs_a, payoffs_b, self.num_rounds)
+
+		for index, (automaton1, _) in enumerate(keys):
+			moves = automaton1[0]
+			self._simulated[keys[index]] = ([moves[move] for move in moves_a[index]],
+											[moves[move] for move in moves_b[index]],
+											rewards_a[index].tolist(), rewards_b[index].tolist())
+		logger.debug(f"Simulated {len(keys)} distinct matches for {len(agent_pairs)} agent pairs.")
+
+	def _automaton(self, agent: Agent) -> Optional[tuple]:
+		"""
+		Describe an agent as a strategy automaton, if it plays a known strategy in a 2x2 game.
+
+		Args:
+			agent (Agent): The agent.
+
+		Returns:
+			Optional[tuple]: The agent's sorted moves, its transitions and its flattened 2x2 payoff table, or None
+				if the agent's matches must be played in Prolog.
+		"""
+		if type(agent).play is not Agent.play or not agent.solver or not agent.valid:
+			return None
+		moves = tuple(sorted(agent.game.get_possible_moves() or []))
+		if len(moves) != 2 or agent.default_move not in moves:
+			return None
+
+		automaton = self._known_automaton(agent)
+		if automaton is not None:
+			transitions = automaton(moves.index(agent.default_move))
+		elif self.compiler is not None:
+			compiled = self.compiler.compile(agent)
+			transitions = compiled.to_indices(agent.default_move) if compiled else None
+		else:
+			transitions = None
+		if transitions is None:
+			return None
+
+		payoffs = tuple(agent.payoff_table.get((move, opponent_move)) for move in moves for opponent_move in moves)
+		if any(payoff is None for payoff in payoffs):
+			return None
+		return moves, transitions, payoffs
+
+	def _known_automaton(self, agent: Agent) -> Optional[Callable[[int], Tuple[int, int, int]]]:
+		"""
+		Get the automaton of an agent's strategy, if its program is the known strategy file it is named after.
+
+		Args:
+			agent (Agent): The agent.
+
+		Returns:
+			Optional[Callable[[int], Tuple[int, int, int]]]: The automaton from `STRATEGY_AUTOMATA`, or None if the
+				strategy is unknown or differs from the file.
+		"""
+		automaton = STRATEGY_AUTOMATA.get(agent.strategy_name)
+		if automaton is None or not agent.strategy:
+			return None
+		if agent.strategy_name not in self._strategy_hashes:
+			program = read_file_cached(os.path.join(self.root, set_normalized_path(STRATEGIES_DIR),
+													f"{agent.strategy_name}.pl"))
+			self._strategy_hashes[agent.strategy_name] = (hashlib.sha256(program.encode()).hexdigest()
+														  if program is not None else None)
+		if hashlib.sha256(agent.strategy.encode()).hexdigest() != self._strategy_hashes[agent.strategy_name]:
+			return None
+		return automaton
+
+	def _match_key(self, agent1: Agent, agent2: Agent) -> Optional[tuple]:
+		"""
+		Get the key of a match between two agents in the simulation results.
+
+		Args:
+			agent1 (Agent): The first agent.
+			agent2 (Agent): The second agent.
+
+		Returns:
+			Optional[tuple]: The pair of automata, or None if the match cannot be simulated.
+		"""
+		automaton1, automaton2 = self._automaton(agent1), self._automaton(agent2)
+		if automaton1 is None or automaton2 is None or automaton1[0] != automaton2[0]:
+			return None
+		return automaton1, automaton2
+
+	def _play_match(self, agent1: Agent, agent2: Agent, match_num: Optional[int] = None) -> bool:
+		"""
+		Record a simulated match between two agents, or play it in Prolog if it was not simulated.
+
+		Args:
+			agent1 (Agent): The first agent.
+			agent2 (Agent): The second agent.
+			match_num (Optional[int]): The index of the agent pair, reported in the event log (default is None).
+
+		Returns:
+			bool: True if both agents are valid throughout the match, False otherwise.
+		"""
+		key = self._match_key(agent1, agent2)
+		match = self._simulated.get(key) if key is not None else None
+		if match is None:
+			return super()._play_match(agent1, agent2, match_num)
+
+		# Record round by round, so that an agent playing against itself interleaves both sides as in Prolog play
+		moves_1, moves_2, payoffs_1, payoffs_2 = match
+		for round_num, (move_agent_1, move_agent_2, payoff_1, payoff_2) in enumerate(
+				zip(moves_1, moves_2, payoffs_1, payoffs_2)):
+			agent1.record_round(move_agent_1, move_agent_2, payoff_1)
+			agent2.record_round(move_agent_2, move_agent_1, payoff_2)
+			self._log_round(match_num, round_num, agent1, agent2, move_agent_1, move_agent_2, payoff_1, payoff_2)
+		with self._counter_lock:
+			self.simulated_matches += 1
+		return True
@@ -0,0 +1,308 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Upper bounds of the latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Name of the label that distinguishes the series of a histogram family in the Prometheus dump
+FAMILY_LABELS = {"solver_query": "kind", "llm_call": "model"}
+
+
+class LatencyHistogram:
+	"""
+	A latency histogram with fixed buckets, counting errors alongside.
+
+	Attributes:
+		buckets (Sequence[float]): Upper bounds of the buckets, in seconds.
+		counts (List[int]): Observations per bucket, the last one counting those above every bound.
+		count (int): Number of observations.
+		total (float): Sum of the observed latencies.
+		errors (int): Number of observations that ended in an error.
+	"""
+
+	def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+		"""
+		Initialize an empty histogram.
+
+		Args:
+			buckets (Sequence[float]): Upper bounds of the buckets, in seconds (default is `DEFAULT_BUCKETS`).
+		"""
+		self.buckets = buckets
+		self.counts = [0] * (len(buckets) + 1)
+		self.count = 0
+		self.total = 0.0
+		self.errors = 0
+
+	def observe(self, seconds: float, error: bool = False) -> None:
+		"""
+		Add an observation.
+
+		Args:
+			seconds (float): The latency.
+			error (bool): Whether the observed call ended in an error (default is False).
+		"""
+		self.counts[bisect_left(self.buckets, seconds)] += 1
+		self.count += 1
+		self.total += seconds
+		if error:
+			self.errors += 1
+
+	def quantile(self, q: float) -> Optional[float]:
+		"""
+		Estimate a quantile as the upper bound of the bucket it falls in.
+
+		Args:
+			q (float): The quantile, between 0 and 1.
+
+		Returns:
+			Optional[float]: The estimate (infinity above the last bound), or None without observations.
+		"""
+		if not self.count:
+			return None
+		rank = q * self.count
+		cumulative = 0
+		for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+			cumulative += count
+			if cumulative >= rank:
+				return bound
+		return float("inf")
+
+	def snapshot(self) -> Dict[str, Any]:
+		"""
+		Get the histogram's current values.
+
+		Returns:
+			Dict[str, Any]: The count, errors, total and mean latency, estimated 50th, 90th and 99th percentiles and
+				the cumulative count of every bucket.
+		"""
+		cumulative = 0
+		buckets = {}
+		for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+			cumulative += count
+			buckets[bound] = cumulative
+		return {
+			"count": self.count,
+			"errors": self.errors,
+			"total": self.total,
+			"mean": self.total / self.count if self.count else None,
+			"p50": self.quantile(0.5),
+			"p90": self.quantile(0.9),
+			"p99": self.quantile(0.99),
+			"buckets": buckets,
+		}
+
+
+class Metrics:
+	"""
+	An optional registry of latency histograms and counters for the hot paths: Solver queries by kind (consult,
+	select, payoff, initialise, current_predicate, ...) and LLM calls by model, with their token counts and retries.
+
+	Recording is disabled by default and then costs a single attribute check per call. Enable it with
+	`Metrics.get_metrics().enable()` and read it with `snapshot` or `to_prometheus`.
+
+	Attributes:
+		enabled (bool): Whether observations are recorded.
+	"""
+
+	_instance: Optional['Metrics'] = None
+	_instance_lock = threading.Lock()
+
+	def __init__(self, enabled: bool = False, buckets: Sequence[float] = DEFAULT_BUCKETS):
+		"""
+		Initialize an empty registry.
+
+		Args:
+			enabled (bool): Whether to record observations (default is False).
+			buckets (Sequence[float]): Upper bounds of the histogram buckets, in seconds.
+		"""
+		self.enabled = enabled
+		self.buckets = buckets
+		self._lock = threading.Lock()
+		self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+		self._counters: Dict[Tuple[str, str], float] = {}
+
+	@classmethod
+	def get_metrics(cls) -> 'Metrics':
+		"""
+		Get the process-wide registry, creating it on first use.
+
+		Returns:
+			Metrics: The shared registry.
+		"""
+		if cls._instance is None:  # Checked without the lock first, as this is called on every solver query
+			with cls._instance_lock:
+				if cls._instance is None:
+					cls._instance = cls()
+		return cls._instance
+
+	def enable(self) -> None:
+		"""
+		Start recording observations.
+		"""
+		self.enabled = True
+
+	def disable(self) -> None:
+		"""
+		Stop recording observations; recorded values are kept.
+		"""
+		self.enabled = False
+
+	def reset(self) -> None:
+		"""
+		Remove all recorded values.
+		"""
+		with self._lock:
+			self._histograms.clear()
+			self._counters.clear()
+
+	def observe(self, family: str, label: str, seconds: float, error: bool = False) -> None:
+		"""
+		Record the latency of a call.
+
+		Args:
+			family (str): The kind of call, e.g. "solver_query".
+			label (str): The series within the family, e.g. the query kind "select".
+			seconds (float): The latency.
+			error (bool): Whether the call raised (default is False).
+		"""
+		if not self.enabled:
+			return
+		with self._lock:
+			histogram = self._histograms.get((family, label))
+			if histogram is None:
+				histogram = self._histograms[(family, label)] = LatencyHistogram(self.buckets)
+			histogram.observe(seconds, error)
+
+	def increment(self, counter: str, label: str = "", amount: float = 1) -> None:
+		"""
+		Add to a counter.
+
+		Args:
+			counter (str): The counter name, e.g. "llm_prompt_tokens".
+			label (str): The series within the counter, e.g. the model name (default is none).
+			amount (float): The amount to add (default is 1).
+		"""
+		if not self.enabled:
+			return
+		with self._lock:
+			self._counters[(counter, label)] = self._counters.get((counter, label), 0) + amount
+
+	@contextmanager
+	def timer(self, family: str, label: str) -> Iterator[None]:
+		"""
+		Record the latency of a block, as an error if it raises.
+
+		Args:
+			family (str): The kind of call.
+			label (str): The series within the family.
+		"""
+		if not self.enabled:
+			yield
+			return
+		start = time.perf_counter()
+		error = False
+		try:
+			yield
+		except BaseException:
+			error = True
+			raise
+		finally:
+			self.observe(family, label, time.perf_counter() - start, error)
+
+	def snapshot(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+		"""
+		Get the current values of all histograms and counters.
+
+		Returns:
+			Dict[str, Dict[str, Dict[str, Any]]]: Histogram snapshots under "histograms" and counter values under
+				"counters", both by name and then by label.
+		"""
+		with self._lock:
+			histograms: Dict[str, Dict[str, Any]] = {}
+			for (family, label), histogram in self._histograms.items():
+				histograms.setdefault(family, {})[label] = histogram.snapshot()
+			counters: Dict[str, Dict[str, Any]] = {}
+			for (counter, label), value in self._counters.items():
+				counters.setdefault(counter, {})[label] = value
+		return {"histograms": histograms, "counters": counters}
+
+	def to_prometheus(self, prefix: str = "autoformalizing_agents") -> str:
+		"""
+		Render all histograms and counters in the Prometheus text exposition format.
+
+		Args:
+			prefix (str): Prefix of every metric name (default is "autoformalizing_agents").
+
+		Returns:
+			str: The metrics, one sample per line.
+		"""
+		snapshot = self.snapshot()
+		lines: List[str] = []
+		for family, series in sorted(snapshot["histograms"].items()):
+			label_name = FAMILY_LABELS.get(family, "label")
+			name = f"{prefix}_{family}_seconds"
+			lines.append(f"# TYPE {name} histogram")
+			for label, values in sorted(series.items()):
+				labels = f'{label_name}="{escape_label(label)}"'
+				for bound, count in values["buckets"].items():
+					bound = "+Inf" if bound == float("inf") else repr(bound)
+					lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+				lines.append(f"{name}_sum{{{labels}}} {values['total']}")
+				lines.append(f"{name}_count{{{labels}}} {values['count']}")
+			errors = f"{prefix}_{family}_errors_total"
+			lines.append(f"# TYPE {errors} counter")
+			for label, values in sorted(series.items()):
+				lines.append(f'{errors}{{{label_name}="{escape_label(label)}"}} {values["errors"]}')
+		for counter, series in sorted(snapshot["counters"].items()):
+			name = f"{prefix}_{counter}_total"
+			lines.append(f"# TYPE {name} counter")
+			for label, value in sorted(series.items()):
+				labels = f'{{label="{escape_label(label)}"}}' if label else ""
+				lines.append(f"{name}{labels} {value}")
+		return "\n".join(lines) + "\n"
+
+	def write_prometheus(self, path: str, prefix: str = "autoformalizing_agents") -> None:
+		"""
+		Write the Prometheus text dump to a file, e.g. for the node exporter's textfile collector.
+
+		Args:
+			path (str): The output file.
+			prefix (str): Prefix of every metric name (default is "autoformalizing_agents").
+		"""
+		with open(path, "w") as file:
+			file.write(self.to_prometheus(prefix))
+
+
+def record_llm_call(model: str, seconds: float, error: bool = False, usage: Optional[Any] = None) -> None:
+	"""
+	Record an LLM call in the shared registry: its latency and, if the API reported them, its token counts.
+
+	Args:
+		model (str): The model name.
+		seconds (float): The latency of the call.
+		error (bool): Whether the call failed (default is False).
+		usage (Optional[Any]): The usage reported by the API, with `prompt_tokens` and `completion_tokens`.
+	"""
+	metrics = Metrics.get_metrics()
+	if not metrics.enabled:
+		return
+	metrics.observe("llm_call", model, seconds, error)
+	if usage is not None:
+		metrics.increment("llm_prompt_tokens", model, getattr(usage, "prompt_tokens", 0) or 0)
+		metrics.increment("llm_completion_tokens", model, getattr(usage, "completion_tokens", 0) or 0)
+
+
+def escape_label(value: str) -> str:
+	"""
+	Escape a Prometheus label value.
+
+	Args:
+		value (str): The label value.
+
+	Returns:
+		str: The escaped value.
+	"""
+	return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
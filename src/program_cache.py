@@ -0,0 +1,176 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+class CachedProgram:
+	"""
+	The outcome of consulting and validating one (solver, game rules, strategy) program.
+
+	Attributes:
+		key (str): Content hash of the program sources.
+		valid (bool): Whether the program passed validation.
+		trace (Optional[str]): The error trace captured while loading, if any.
+		variables (Optional[Dict[str, Any]]): Game variables extracted by the agent (moves, players, default move).
+	"""
+
+	def __init__(self, key: str, valid: bool, trace: Optional[str] = None):
+		"""
+		Initialize the cache entry.
+
+		Args:
+			key (str): Content hash of the program sources.
+			valid (bool): Whether the program passed validation.
+			trace (Optional[str]): The error trace captured while loading, if any.
+		"""
+		self.key = key
+		self.valid = valid
+		self.trace = trace
+		self.variables: Optional[Dict[str, Any]] = None
+
+	@property
+	def template_module(self) -> str:
+		"""The name of the module holding a loaded copy of the program on each server."""
+		return f"program_{self.key[:16]}"
+
+
+class ProgramCache:
+	"""
+	A process-wide, content-addressed cache of validated Prolog programs.
+
+	Entries are keyed on a hash of the solver, game rules and strategy sources. Each server additionally keeps a
+	loaded copy of every valid program in a template module, so a repeat load copies clauses inside the engine
+	instead of consulting and validating the sources again. Eviction hooks let the servers drop the templates of
+	evicted entries.
+	"""
+
+	_instance: Optional['ProgramCache'] = None
+	_instance_lock = threading.Lock()
+
+	def __init__(self, max_entries: int = 4096):
+		"""
+		Initialize an empty cache.
+
+		Args:
+			max_entries (int): Maximum number of entries kept; least recently used ones are evicted (default is 4096).
+		"""
+		self.max_entries = max_entries
+		self._entries: 'OrderedDict[str, CachedProgram]' = OrderedDict()
+		self._lock = threading.Lock()
+		self._eviction_hooks: List[Callable[[CachedProgram], None]] = []
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	@classmethod
+	def get_cache(cls) -> 'ProgramCache':
+		"""
+		Get the process-wide program cache.
+
+		Returns:
+			ProgramCache: The shared cache.
+		"""
+		with cls._instance_lock:
+			if cls._instance is None:
+				cls._instance = cls()
+			return cls._instance
+
+	@staticmethod
+	def key_for(*sources: str) -> str:
+		"""
+		Compute the content hash of a program from its sources.
+
+		Args:
+			*sources (str): The program sources, in load order.
+
+		Returns:
+			str: The hexadecimal SHA-256 digest.
+		"""
+		digest = hashlib.sha256()
+		for source in sources:
+			data = (source or "").encode()
+			digest.update(len(data).to_bytes(8, "big"))
+			digest.update(data)
+		return digest.hexdigest()
+
+	def add_eviction_hook(self, hook: Callable[[CachedProgram], None]) -> None:
+		"""
+		Register a function called with every entry that is evicted or cleared. Registering it again has no effect.
+
+		Args:
+			hook (Callable[[CachedProgram], None]): The function.
+		"""
+		with self._lock:
+			if hook not in self._eviction_hooks:
+				self._eviction_hooks.append(hook)
+
+	def get(self, key: str) -> Optional[CachedProgram]:
+		"""
+		Look up a program by its key.
+
+		Args:
+			key (str): The program's content hash.
+
+		Returns:
+			Optional[CachedProgram]: The cached entry, or None on a miss.
+		"""
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is None:
+				self.misses += 1
+				return None
+			self._entries.move_to_end(key)
+			self.hits += 1
+			return entry
+
+	def put(self, entry: CachedProgram) -> None:
+		"""
+		Store a program's validation outcome.
+
+		Args:
+			entry (CachedProgram): The entry to store.
+		"""
+		evicted = []
+		with self._lock:
+			self._entries[entry.key] = entry
+			self._entries.move_to_end(entry.key)
+			while len(self._entries) > self.max_entries:
+				evicted.append(self._entries.popitem(last=False)[1])
+			self.evictions += len(evicted)
+		self._notify_evicted(evicted)
+
+	def clear(self) -> None:
+		"""
+		Remove all entries.
+		"""
+		with self._lock:
+			evicted = list(self._entries.values())
+			self._entries.clear()
+		self._notify_evicted(evicted)
+
+	def _notify_evicted(self, entries: List[CachedProgram]) -> None:
+		"""
+		Call the eviction hooks with removed entries, outside the cache's lock.
+
+		Args:
+			entries (List[CachedProgram]): The removed entries.
+		"""
+		if not entries:
+			return
+		with self._lock:
+			hooks = list(self._eviction_hooks)
+		for hook in hooks:
+			for entry in entries:
+				hook(entry)
+
+	def metrics(self) -> Dict[str, int]:
+		"""
+		Get the cache's size and hit/miss counters.
+
+		Returns:
+			Dict[str, int]: Cache metrics.
+		"""
+		with self._lock:
+			return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+					"evictions": self.evictions}
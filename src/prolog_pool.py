@@ -0,0 +1,456 @@
+import atexit
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from swiplserver import PrologMQI
+from src.program_cache import CachedProgram
+from src.setup_logger import logger
+
+ENGINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "engine.pl").replace(os.sep, '/')
+
+
+class PrologLease:
+	"""
+	A Prolog thread and module leased from a pooled SWI-Prolog server.
+
+	A lease gives a `Solver` exclusive use of one MQI thread and one Prolog module until it is released back to the pool.
+	Other leases on the same server use their own modules, so their programs do not interfere.
+	"""
+
+	def __init__(self, pool: 'PrologServerPool', server: '_PooledServer', thread: object, module: str, lease_id: int):
+		"""
+		Initialize the lease.
+
+		Args:
+			pool (PrologServerPool): The pool the lease was taken from.
+			server (_PooledServer): The server hosting the leased thread.
+			thread (object): The leased `PrologThread`.
+			module (str): The Prolog module the solver loads its program into.
+			lease_id (int): A process-wide unique identifier of the lease.
+		"""
+		self.pool = pool
+		self.server = server
+		self.thread = thread
+		self.module = module
+		self.lease_id = lease_id
+		self.loaded_files: List[str] = []
+		self.released = False
+
+	def track_file(self, file_path: str) -> None:
+		"""
+		Remember a Prolog file consulted through this lease so it can be unloaded on release.
+
+		Args:
+			file_path (str): Path of the consulted file.
+		"""
+		self.loaded_files.append(file_path)
+
+	def release(self) -> None:
+		"""
+		Return the leased thread to the pool. Releasing a lease more than once has no effect.
+		"""
+		if not self.released:
+			self.released = True
+			self.pool.release(self)
+
+
+class _PooledServer:
+	"""
+	A long-lived SWI-Prolog MQI server together with its idle threads and free agent modules.
+	"""
+
+	def __init__(self, server_id: int):
+		"""
+		Launch the SWI-Prolog process and load the engine helpers into it.
+
+		Args:
+			server_id (int): Identifier of the server within the pool.
+		"""
+		self.server_id = server_id
+		self.mqi = PrologMQI()
+		self.mqi.start()
+		self.idle_threads: List[object] = []
+		self.free_modules: List[str] = []
+		self.shared_modules: Set[str] = set()
+		self.stale_modules: Set[str] = set()  # Shared modules to release at the next recycle
+		self.lock = threading.Lock()
+		self.active_leases = 0
+		self.threads_created = 0
+		self.modules_created = 0
+
+		thread = self.create_thread()
+		thread.query(f"use_module('{ENGINE_PATH}').")
+		self.idle_threads.append(thread)
+
+	def take_module(self) -> str:
+		"""
+		Get an empty agent module, reusing a released one if possible.
+
+		Returns:
+			str: The module name.
+		"""
+		if self.free_modules:
+			return self.free_modules.pop()
+		self.modules_created += 1
+		return f"agent_{self.modules_created}"
+
+	def create_thread(self) -> object:
+		"""
+		Create and start a new MQI thread on this server.
+
+		Returns:
+			object: The started `PrologThread`.
+		"""
+		thread = self.mqi.create_thread()
+		thread.start()
+		self.threads_created += 1
+		return thread
+
+	@property
+	def alive(self) -> bool:
+		"""Whether the server process is still reachable."""
+		return not self.mqi.connection_failed
+
+	def stop(self) -> None:
+		"""
+		Stop all idle threads and the SWI-Prolog process.
+		"""
+		for thread in self.idle_threads:
+			try:
+				thread.stop()
+			except Exception as e:
+				logger.debug(f"Failed to stop Prolog thread on server {self.server_id}: {e}")
+		self.idle_threads = []
+		self.free_modules = []
+		self.mqi.stop()
+
+
+class PrologServerPool:
+	"""
+	A process-wide pool of long-lived SWI-Prolog MQI servers.
+
+	Instead of launching a new `swipl` process for every `Solver`, threads are leased from a bounded set of servers
+	and recycled when the solver releases them.
+
+	Attributes:
+		max_servers (int): Maximum number of SWI-Prolog processes the pool may run.
+		leases_per_server (int): Maximum number of concurrent leases on one server.
+		acquire_timeout (Optional[float]): Seconds to wait for a free lease before giving up (None waits forever).
+	"""
+
+	_instance: Optional['PrologServerPool'] = None
+	_instance_lock = threading.Lock()
+
+	def __init__(self, max_servers: Optional[int] = None, leases_per_server: int = 64,
+				 acquire_timeout: Optional[float] = 60.0):
+		"""
+		Initialize an empty pool. Servers are started lazily on demand.
+
+		Args:
+			max_servers (Optional[int]): Maximum number of servers (default is 4).
+			leases_per_server (int): Maximum number of concurrent leases per server (default is 64).
+			acquire_timeout (Optional[float]): Seconds to wait for a lease (default is 60).
+		"""
+		self.max_servers = max_servers if max_servers else 4
+		self.leases_per_server = leases_per_server
+		self.acquire_timeout = acquire_timeout
+		self.servers: List[_PooledServer] = []
+		self._condition = threading.Condition()
+		self._next_server_id = 0
+		self._next_lease_id = 0
+		self._starting = 0  # Servers being started outside the lock
+
+		# Metrics
+		self._acquired = 0
+		self._released = 0
+		self._waits = 0
+		self._wait_seconds = 0.0
+		self._max_wait_seconds = 0.0
+		self._servers_started = 0
+		self._recycle_failures = 0
+		self._violations = {"timeout": 0, "inference_limit": 0}
+
+	@classmethod
+	def get_pool(cls) -> 'PrologServerPool':
+		"""
+		Get the process-wide pool, creating it with default settings on first use.
+
+		Returns:
+			PrologServerPool: The shared pool.
+		"""
+		with cls._instance_lock:
+			if cls._instance is None:
+				cls._instance = cls()
+				atexit.register(cls._instance.shutdown)
+			return cls._instance
+
+	@classmethod
+	def configure(cls, **kwargs) -> 'PrologServerPool':
+		"""
+		Replace the process-wide pool with one using the given settings. The previous pool is shut down.
+
+		Args:
+			**kwargs: Keyword arguments passed to `PrologServerPool.__init__`.
+
+		Returns:
+			PrologServerPool: The new shared pool.
+		"""
+		with cls._instance_lock:
+			if cls._instance is not None:
+				cls._instance.shutdown()
+			cls._instance = cls(**kwargs)
+			atexit.register(cls._instance.shutdown)
+			return cls._instance
+
+	def acquire(self) -> PrologLease:
+		"""
+		Lease a Prolog thread, starting a new server if needed and allowed, or waiting for a release otherwise.
+
+		Returns:
+			PrologLease: The lease.
+
+		Raises:
+			TimeoutError: If no lease became available within `acquire_timeout` seconds.
+		"""
+		start = time.perf_counter()
+		waited = False
+		new_server_id = None
+		with self._condition:
+			while True:
+				server = self._select_server()
+				if server is not None:
+					thread, module, lease_id = self._reserve_lease(server)
+					break
+				# Reserve a slot for a new server, started below without holding the lock
+				if len(self.servers) + self._starting < self.max_servers:
+					self._starting += 1
+					self._next_server_id += 1
+					new_server_id = self._next_server_id
+					break
+				waited = True
+				remaining = None
+				if self.acquire_timeout is not None:
+					remaining = self.acquire_timeout - (time.perf_counter() - start)
+					if remaining <= 0:
+						raise TimeoutError(f"No Prolog lease available after {self.acquire_timeout} seconds.")
+				self._condition.wait(remaining)
+
+		if new_server_id is not None:
+			server, (thread, module, lease_id) = self._start_server(new_server_id)
+
+		try:
+			if thread is None:
+				thread = server.create_thread()
+		except Exception:
+			with self._condition:
+				server.active_leases -= 1
+				server.free_modules.append(module)
+				self._condition.notify()
+			raise
+
+		wait_seconds = time.perf_counter() - start
+		with self._condition:
+			self._acquired += 1
+			if waited:
+				self._waits += 1
+			self._wait_seconds += wait_seconds
+			self._max_wait_seconds = max(self._max_wait_seconds, wait_seconds)
+
+		logger.debug(f"Leased Prolog thread {lease_id} with module {module} on server {server.server_id}.")
+		return PrologLease(self, server, thread, module, lease_id)
+
+	def _select_server(self) -> Optional[_PooledServer]:
+		"""
+		Pick a running server with spare capacity, filling busy servers first so that agents share processes.
+		Must be called with the lock held.
+
+		Returns:
+			Optional[_PooledServer]: A server, or None if every running server is saturated.
+		"""
+		candidates = [server for server in self.servers
+					  if server.alive and server.active_leases < self.leases_per_server]
+		if candidates:
+			return max(candidates, key=lambda server: server.active_leases)
+		return None
+
+	def _reserve_lease(self, server: _PooledServer) -> Tuple[Optional[object], str, int]:
+		"""
+		Take a lease slot, an idle thread if there is one and a module on a server. Must be called with the lock held.
+
+		Args:
+			server (_PooledServer): The server.
+
+		Returns:
+			Tuple[Optional[object], str, int]: The idle thread (None if a new one must be created), the module and
+				the lease identifier.
+		"""
+		server.active_leases += 1
+		thread = server.idle_threads.pop() if server.idle_threads else None
+		module = server.take_module()
+		self._next_lease_id += 1
+		return thread, module, self._next_lease_id
+
+	def _start_server(self, server_id: int) -> Tuple[_PooledServer, Tuple[Optional[object], str, int]]:
+		"""
+		Start a server in a slot reserved by `acquire` and add it to the pool with a lease reserved on it, or give the
+		slot back if it fails. Must be called without the lock, so that other leases are not held up while SWI-Prolog
+		starts.
+
+		Args:
+			server_id (int): Identifier of the new server.
+
+		Returns:
+			Tuple[_PooledServer, Tuple[Optional[object], str, int]]: The started server and the lease reserved on it,
+				see `_reserve_lease`.
+		"""
+		try:
+			server = _PooledServer(server_id)
+		except Exception:
+			with self._condition:
+				self._starting -= 1
+				self._condition.notify_all()
+			raise
+
+		with self._condition:
+			self._starting -= 1
+			self.servers.append(server)
+			self._servers_started += 1
+			reserved = self._reserve_lease(server)
+			# Waiting acquirers can now use the new server's spare capacity
+			self._condition.notify_all()
+		logger.debug(f"Started Prolog server {server.server_id} (pid {server.mqi.process_id()}).")
+		return server, reserved
+
+	def release(self, lease: PrologLease) -> None:
+		"""
+		Recycle a leased thread and make it available again.
+
+		Args:
+			lease (PrologLease): The lease to release.
+		"""
+		server = lease.server
+		recycled = self._recycle(lease)
+		with self._condition:
+			server.active_leases -= 1
+			self._released += 1
+			if recycled:
+				server.idle_threads.append(lease.thread)
+				server.free_modules.append(lease.module)
+			else:
+				self._recycle_failures += 1
+			if not server.alive and server.active_leases == 0 and server in self.servers:
+				self.servers.remove(server)
+			self._condition.notify()
+
+	def _recycle(self, lease: PrologLease) -> bool:
+		"""
+		Wipe the lease's module so that the next lease starts from a clean state.
+
+		Args:
+			lease (PrologLease): The lease being released.
+
+		Returns:
+			bool: True if the thread can be reused, False if it was discarded.
+		"""
+		files = ",".join(f"'{path}'" for path in lease.loaded_files)
+		try:
+			lease.thread.query(f"engine:release_module({lease.module}, [{files}]).")
+			if lease.server.stale_modules:
+				self._release_stale_modules(lease)
+			return True
+		except Exception as e:
+			logger.error(f"Failed to recycle Prolog thread {lease.lease_id}: {e}")
+			try:
+				lease.thread.stop()
+			except Exception:
+				pass
+			return False
+
+	def discard_shared_module(self, module: str) -> None:
+		"""
+		Mark a shared module, e.g. the template of an evicted program, for release on every server holding it. The
+		module is released by the next lease recycled on the server, as only a thread the pool owns may query it.
+
+		Args:
+			module (str): The module name.
+		"""
+		with self._condition:
+			servers = list(self.servers)
+		for server in servers:
+			with server.lock:
+				if module in server.shared_modules:
+					server.stale_modules.add(module)
+
+	def discard_template(self, program: CachedProgram) -> None:
+		"""
+		Release the template modules of a program evicted from the program cache.
+
+		Args:
+			program (CachedProgram): The evicted cache entry.
+		"""
+		self.discard_shared_module(program.template_module)
+
+	def _release_stale_modules(self, lease: PrologLease) -> None:
+		"""
+		Release the shared modules marked stale on the lease's server, using the lease's thread.
+
+		Args:
+			lease (PrologLease): The lease being released.
+		"""
+		server = lease.server
+		with server.lock:
+			stale, server.stale_modules = server.stale_modules, set()
+			for module in stale:
+				if module in server.shared_modules:
+					lease.thread.query(f"engine:release_module({module}, []).")
+					server.shared_modules.discard(module)
+					logger.debug(f"Released shared module {module} on server {server.server_id}.")
+
+	def record_violation(self, kind: str) -> None:
+		"""
+		Count a query that exceeded its wall-clock timeout or inference limit.
+
+		Args:
+			kind (str): "timeout" or "inference_limit".
+		"""
+		with self._condition:
+			self._violations[kind] = self._violations.get(kind, 0) + 1
+
+	def metrics(self) -> Dict[str, float]:
+		"""
+		Get a snapshot of the pool's size and lease-wait metrics.
+
+		Returns:
+			Dict[str, float]: Pool metrics.
+		"""
+		with self._condition:
+			return {
+				"servers": len(self.servers),
+				"max_servers": self.max_servers,
+				"active_leases": sum(server.active_leases for server in self.servers),
+				"idle_threads": sum(len(server.idle_threads) for server in self.servers),
+				"modules_created": sum(server.modules_created for server in self.servers),
+				"servers_started": self._servers_started,
+				"leases_acquired": self._acquired,
+				"leases_released": self._released,
+				"lease_waits": self._waits,
+				"lease_wait_seconds_total": self._wait_seconds,
+				"lease_wait_seconds_max": self._max_wait_seconds,
+				"recycle_failures": self._recycle_failures,
+				"query_timeouts": self._violations["timeout"],
+				"inference_limit_violations": self._violations["inference_limit"],
+			}
+
+	def shutdown(self) -> None:
+		"""
+		Stop all servers in the pool.
+		"""
+		with self._condition:
+			servers, self.servers = self.servers, []
+		for server in servers:
+			try:
+				server.stop()
+			except Exception as e:
+				logger.debug(f"Failed to stop Prolog server {server.server_id}: {e}")
+		logger.debug(f"Prolog server pool (pid {os.getpid()}) shut down.")
@@ -0,0 +1,132 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from src.metrics import Metrics
+from src.setup_logger import logger
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+	"""
+	An asyncio token bucket limiting how many requests are started per second.
+
+	Attributes:
+		rate (float): Tokens added per second.
+		capacity (float): Maximum number of tokens, i.e. the largest burst allowed.
+	"""
+
+	def __init__(self, rate: float, capacity: Optional[float] = None):
+		"""
+		Initialize a full bucket.
+
+		Args:
+			rate (float): Tokens added per second.
+			capacity (Optional[float]): Maximum number of tokens (default is max(1, rate)).
+		"""
+		self.rate = rate
+		self.capacity = capacity if capacity else max(1.0, rate)
+		self._tokens = self.capacity
+		self._updated = time.monotonic()
+		self._lock = asyncio.Lock()
+
+	async def acquire(self, tokens: float = 1.0) -> None:
+		"""
+		Wait until the given number of tokens is available and take them.
+
+		Args:
+			tokens (float): Number of tokens to take (default is 1).
+		"""
+		async with self._lock:
+			while True:
+				now = time.monotonic()
+				self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+				self._updated = now
+				if self._tokens >= tokens:
+					self._tokens -= tokens
+					return
+				await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class RequestThrottle:
+	"""
+	Limits concurrent asynchronous requests, spaces them with a token bucket and retries failures with backoff.
+
+	Attributes:
+		concurrency (int): Maximum number of requests in flight.
+		requests_per_second (Optional[float]): Maximum request rate (None disables rate limiting).
+		max_retries (int): Number of retries after a failed request.
+		base_delay (float): Backoff delay in seconds before the first retry; doubled on every further retry.
+		max_delay (float): Upper bound of the backoff delay in seconds.
+	"""
+
+	def __init__(self, concurrency: int = 8, requests_per_second: Optional[float] = None, max_retries: int = 3,
+				 base_delay: float = 1.0, max_delay: float = 30.0):
+		"""
+		Initialize the throttle. It must be created while an event loop is running, or used from a single loop.
+
+		Args:
+			concurrency (int): Maximum number of requests in flight (default is 8).
+			requests_per_second (Optional[float]): Maximum request rate (default is None, i.e. unlimited).
+			max_retries (int): Number of retries after a failed request (default is 3).
+			base_delay (float): Backoff delay before the first retry in seconds (default is 1).
+			max_delay (float): Upper bound of the backoff delay in seconds (default is 30).
+		"""
+		self.concurrency = concurrency
+		self.requests_per_second = requests_per_second
+		self.max_retries = max_retries
+		self.base_delay = base_delay
+		self.max_delay = max_delay
+		self._semaphore = asyncio.Semaphore(concurrency)
+		self._bucket = TokenBucket(requests_per_second) if requests_per_second else None
+
+		# Metrics
+		self.requests = 0
+		self.retries = 0
+		self.failures = 0
+
+	async def run(self, request: Callable[[], Awaitable[T]]) -> T:
+		"""
+		Run a request under the concurrency and rate limits, retrying it if it raises.
+
+		Args:
+			request (Callable[[], Awaitable[T]]): Creates the awaitable for one attempt; called again on every retry.
+
+		Returns:
+			T: The result of the first successful attempt.
+
+		Raises:
+			Exception: The error of the last attempt if all retries failed.
+		"""
+		attempt = 0
+		while True:
+			async with self._semaphore:
+				if self._bucket:
+					await self._bucket.acquire()
+				self.requests += 1
+				try:
+					return await request()
+				except Exception as e:
+					if attempt >= self.max_retries:
+						self.failures += 1
+						Metrics.get_metrics().increment("llm_failures")
+						raise
+					error = e
+
+			# Back off outside the semaphore so that other requests can proceed
+			delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+			attempt += 1
+			self.retries += 1
+			Metrics.get_metrics().increment("llm_retries")
+			logger.debug(f"Request failed ({error}); retry {attempt}/{self.max_retries} in {delay:.2f} seconds.")
+			await asyncio.sleep(delay)
+
+	def metrics(self) -> Dict[str, int]:
+		"""
+		Get the number of requests started, retried and failed.
+
+		Returns:
+			Dict[str, int]: Throttle metrics.
+		"""
+		return {"requests": self.requests, "retries": self.retries, "failures": self.failures}
@@ -1,4 +1,13 @@
 :- dynamic initially/2.
+% Opponent moves observed by an agent that tracks its history:
+% history(Player, Round, Move) holds for every round (numbered from 1), and
+% history_rounds(N) holds the number of rounds observed so far. Strategies
+% with a longer memory than last_move/2 can look moves up directly, e.g.
+% history(O, R, M) for a given round R.
+:- dynamic history/3, history_rounds/1.
+% Resolve game-specific predicates in the module of the calling agent, so
+% that this solver can be shared by agents loaded into separate modules.
+:- module_transparent game/2, holds/2, initialise/2.
 
 % All legal evolutions of a game: can be used both as a generator and test.
 game(F,F):- final(F).  
@@ -1,11 +1,73 @@
+from src.metrics import Metrics
 from src.setup_logger import logger
-from swiplserver import PrologMQI
+from src.program_cache import CachedProgram, ProgramCache
+from src.prolog_pool import PrologLease, PrologServerPool
+from swiplserver import PrologError, PrologQueryTimeoutError
+import hashlib
 import io
 import logging
-import tempfile
-from typing import List, Optional, Tuple, Union
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
 import os
 
+# Default budgets of a single query, so that a looping program can only cost a bounded amount of time
+DEFAULT_QUERY_TIMEOUT = 30.0  # Wall-clock seconds
+DEFAULT_INFERENCE_LIMIT = 50_000_000  # Prolog inferences
+
+# Held while a load captures the process-wide `swiplserver` log, see `Solver.consult_and_validate`
+CONSULT_LOG_LOCK = threading.Lock()
+
+# Markers of the kinds of query reported in the metrics, checked in order
+QUERY_KINDS = (
+	("engine:load_program", "consult"),
+	("engine:load_shared_program", "consult"),
+	("load_files(", "consult"),
+	("engine:copy_module", "consult"),
+	("engine:introspect", "current_predicate"),
+	("current_predicate(", "current_predicate"),
+	("engine:play_match", "match"),
+	("select(", "select"),
+	("finally(goal(", "payoff"),
+	("payoff(", "payoff"),
+	("initialise(", "initialise"),
+	("engine:observe", "initialise"),
+)
+
+
+def query_kind(goal: str) -> str:
+	"""
+	Classify a query for the metrics.
+
+	Args:
+		goal (str): The Prolog goal.
+
+	Returns:
+		str: The kind of the query, e.g. "select", or "other".
+	"""
+	for marker, kind in QUERY_KINDS:
+		if marker in goal:
+			return kind
+	return "other"
+
+
+def to_prolog_string(text: str) -> str:
+	"""
+	Render text as a double-quoted Prolog string literal.
+
+	Args:
+		text (str): The text to quote.
+
+	Returns:
+		str: The escaped Prolog string.
+	"""
+	escaped = (text.replace("\\", "\\\\")
+			   .replace('"', '\\"')
+			   .replace("\n", "\\n")
+			   .replace("\r", "\\r")
+			   .replace("\t", "\\t"))
+	return f'"{escaped}"'
+
 
 class Solver:
 	"""
@@ -13,7 +75,11 @@ class Solver:
 	This class handles loading game rules, strategies, and validating the logic using a Prolog solver.
 	"""
 
-	def __init__(self, solver_string: str, game_string: str, strategy: str):
+	def __init__(self, solver_string: str, game_string: str, strategy: str,
+				 pool: Optional[PrologServerPool] = None, cache: Optional[ProgramCache] = None,
+				 query_timeout: Optional[float] = DEFAULT_QUERY_TIMEOUT,
+				 inference_limit: Optional[int] = DEFAULT_INFERENCE_LIMIT,
+				 track_history: bool = False):
 		"""
 		Initialize the Solver with the necessary Prolog components.
 
@@ -21,10 +87,27 @@ class Solver:
 			solver_string (str): The domain-independent Prolog solver code.
 			game_string (str): The domain-dependent game rules.
 			strategy (str): The strategy to be used by the solver.
+			pool (Optional[PrologServerPool]): The pool to lease a Prolog thread from (default is the shared pool).
+			cache (Optional[ProgramCache]): The cache of validated programs (default is the shared cache).
+			query_timeout (Optional[float]): Wall-clock seconds a query may take (None disables the timeout).
+			inference_limit (Optional[int]): Inferences a query may use (None disables the limit).
+			track_history (bool): Whether observed opponent moves are also appended to `history/3`.
 		"""
 		self.valid: bool = False
 		self.trace: Optional[str] = None
 		self.full_solver: Optional[str] = None
+		self.pool = pool if pool else PrologServerPool.get_pool()
+		self.lease: Optional[PrologLease] = None
+		self.cache = cache if cache else ProgramCache.get_cache()
+		self.cache.add_eviction_hook(self.pool.discard_template)
+		self.program: Optional[CachedProgram] = None
+		self.has_snapshot = False
+		self.game_variables: Optional[Dict[str, Any]] = None
+		self.query_timeout = query_timeout
+		self.inference_limit = inference_limit
+		self.last_violation: Optional[str] = None  # Budget exceeded by the last query: "timeout" or "inference_limit"
+		self.violations = {"timeout": 0, "inference_limit": 0}
+		self.track_history = track_history
 
 		# Step 1: Initialize the Prolog thread
 		self.prolog_thread = self._initialize_prolog_thread()
@@ -35,17 +118,30 @@ class Solver:
 
 	def _initialize_prolog_thread(self) -> Optional[object]:
 		"""
-		Initialize a Prolog thread for querying the solver.
+		Lease a Prolog thread from the server pool for querying the solver.
 
 		Returns:
-			Optional[object]: The Prolog thread object if created successfully, otherwise None.
+			Optional[object]: The Prolog thread object if leased successfully, otherwise None.
 		"""
 		try:
-			return PrologMQI().create_thread()
+			self.lease = self.pool.acquire()
+			return self.lease.thread
 		except Exception as e:
 			logger.error(f"Failed to initialize Prolog thread: {e}")
 			return None
 
+	def close(self) -> None:
+		"""
+		Release the leased Prolog thread back to the pool. The solver cannot be queried afterwards.
+
+		Releasing queries the leased thread, so solvers are closed explicitly by their owners rather than on garbage
+		collection, which may run at interpreter shutdown or while another thread uses the server.
+		"""
+		if self.lease:
+			self.lease.release()
+		self.lease = None
+		self.prolog_thread = None
+
 	def consult_and_validate(
 			self,
 			solver_string: str,
@@ -66,47 +162,197 @@ class Solver:
 			self.valid (bool): Whether the solver is valid.
 			self.trace (Optional[str]): The error trace if validation fails.
 		"""
-		# Step 1: Capture critical logs from the Prolog server
-		log_capture_string, log_handler = self._setup_logging()
-
-		# Step 2: Combine solver components into a full solver program
+		# Step 1: Combine solver components into a full solver program
 		self.full_solver = solver_string + game_string + strategy
-		correct = True
 
-		# Step 3: Write Prolog components to temporary files and consult them
-		temp_files = self._write_prolog_files([
-			("solver", solver_string),
-			("game", game_string),
-			("strategy", strategy)
-		])
+		# Step 2: Reuse a previously validated program with the same sources, if any
+		key = ProgramCache.key_for(solver_string, game_string, strategy, ",".join(predicates))
+		cached = self.cache.get(key)
+		if cached is not None:
+			self._load_cached_program(cached, solver_string, game_string, strategy)
+			return
+
+		# Step 3: Capture critical logs from the Prolog server. The handler sees the messages of every server, so
+		# loads that capture them are serialized to keep other agents' errors out of this trace
+		with CONSULT_LOG_LOCK:
+			log_capture_string, log_handler = self._setup_logging()
+			correct = True
+			interrupted = False
+
+			try:
+				# Step 4: Load the shared solver and consult the game rules and strategy into the agent's module
+				if not self._consult_sources(solver_string, game_string, strategy):
+					correct = False
 
-		try:
-			# Step 4: Load and consult Prolog files in the Prolog solver
-			for temp_file_path, (label, _) in zip(temp_files, [("solver", solver_string), ("game", game_string),
-															   ("strategy", strategy)]):
-				if not self.consult_prolog_file(temp_file_path):
-					logger.error(f"Failed to consult {label} from file {temp_file_path}")
+				# Step 5: Validate required predicates
+				if correct and not self._validate_predicates(predicates):
 					correct = False
-					break
 
-			# Step 5: Validate required predicates
-			if correct and not self._validate_predicates(predicates):
+			except Exception as e:
 				correct = False
+				interrupted = True
+				self.trace = str(e)
+				logger.error(f"Prolog error: {self.trace}")
+
+			# Step 6: Check logs for additional error messages
+			if correct:
+				self._check_logs_for_errors(log_capture_string)
+
+			# Clean up logging handlers
+			self._cleanup_logging(log_handler)
+
+		self.valid = correct
 
+		# Step 7: Cache the outcome, unless loading was interrupted by an error in the engine itself
+		if not interrupted:
+			self.program = CachedProgram(key, self.valid, self.trace)
+			if self.valid:
+				self._store_template(self.program)
+			self.cache.put(self.program)
+
+		# Step 8: Remember the initial state so that it can be restored between matches
+		if self.valid:
+			self.snapshot_state()
+
+	def _load_cached_program(self, cached: CachedProgram, solver_string: str, game_string: str, strategy: str) -> None:
+		"""
+		Instantiate a previously validated program in the solver's module without validating it again.
+
+		The program is copied from the server's template module if there is one, otherwise it is consulted once
+		and a template is created for later loads. A program known to be invalid is consulted as far as a fresh
+		load gets, so that its module is in the same state either way.
+
+		Args:
+			cached (CachedProgram): The cache entry of the program.
+			solver_string (str): Domain-independent solver code.
+			game_string (str): Domain-dependent game rules.
+			strategy (str): Strategy code.
+		"""
+		self.valid = cached.valid
+		self.trace = cached.trace
+		if not cached.valid:
+			logger.debug(f"Program {cached.key[:16]} is known to be invalid.")
+			try:
+				# Its errors would otherwise end up in the trace of a load capturing the log
+				with CONSULT_LOG_LOCK:
+					self._consult_sources(solver_string, game_string, strategy)
+			except Exception as e:
+				logger.error(f"Prolog error: {e}")
+			return
+
+		try:
+			if not self._load_shared_solver(solver_string):
+				self.valid = False
+				return
+
+			# Copy under the server's lock, so that the template cannot be released meanwhile
+			server = self.lease.server
+			with server.lock:
+				has_template = cached.template_module in server.shared_modules
+				if has_template:
+					self.valid = bool(
+						self.prolog_thread.query(f"engine:copy_module({cached.template_module}, {self.module}).")
+					)
+			if not has_template:
+				self.valid = (self.consult_prolog_string("game", game_string)
+							  and self.consult_prolog_string("strategy", strategy))
+				if self.valid:
+					self._store_template(cached)
 		except Exception as e:
-			correct = False
+			self.valid = False
 			self.trace = str(e)
 			logger.error(f"Prolog error: {self.trace}")
 
-		# Step 6: Check logs for additional error messages
-		if correct:
-			self._check_logs_for_errors(log_capture_string)
+		if self.valid:
+			self.program = cached
+			self.snapshot_state()
+			logger.debug(f"Loaded cached program {cached.key[:16]} into module {self.module}.")
 
-		# Clean up temporary files and logging handlers
-		self._cleanup_temp_files(temp_files)
-		self._cleanup_logging(log_handler)
+	def _consult_sources(self, solver_string: str, game_string: str, strategy: str) -> bool:
+		"""
+		Load the shared domain-independent solver and consult the game rules and strategy into the solver's module
+		straight from memory, stopping at the first failure.
 
-		self.valid = correct
+		Args:
+			solver_string (str): Domain-independent solver code.
+			game_string (str): Domain-dependent game rules.
+			strategy (str): Strategy code.
+
+		Returns:
+			bool: True if all sources were loaded, False otherwise.
+		"""
+		if not self._load_shared_solver(solver_string):
+			return False
+		for label, program in (("game", game_string), ("strategy", strategy)):
+			if not self.consult_prolog_string(label, program):
+				logger.error(f"Failed to consult {label}")
+				return False
+		return True
+
+	def _store_template(self, program: CachedProgram) -> None:
+		"""
+		Keep a copy of the freshly validated program in a template module on the solver's server.
+
+		Args:
+			program (CachedProgram): The cache entry of the program.
+		"""
+		server = self.lease.server
+		with server.lock:
+			if program.template_module in server.shared_modules:
+				return
+			if self.prolog_thread.query(f"engine:copy_module({self.module}, {program.template_module})."):
+				server.shared_modules.add(program.template_module)
+
+	def snapshot_state(self) -> bool:
+		"""
+		Save the current `initially/2` facts of the solver's program so that `reset_state` can restore them.
+
+		Returns:
+			bool: True if the snapshot was taken, False otherwise.
+		"""
+		try:
+			self.has_snapshot = bool(self.prolog_thread.query(f"engine:snapshot_state({self.module})."))
+		except Exception as e:
+			logger.error(f"Failed to snapshot the state of module {self.module}: {e}")
+			self.has_snapshot = False
+		return self.has_snapshot
+
+	def reset_state(self) -> bool:
+		"""
+		Restore the `initially/2` facts saved after loading, e.g. clearing `last_move` and any changed `default_move`,
+		in a single round-trip and without reloading the program.
+
+		Returns:
+			bool: True if the state was restored, False if there is no snapshot or the reset failed.
+		"""
+		if not self.prolog_thread or not self.has_snapshot:
+			return False
+		try:
+			return bool(self.prolog_thread.query(f"engine:reset_state({self.module})."))
+		except Exception as e:
+			logger.error(f"Failed to reset the state of module {self.module}: {e}")
+			return False
+
+	def get_cached_variables(self) -> Optional[Dict[str, Any]]:
+		"""
+		Get the game variables previously extracted for the same program.
+
+		Returns:
+			Optional[Dict[str, Any]]: The cached variables, or None if the program is invalid or none were cached.
+		"""
+		if self.valid and self.program is not None:
+			return self.program.variables
+		return None
+
+	def cache_variables(self, variables: Dict[str, Any]) -> None:
+		"""
+		Store game variables extracted from this program so that later loads can skip extracting them.
+
+		Args:
+			variables (Dict[str, Any]): The extracted variables.
+		"""
+		if self.valid and self.program is not None:
+			self.program.variables = variables
 
 	def _setup_logging(self) -> Tuple[io.StringIO, logging.StreamHandler]:
 		"""
@@ -121,29 +367,80 @@ class Solver:
 		logging.getLogger('swiplserver').addHandler(log_handler)
 		return log_capture_string, log_handler
 
-	def _write_prolog_files(self, prolog_data: List[Tuple[str, str]]) -> List[str]:
+	@property
+	def module(self) -> str:
+		"""The Prolog module holding this solver's game rules and strategy."""
+		return self.lease.module if self.lease else "user"
+
+	def _qualify(self, goal: str) -> str:
+		"""
+		Qualify a goal with the solver's module so that it runs against this solver's program only.
+
+		Args:
+			goal (str): The Prolog goal, optionally terminated by a full stop.
+
+		Returns:
+			str: The module-qualified goal.
 		"""
-		Write Prolog data to temporary files.
+		goal = goal.strip().rstrip(".")
+		return f"{self.module}:({goal})"
+
+	def _load_shared_solver(self, solver_string: str) -> bool:
+		"""
+		Load the domain-independent solver into a module shared by all solvers on the server, loading it only once
+		per server, and make the solver's module inherit from it.
 
 		Args:
-			prolog_data (List[Tuple[str, str]]): List of tuples containing labels and data to write.
+			solver_string (str): Domain-independent solver code.
 
 		Returns:
-			List[str]: List of paths to the temporary files created.
+			bool: True if the shared solver is available and the module was prepared, False otherwise.
 		"""
-		temp_files = []
-		temp_dir = os.path.join(os.getcwd(), "DATA", "TEMP")
-		os.makedirs(temp_dir, exist_ok=True)
+		solver_module = f"solver_{hashlib.sha1(solver_string.encode()).hexdigest()[:12]}"
+		server = self.lease.server
+		with server.lock:
+			if solver_module not in server.shared_modules:
+				loaded = self.prolog_thread.query(
+					f"engine:load_shared_solver({solver_module}, '/mem/{solver_module}.pl', "
+					f"{to_prolog_string(solver_string)})."
+				)
+				if not loaded:
+					logger.error(f"Failed to load the shared solver into module {solver_module}")
+					return False
+				server.shared_modules.add(solver_module)
+
+		return bool(self.prolog_thread.query(f"engine:prepare_module({self.module}, {solver_module})."))
+
+	def consult_prolog_string(self, label: str, program: str) -> bool:
+		"""
+		Consult Prolog program text into the solver's module without writing it to disk.
+
+		The program is registered under the source name `/mem/<module>/<label>.pl`, so warnings and errors report
+		line numbers relative to the program text.
 
-		for _, data in prolog_data:
-			with tempfile.NamedTemporaryFile(delete=False, dir=temp_dir, suffix=".pl") as temp_file:
-				temp_file.write(data.encode())
-				temp_files.append(temp_file.name)
-		return temp_files
+		Args:
+			label (str): A short name for the program, e.g. "game" or "strategy".
+			program (str): The Prolog program text.
+
+		Returns:
+			bool: True if the program was successfully consulted, False otherwise.
+		"""
+		source_id = f"/mem/{self.module}/{label}.pl"
+		try:
+			result = self._run_query(
+				f"engine:load_program({self.module}, '{source_id}', {to_prolog_string(program)})."
+			)
+			logger.debug(f"Consulted {source_id}: {result}")
+			if self.lease:
+				self.lease.track_file(source_id)
+			return bool(result)
+		except Exception as e:
+			logger.error(f"Error consulting {source_id}: {e}")
+			return False
 
 	def consult_prolog_file(self, file_path: str) -> bool:
 		"""
-		Consult a Prolog file in the solver.
+		Consult a Prolog file into the solver's module.
 
 		Args:
 			file_path (str): Path to the Prolog file.
@@ -153,16 +450,54 @@ class Solver:
 		"""
 		try:
 			file_path = file_path.replace(os.sep, '/')
-			result = self.prolog_thread.query(f'consult("{file_path}").')
+			result = self._run_query(f"load_files({self.module}:'{file_path}', []).")
+			if self.lease:
+				self.lease.track_file(file_path)
 			logger.debug(f"Consulted file {file_path}: {result}")
 			return bool(result)
 		except Exception as e:
 			logger.error(f"Error consulting file {file_path}: {e}")
 			return False
 
+	def consult_shared_file(self, file_path: str) -> bool:
+		"""
+		Add the clauses of a Prolog file to the solver's module. The file is loaded only once per server, into a
+		template module named after its content, and copied from there, so files consulted by many solvers, like
+		the validators in `DATA/EVAL`, are compiled once per server.
+
+		Args:
+			file_path (str): Path to the Prolog file.
+
+		Returns:
+			bool: True if the file's clauses were added, False otherwise.
+		"""
+		try:
+			with open(file_path) as file:
+				program = file.read()
+			template_module = f"file_{hashlib.sha1(program.encode()).hexdigest()[:12]}"
+			server = self.lease.server
+			with server.lock:
+				if template_module not in server.shared_modules:
+					loaded = self._run_query(
+						f"engine:load_shared_program({template_module}, '/mem/{template_module}.pl', "
+						f"{to_prolog_string(program)})."
+					)
+					if not loaded:
+						logger.error(f"Failed to load file {file_path} into module {template_module}")
+						return False
+					server.shared_modules.add(template_module)
+
+			result = self._run_query(f"engine:copy_module({template_module}, {self.module}).")
+			logger.debug(f"Copied file {file_path} from module {template_module}: {result}")
+			return bool(result)
+		except Exception as e:
+			logger.error(f"Error consulting file {file_path}: {e}")
+			return False
+
 	def _validate_predicates(self, predicates: Tuple[str, ...]) -> bool:
 		"""
-		Validate that all required predicates are defined in the solver.
+		Validate that all required predicates are defined in the solver. The game variables are extracted by the
+		same query, see `introspect`.
 
 		Args:
 			predicates (Tuple[str, ...]): A tuple of predicates to check.
@@ -170,12 +505,55 @@ class Solver:
 		Returns:
 			bool: True if all predicates are found, False otherwise.
 		"""
-		for predicate in predicates:
-			result = self.prolog_thread.query(f"current_predicate({predicate}).")
-			if not result:
-				logger.debug(f"Missing predicate: {predicate}")
-				return False
-		return True
+		variables = self.introspect(predicates)
+		if variables is None:
+			return False
+		for predicate in variables["missing_predicates"]:
+			logger.debug(f"Missing predicate: {predicate}")
+		return not variables["missing_predicates"]
+
+	def introspect(self, predicates: Tuple[str, ...] = ()) -> Optional[Dict[str, Any]]:
+		"""
+		Inspect the solver's program in a single round-trip and remember the result in `game_variables`.
+
+		Args:
+			predicates (Tuple[str, ...]): Required predicates to check for (default is none).
+
+		Returns:
+			Optional[Dict[str, Any]]: The missing predicates, possible moves, player names, the first player's default
+				move (None if it has none) and `[move, opponent_move, payoff]` rows for that player, or None if the
+				query failed.
+		"""
+		query = (f"engine:introspect({self.module}, [{', '.join(predicates)}], "
+				 f"Missing, Moves, Players, DefaultMove, Payoffs).")
+		result = self._run_query(query)
+		if not result:
+			return None
+
+		bindings = result[0]
+		self.game_variables = {
+			"missing_predicates": bindings["Missing"],
+			"possible_moves": bindings["Moves"],
+			"player_names": bindings["Players"],
+			"default_move": bindings["DefaultMove"][0] if bindings["DefaultMove"] else None,
+			"payoff_table": bindings["Payoffs"]
+		}
+		logger.debug(f"Introspected module {self.module}: {self.game_variables}")
+		return self.game_variables
+
+	def get_game_variables(self) -> Optional[Dict[str, Any]]:
+		"""
+		Get the game variables of a valid solver, introspecting the program if validation did not already do so.
+
+		Returns:
+			Optional[Dict[str, Any]]: The result of `introspect`, or None if it is not available.
+		"""
+		if self.game_variables is None and self.valid and self.prolog_thread:
+			try:
+				self.introspect()
+			except Exception as e:
+				logger.error(f"Error introspecting module {self.module}: {e}")
+		return self.game_variables
 
 	def _check_logs_for_errors(self, log_capture_string: io.StringIO) -> None:
 		"""
@@ -190,17 +568,6 @@ class Solver:
 			self.trace = log_contents.strip()
 			logger.error(f"Prolog error from logs: {self.trace}")
 
-	def _cleanup_temp_files(self, temp_files: List[str]) -> None:
-		"""
-		Delete temporary files created during validation.
-
-		Args:
-			temp_files (List[str]): List of file paths to delete.
-		"""
-		for file_path in temp_files:
-			if os.path.exists(file_path):
-				os.remove(file_path)
-
 	def _cleanup_logging(self, log_handler: logging.StreamHandler) -> None:
 		"""
 		Clean up logging by removing the custom log handler.
@@ -225,57 +592,41 @@ class Solver:
 			ValueError: If the predicate evaluation fails.
 		"""
 		try:
-			logger.debug(f"Querying predicate: {predicate}")
-			# Step 1: Execute the query asynchronously
-			self.prolog_thread.query_async(predicate, find_all=False)
-
-			# Step 2: Retrieve results from the Prolog thread
-			final_result = self._collect_query_results()
+			logger.debug("Querying predicate: %s", predicate)
+			# Step 1: Fetch at most `count` solutions in a single round-trip
+			goal = self._qualify(predicate)
+			if count is not None:
+				goal = f"limit({count}, {goal})"
+			results = self._run_query(goal)
 
-			# Step 3: Extract and return values from the results
-			return self._extract_values(final_result, count)
+			# Step 2: Extract and return values from the results
+			return self._extract_values(results, count)
 
 		except Exception as e:
 			logger.error(f"Error querying predicate '{predicate}': {e}")
 			return None
 
-	def _collect_query_results(self) -> List[dict]:
-		"""
-		Collects results from the asynchronous Prolog query.
-
-		Returns:
-			List[dict]: A list of query results.
-		"""
-		final_result = []
-		while True:
-			result = self.prolog_thread.query_async_result()
-			if result is None:
-				break
-			elif result is False:
-				logger.debug("Query returned False.")
-				return []
-			else:
-				logger.debug(f"Result: {result}")
-				final_result.append(result)
-		return final_result
-
-	def _extract_values(self, results: List[dict], count: Optional[int]) -> Optional[List[Union[str, bool]]]:
+	def _extract_values(self, results: Union[bool, List[dict]], count: Optional[int]) -> Optional[List[Union[str, bool]]]:
 		"""
 		Extracts variable values from the query results.
 
 		Args:
-			results (List[dict]): The list of query results.
+			results (Union[bool, List[dict]]): The query result: False if there is no solution, True if the goal
+				succeeded without variable bindings, or one dictionary of bindings per solution.
 			count (Optional[int]): The number of values to return.
 
 		Returns:
 			Optional[List[Union[str, bool]]]: A list of extracted values, or None if no values are found.
 		"""
 		if not results:
+			logger.debug("Query returned False.")
 			return None
+		if results is True:
+			return [True]
 
 		# Extract the first value from each result dictionary
-		values = [list(result[0].values())[0] for result in results if result]
-		logger.debug(f"Extracted values: {values}")
+		values = [list(result.values())[0] for result in results if result]
+		logger.debug("Extracted values: %s", values)
 
 		return values[:count] if count is not None else values
 
@@ -294,23 +645,77 @@ class Solver:
 			ValueError: If the predicate evaluation or execution fails.
 		"""
 		try:
-			logger.debug(f"Applying predicate: {predicate}")
+			logger.debug("Applying predicate: %s", predicate)
 
 			# Step 1: Execute the predicate in the Prolog thread
 			result = self._execute_predicate(predicate)
 
 			# Step 2: Log and return the result
 			if result:
-				logger.debug(f"Predicate '{predicate}' applied successfully: {result}")
+				logger.debug("Predicate '%s' applied successfully: %s", predicate, result)
 				return True
 			else:
-				logger.debug(f"Predicate '{predicate}' failed.")
+				logger.debug("Predicate '%s' failed.", predicate)
 				return False
 
 		except Exception as e:
 			logger.error(f"Failed to apply predicate '{predicate}': {e}")
 			return None
 
+	def _run_query(self, goal: str, bounded: bool = True, scale: int = 1) -> Union[bool, List[dict]]:
+		"""
+		Run a goal in the solver's Prolog thread within the solver's wall-clock timeout and, if `bounded`, its
+		inference limit. A violated budget is recorded in `last_violation` and the error is re-raised.
+
+		Args:
+			goal (str): The Prolog goal, optionally terminated by a full stop.
+			bounded (bool): Whether to apply the inference limit (default is True).
+			scale (int): Factor applied to the budgets, e.g. the number of rounds of a match (default is 1).
+
+		Returns:
+			Union[bool, List[dict]]: The result of the query.
+		"""
+		self.last_violation = None
+		goal = goal.strip().rstrip(".")
+		metrics = Metrics.get_metrics()
+		kind = query_kind(goal) if metrics.enabled else None
+		if bounded and self.inference_limit:
+			goal = f"engine:bounded_call({self.inference_limit * scale}, ({goal}))"
+		timeout = self.query_timeout * scale if self.query_timeout else None
+		start = time.perf_counter()
+		error = False
+		try:
+			return self.prolog_thread.query(goal, query_timeout_seconds=timeout)
+		except PrologQueryTimeoutError:
+			error = True
+			self.record_violation("timeout")
+			raise
+		except PrologError as e:
+			error = True
+			if "inference_limit_exceeded" in str(e):
+				self.record_violation("inference_limit")
+			elif "time_limit_exceeded" in str(e):
+				self.record_violation("timeout")
+			raise
+		except Exception:
+			error = True
+			raise
+		finally:
+			if kind is not None:
+				metrics.observe("solver_query", kind, time.perf_counter() - start, error)
+
+	def record_violation(self, kind: str) -> None:
+		"""
+		Record that a query exceeded one of the solver's budgets.
+
+		Args:
+			kind (str): "timeout" or "inference_limit".
+		"""
+		self.last_violation = kind
+		self.violations[kind] += 1
+		self.pool.record_violation(kind)
+		logger.error(f"A query in module {self.module} exceeded its {kind.replace('_', ' ')} budget.")
+
 	def _execute_predicate(self, predicate: str) -> Optional[bool]:
 		"""
 		Executes a Prolog query for a given predicate.
@@ -322,7 +727,69 @@ class Solver:
 			Optional[bool]: The result of the query, or None if an error occurs.
 		"""
 		try:
-			return self.prolog_thread.query(predicate)
+			return self._run_query(self._qualify(predicate))
 		except Exception as e:
 			logger.error(f"Error executing predicate '{predicate}': {e}")
 			return None
+
+	def observe(self, opponent: str, move: str) -> Optional[bool]:
+		"""
+		Record an opponent's move: overwrite its `last_move/2` fact and, when tracking history, append the move to
+		`history/3`. Both are constant-time updates of the solver's module.
+
+		Args:
+			opponent (str): The opponent's player name.
+			move (str): The opponent's move.
+
+		Returns:
+			Optional[bool]: True if the move was recorded, False if it failed, None if an exception occurred.
+		"""
+		history = "true" if self.track_history else "false"
+		return self.apply_predicate(f"engine:observe({self.module}, {opponent}, '{move}', {history}).")
+
+	def play_match(
+			self,
+			other: 'Solver',
+			rounds: int,
+			players: Tuple[str, str],
+			other_players: Tuple[str, str]
+	) -> Optional[Tuple[List[list], Union[str, dict]]]:
+		"""
+		Play a whole match against another solver inside the engine with a single query.
+
+		Both solvers must be leased from the same server, since the match driver calls into both modules.
+
+		Args:
+			other (Solver): The opponent's solver.
+			rounds (int): The number of rounds to play.
+			players (Tuple[str, str]): This solver's player name and the opponent's name in its game.
+			other_players (Tuple[str, str]): The other solver's player name and the opponent's name in its game.
+
+		Every select and update step is bounded by this solver's inference limit, and the whole match by its timeout
+		scaled by the number of rounds.
+
+		Returns:
+			Optional[Tuple[List[list], Union[str, dict]]]: The `[move, other_move, payoff, other_payoff]` list of every
+				completed round and the outcome (`"completed"` or a `failed(Stage, Agent)` or `exceeded(Stage, Agent)`
+				term), or None if the match cannot be played in the engine.
+		"""
+		if not (self.lease and other.lease and self.lease.server is other.lease.server):
+			return None
+
+		limit = self.inference_limit if self.inference_limit else "inf"
+		history = "true" if self.track_history else "false"
+		other_history = "true" if other.track_history else "false"
+		query = (
+			f"engine:play_match(agent({self.module}, {players[0]}, {players[1]}, {history}), "
+			f"agent({other.module}, {other_players[0]}, {other_players[1]}, {other_history}), "
+			f"{limit}, {rounds}, Results, Outcome)."
+		)
+		try:
+			logger.debug("Playing match in the engine: %s", query)
+			result = self._run_query(query, bounded=False, scale=max(rounds, 1))
+			if not result:
+				return None
+			return result[0]["Results"], result[0]["Outcome"]
+		except Exception as e:
+			logger.error(f"Error playing match between modules {self.module} and {other.module}: {e}")
+			return None
@@ -0,0 +1,170 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+from src.agent import Agent
+from src.agents.random_agent import RandomAgent
+from src.setup_logger import logger
+
+
+class StrategyAutomaton:
+	"""
+	A strategy compiled to a finite-state transition table over the moves of a game.
+
+	The state is the pair (default move, opponent's last move), where a last move of None stands for the first round.
+
+	Attributes:
+		moves (List[str]): The possible moves of the game, sorted by name.
+		transitions (Dict[Tuple[str, Optional[str]], str]): The move selected in every state.
+		stochastic (bool): Whether the strategy does not always select the same move in the same state.
+	"""
+
+	def __init__(self, moves: List[str], transitions: Dict[Tuple[str, Optional[str]], str], stochastic: bool = False):
+		"""
+		Initialize the automaton.
+
+		Args:
+			moves (List[str]): The possible moves of the game.
+			transitions (Dict[Tuple[str, Optional[str]], str]): The move selected in every state.
+			stochastic (bool): Whether the strategy is stochastic (default is False).
+		"""
+		self.moves = sorted(moves)
+		self.transitions = transitions
+		self.stochastic = stochastic
+
+	def select(self, default_move: str, last_move: Optional[str] = None) -> Optional[str]:
+		"""
+		Get the move selected in a state.
+
+		Args:
+			default_move (str): The agent's default move.
+			last_move (Optional[str]): The opponent's last move, or None in the first round.
+
+		Returns:
+			Optional[str]: The selected move, or None if the state is unknown or the strategy is stochastic.
+		"""
+		if self.stochastic:
+			return None
+		return self.transitions.get((default_move, last_move))
+
+	def to_indices(self, default_move: str) -> Optional[Tuple[int, int, int]]:
+		"""
+		Express the automaton for one default move in the format of `fast_tournament.STRATEGY_AUTOMATA`.
+
+		Args:
+			default_move (str): The agent's default move.
+
+		Returns:
+			Optional[Tuple[int, int, int]]: The indices of the moves selected after the opponent played the first and
+				second move and in the first round, or None if the automaton is not a deterministic 2x2 one.
+		"""
+		if self.stochastic or len(self.moves) != 2:
+			return None
+		selected = [self.select(default_move, last_move) for last_move in (self.moves[0], self.moves[1], None)]
+		if any(move not in self.moves for move in selected):
+			return None
+		return tuple(self.moves.index(move) for move in selected)
+
+
+class StrategyCompiler:
+	"""
+	Characterizes the `select/4` strategy of a loaded agent as a `StrategyAutomaton`.
+
+	The strategy is probed through the agent's `Solver` in every (default move, opponent's last move) state, each
+	state several times to detect stochastic strategies. Results are cached per program, so agents loaded from the same
+	game rules and strategy are compiled once.
+
+	Attributes:
+		samples (int): How many times every state is probed.
+	"""
+
+	def __init__(self, samples: int = 3):
+		"""
+		Initialize the compiler.
+
+		Args:
+			samples (int): How many times every state is probed (default is 3).
+		"""
+		self.samples = samples
+		self._automata: Dict[str, Optional[StrategyAutomaton]] = {}
+		self._lock = threading.Lock()
+
+	def compile(self, agent: Agent) -> Optional[StrategyAutomaton]:
+		"""
+		Compile an agent's strategy. The agent's solver state is reset afterwards.
+
+		Args:
+			agent (Agent): A valid, loaded agent.
+
+		Returns:
+			Optional[StrategyAutomaton]: The automaton, or None if the strategy could not be probed in every state.
+		"""
+		moves = agent.game.get_possible_moves() or []
+		if not moves:
+			return None
+
+		# Agents that override how moves are selected, like the random agent, are not driven by select/4
+		if isinstance(agent, RandomAgent) or type(agent).play is not Agent.play:
+			return StrategyAutomaton(moves, {}, stochastic=True)
+		if not agent.solver or not agent.player_name:
+			return None
+
+		key = agent.solver.program.key if agent.solver.program else None
+		with self._lock:
+			if key is not None and key in self._automata:
+				return self._automata[key]
+
+		automaton = self._probe(agent, moves)
+		agent.solver.reset_state()
+		logger.debug(f"Compiled strategy {agent.strategy_name} of agent {agent.name}: "
+					 f"{automaton.transitions if automaton else None}")
+
+		if key is not None:
+			with self._lock:
+				self._automata[key] = automaton
+		return automaton
+
+	def _probe(self, agent: Agent, moves: List[str]) -> Optional[StrategyAutomaton]:
+		"""
+		Probe the agent's strategy in every state.
+
+		Args:
+			agent (Agent): The agent.
+			moves (List[str]): The possible moves of the game.
+
+		Returns:
+			Optional[StrategyAutomaton]: The automaton, or None if a probe failed.
+		"""
+		transitions = {}
+		stochastic = False
+		for default_move in moves:
+			for last_move in [None] + list(moves):
+				selected = {self._probe_state(agent, default_move, last_move) for _ in range(self.samples)}
+				if None in selected:
+					logger.debug(f"Strategy {agent.strategy_name} selects no move after "
+								 f"default move {default_move} and last move {last_move}.")
+					return None
+				if len(selected) > 1:
+					stochastic = True
+				transitions[(default_move, last_move)] = sorted(selected)[0]
+		return StrategyAutomaton(moves, transitions, stochastic)
+
+	def _probe_state(self, agent: Agent, default_move: str, last_move: Optional[str]) -> Optional[str]:
+		"""
+		Set up one state in the agent's solver and select a move, in a single query.
+
+		Args:
+			agent (Agent): The agent.
+			default_move (str): The default move to set.
+			last_move (Optional[str]): The opponent's last move to set, or None for the first round.
+
+		Returns:
+			Optional[str]: The selected move, or None if no move was selected.
+		"""
+		goals = [
+			"retractall(initially(last_move(_, _), _))",
+			f"initialise(default_move({agent.player_name}, '{default_move}'), s0)"
+		]
+		if last_move is not None:
+			goals.append(f"initialise(last_move({agent.opponent_name}, '{last_move}'), s0)")
+		goals.append(f"select({agent.player_name}, _, s0, M)")
+		move = agent.solver.get_variable_values(", ".join(goals) + ".", 1)
+		return move[0] if move else None
@@ -1,9 +1,17 @@
+import asyncio
 import itertools
 import os
-import tempfile
-from typing import List, Optional, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
 from src.agent import Agent
+from src.agent_store import AgentStore, is_agent_store
+from src.base_llm import BaseLLM
+from src.event_log import RoundEventLog
 from src.agents.random_agent import RandomAgent
+from src.prolog_pool import PrologServerPool
+from src.rate_limiter import RequestThrottle
 from src.setup_logger import logger
 from src.utils import read_file, set_normalized_path
 
@@ -22,6 +30,9 @@ class Tournament:
 		num_rounds (int): Number of rounds in the tournament.
 		clones (bool): Whether agents use the same strategy and play against their clones.
 		use_default_strategy (bool): Flag to use the default strategy.
+		in_engine_matches (bool): Whether matches are played inside Prolog with a single query when possible.
+		parallelism (int): Number of matches played concurrently, each worker using its own Prolog server.
+		llm_factory (Optional[Callable[[], BaseLLM]]): Creates the language model of each agent (None uses GPT-4).
 		default_strategy (str): Path to the default strategy file.
 		clone_strategy (str): Path to the clones' strategy file.
 		solver_path (str): Path to the solver.
@@ -55,6 +66,11 @@ class Tournament:
 				 strategy_prompt_path: Optional[str] = None,
 				 jsons_path: Optional[str] = None,
 				 use_default_strategy: bool = False,
+				 in_engine_matches: bool = False,
+				 parallelism: int = 1,
+				 llm_factory: Optional[Callable[[], BaseLLM]] = None,
+				 event_log: Optional[RoundEventLog] = None,
+				 keep_history: bool = True,
 				 root: str = "."):
 		"""
 		Initialize a Tournament instance with the specified parameters.
@@ -74,8 +90,17 @@ class Tournament:
 			game_rules_path (Optional[str]): Path to game rules (default is None).
 			strategies_rules_path (Optional[str]): Path to strategy rules (default is None).
 			strategy_prompt_path (Optional[str]): Path to a strategy prompt (default is None).
-			jsons_path (Optional[str]): Path to store JSON files (default is None).
+			jsons_path (Optional[str]): Path to stored JSON files, or to an `AgentStore` file (default is None).
 			use_default_strategy (bool): Whether to use the default strategy (default is False).
+			in_engine_matches (bool): Whether to play matches inside Prolog when both agents share a server
+				(default is False).
+			parallelism (int): Number of matches played concurrently (default is 1).
+			llm_factory (Optional[Callable[[], BaseLLM]]): Creates the language model of each agent, e.g. a fake
+				model for offline runs (default is None, i.e. GPT-4).
+			event_log (Optional[RoundEventLog]): Log the rounds are streamed to while they are played
+				(default is None).
+			keep_history (bool): Whether agents keep every move and payoff, or only running aggregates
+				(default is True).
 			root (str): Root directory for paths (default is ".").
 
 		Raises:
@@ -96,6 +121,11 @@ class Tournament:
 		self.num_rounds = num_rounds
 		self.clones = clones
 		self.use_default_strategy = use_default_strategy
+		self.in_engine_matches = in_engine_matches
+		self.parallelism = parallelism
+		self.llm_factory = llm_factory
+		self.event_log = event_log
+		self.keep_history = keep_history
 
 		# Set up paths
 		self.default_strategy = os.path.join(self.root, set_normalized_path("DATA/STRATEGIES/tit-for-tat.pl"))
@@ -109,6 +139,7 @@ class Tournament:
 		self.strategy_prompt_path = strategy_prompt_path
 		self.jsons_path = jsons_path
 		self.jsons_list = None
+		self.agent_store: Optional[AgentStore] = None  # Open while agents are created from a store
 
 		# Initialize other attributes
 		self.target_payoffs = target_payoffs if target_payoffs else []
@@ -139,14 +170,30 @@ class Tournament:
 		Raises:
 			ValueError: If the number of strategies does not match the number of agents.
 		"""
-		# Step 1: Determine strategies based on the specified configuration
-		self._initialize_strategies()
+		with self._open_agent_store():
+			# Step 1: Determine strategies based on the specified configuration
+			self._initialize_strategies()
 
-		# Step 2: Validate that the number of strategies matches the number of agents
-		self._validate_strategies()
+			# Step 2: Validate that the number of strategies matches the number of agents
+			self._validate_strategies()
 
-		# Step 3: Create agents based on the strategies and JSON files (if any)
-		self._create_agents_from_strategies()
+			# Step 3: Create agents based on the strategies and JSON files (if any)
+			self._create_agents_from_strategies()
+
+	@contextmanager
+	def _open_agent_store(self) -> Iterator[None]:
+		"""
+		Open the agent store while agents are created, if `jsons_path` is one, and close it afterwards.
+		"""
+		if not is_agent_store(self.jsons_path):
+			yield
+			return
+		with AgentStore(self.jsons_path) as store:
+			self.agent_store = store
+			try:
+				yield
+			finally:
+				self.agent_store = None
 
 	def _initialize_strategies(self) -> None:
 		"""
@@ -179,7 +226,8 @@ class Tournament:
 
 		# If using JSON files, ensure that the number of agents and strategies match
 		if self.jsons_path:
-			self.jsons_list = os.listdir(self.jsons_path)
+			self.jsons_list = (self.agent_store.names() if self.agent_store is not None
+							   else os.listdir(self.jsons_path))
 			if len(self.jsons_list) == 1:
 				self.jsons_list *= self.num_agents
 			if len(self.strategies) != len(self.jsons_list):
@@ -190,42 +238,123 @@ class Tournament:
 		Create agents using the initialized strategies and JSON files (if any).
 		"""
 		for strat_num, strategy in enumerate(self.strategies):
-			strategy_rules = strategy if self.strategies_rules_path or self.use_default_strategy else None
-			strategy_string = strategy if self.strategies_path else None
-
-			agent_json = None
-			if self.jsons_path:
-				self.json_path = self.jsons_list[strat_num]
-				agent_json = os.path.join(self.jsons_path, self.json_path)
-
-			agent_class = self._get_agent_class(strat_num)
-			agent = agent_class(
-				game_string=self.game_description,
-				strategy_path=strategy_rules,
-				solver_path=self.solver_path,
-				prompt_path=self.prompt_path,
-				feedback_prompt_path=self.feedback_prompt_path,
-				game_path=self.game_rules_path,
-				strategy_string=strategy_string,
-				strategy_prompt_path=self.strategy_prompt_path,
-				max_attempts=self.max_attempts,
-				agent_json=agent_json
-			)
-
-			# Override strategy if JSON agents are provided with strategy rules
-			if self.jsons_path and self.strategies_rules_path:
-				agent.strategy = strategy
-				agent.strategy_name = self.strategies_names[strat_num]
-				agent.load_solver()
-
-			if self.strategies_path:
-				agent.strategy_name = self.strategies_names[strat_num]
-
-			# Add agent to the appropriate list based on its validity
-			if agent.valid:
-				self.agents.append(agent)
-			else:
-				self.invalid_agents.append(agent)
+			agent = self._build_agent(strat_num, strategy)
+			self._register_agent(strat_num, strategy, agent)
+
+	def create_agents_concurrently(self, concurrency: int = 8, requests_per_second: Optional[float] = None,
+								   max_retries: int = 3) -> None:
+		"""
+		Create agents like `create_agents`, autoformalizing them concurrently with asynchronous LLM calls.
+
+		Args:
+			concurrency (int): Maximum number of LLM requests in flight (default is 8).
+			requests_per_second (Optional[float]): Maximum LLM request rate (default is None, i.e. unlimited).
+			max_retries (int): Number of retries of a failed LLM request (default is 3).
+		"""
+		asyncio.run(self.acreate_agents(concurrency, requests_per_second, max_retries))
+
+	async def acreate_agents(self, concurrency: int = 8, requests_per_second: Optional[float] = None,
+							 max_retries: int = 3) -> None:
+		"""
+		Create agents, autoformalizing them concurrently. Agents are registered in strategy order, so the result
+		is the same as with `create_agents`.
+
+		Args:
+			concurrency (int): Maximum number of LLM requests in flight (default is 8).
+			requests_per_second (Optional[float]): Maximum LLM request rate (default is None, i.e. unlimited).
+			max_retries (int): Number of retries of a failed LLM request (default is 3).
+		"""
+		# Step 1: Determine and validate strategies
+		with self._open_agent_store():
+			self._initialize_strategies()
+			self._validate_strategies()
+
+			# Step 2: Create uninitialized agents
+			agents = [self._build_agent(strat_num, strategy, initialize=False)
+					  for strat_num, strategy in enumerate(self.strategies)]
+
+		# Step 3: Autoformalize all agents concurrently under a shared request throttle
+		throttle = RequestThrottle(concurrency, requests_per_second, max_retries)
+		await asyncio.gather(*(agent.initialize_async(throttle) for agent in agents))
+		logger.debug(f"Created {len(agents)} agents concurrently: {throttle.metrics()}")
+
+		# Step 4: Register agents in strategy order
+		for strat_num, (strategy, agent) in enumerate(zip(self.strategies, agents)):
+			self._register_agent(strat_num, strategy, agent)
+
+	def _create_llm(self) -> Optional[BaseLLM]:
+		"""
+		Create the language model of a new agent.
+
+		Returns:
+			Optional[BaseLLM]: The model, or None to let the agent use its default.
+		"""
+		return self.llm_factory() if self.llm_factory else None
+
+	def _build_agent(self, strat_num: int, strategy: Optional[str], initialize: bool = True) -> Agent:
+		"""
+		Create the agent for one strategy.
+
+		Args:
+			strat_num (int): The index of the strategy.
+			strategy (Optional[str]): The strategy (a path, rules or a description, depending on the configuration).
+			initialize (bool): Whether to initialize the agent now (default is True).
+
+		Returns:
+			Agent: The new agent.
+		"""
+		strategy_rules = strategy if self.strategies_rules_path or self.use_default_strategy else None
+		strategy_string = strategy if self.strategies_path else None
+
+		agent_json = None
+		agent_record = None
+		if self.agent_store is not None:
+			agent_record = self.agent_store[self.jsons_list[strat_num]]
+		elif self.jsons_path:
+			self.json_path = self.jsons_list[strat_num]
+			agent_json = os.path.join(self.jsons_path, self.json_path)
+
+		agent_class = self._get_agent_class(strat_num)
+		return agent_class(
+			game_string=self.game_description,
+			strategy_path=strategy_rules,
+			solver_path=self.solver_path,
+			prompt_path=self.prompt_path,
+			feedback_prompt_path=self.feedback_prompt_path,
+			game_path=self.game_rules_path,
+			strategy_string=strategy_string,
+			strategy_prompt_path=self.strategy_prompt_path,
+			max_attempts=self.max_attempts,
+			agent_json=agent_json,
+			agent_record=agent_record,
+			llm=self._create_llm(),
+			initialize=initialize,
+			keep_history=self.keep_history
+		)
+
+	def _register_agent(self, strat_num: int, strategy: Optional[str], agent: Agent) -> None:
+		"""
+		Finish setting up an initialized agent and add it to the valid or invalid agents.
+
+		Args:
+			strat_num (int): The index of the strategy.
+			strategy (Optional[str]): The strategy the agent was created with.
+			agent (Agent): The agent.
+		"""
+		# Override strategy if JSON agents are provided with strategy rules
+		if self.jsons_path and self.strategies_rules_path:
+			agent.strategy = strategy
+			agent.strategy_name = self.strategies_names[strat_num]
+			agent.load_solver()
+
+		if self.strategies_path:
+			agent.strategy_name = self.strategies_names[strat_num]
+
+		# Add agent to the appropriate list based on its validity
+		if agent.valid:
+			self.agents.append(agent)
+		else:
+			self.invalid_agents.append(agent)
 
 	def _load_strategies_from_rules(self) -> (List[str], List[str]):
 		"""
@@ -280,10 +409,13 @@ class Tournament:
 				return RandomAgent
 		return Agent
 
-	def play_tournament(self) -> None:
+	def play_tournament(self, parallelism: Optional[int] = None) -> None:
 		"""
 		Run the tournament where agents play against each other.
 		Raises a ValueError if agents have not been created.
+
+		Args:
+			parallelism (Optional[int]): Number of matches played concurrently (default is the tournament's setting).
 		"""
 		# Step 1: Validate that agents have been created
 		if not self.agents:
@@ -293,7 +425,27 @@ class Tournament:
 		agent_pairs = self._generate_agent_pairs()
 
 		# Step 3: Conduct matches between agent pairs
-		self._play_matches(agent_pairs)
+		parallelism = parallelism if parallelism is not None else self.parallelism
+		try:
+			if parallelism > 1:
+				self._play_matches_in_parallel(agent_pairs, parallelism)
+			else:
+				self._play_matches(agent_pairs)
+		finally:
+			if self.event_log:
+				self.event_log.flush()
+			# Clones are created for every run of the tournament and only play their own match
+			if self.clones:
+				for _, clone in agent_pairs:
+					clone.close()
+
+	def close(self) -> None:
+		"""
+		Release the solvers of all agents. Their results are kept for logging, but the tournament cannot be played
+		again afterwards.
+		"""
+		for agent in self.agents + self.invalid_agents:
+			agent.close()
 
 	def _generate_agent_pairs(self) -> List[Tuple[Agent, Agent]]:
 		"""
@@ -317,20 +469,12 @@ class Tournament:
 		"""
 		agent_clones = []
 		for agent in self.agents:
-			with tempfile.NamedTemporaryFile(
-					mode='w+', dir=os.path.join("DATA", "TEMP"), suffix=".pl", delete=False
-			) as temp_file:
-				temp_file.write(agent.game.game_rules)
-				temp_file_path = temp_file.name
-
 			# Create a clone with the same game rules
-			clone = Agent(strategy_path=self.clone_strategy, game_path=temp_file_path, solver_path=self.solver_path)
+			clone = Agent(strategy_path=self.clone_strategy, game_rules=agent.game.game_rules,
+						  solver_path=self.solver_path, llm=self._create_llm(), keep_history=self.keep_history)
 			clone.name = f"{agent.name}_clone"
 			agent_clones.append(clone)
 
-			# Remove the temporary file after cloning
-			os.remove(temp_file_path)
-
 		return [(agent, clone) for agent, clone in zip(self.agents, agent_clones)]
 
 	def _play_matches(self, agent_pairs: List[Tuple[Agent, Agent]]) -> None:
@@ -340,44 +484,193 @@ class Tournament:
 		Args:
 			agent_pairs (List[Tuple[Agent, Agent]]): List of tuples representing pairs of agents.
 		"""
-		for agent1, agent2 in agent_pairs:
-			agent1.load_solver()
-			agent2.load_solver()
-			valid_pair = self._play_match(agent1, agent2)
+		for match_num, (agent1, agent2) in enumerate(agent_pairs):
+			agent1.reset_for_match()
+			agent2.reset_for_match()
+			valid_pair = self._play_match(agent1, agent2, match_num)
+			self._log_match_end(match_num, agent1, agent2, valid_pair)
 			if not valid_pair:
 				logger.debug(
 					f"Agent {agent1.name} or {agent2.name} not valid. Excluding the pair from the tournament.")
 				agent1.state = 'disqualified'
 				agent2.state = 'disqualified'
 
-	def _play_match(self, agent1: Agent, agent2: Agent) -> bool:
+	def _play_matches_in_parallel(self, agent_pairs: List[Tuple[Agent, Agent]], parallelism: int) -> None:
+		"""
+		Play the matches between agent pairs concurrently.
+
+		Every match is played by per-match copies of its agents, so an agent can take part in several matches at
+		once. Each worker thread leases from its own Prolog server, and the copies release their leases as soon as
+		their match is over. Once all matches are over, the copies' moves and payoffs are merged into the original agents in pair order, giving the same result as playing sequentially.
+
+		Args:
+			agent_pairs (List[Tuple[Agent, Agent]]): List of tuples representing pairs of agents.
+			parallelism (int): Number of worker threads and Prolog servers.
+		"""
+		pools = [PrologServerPool(max_servers=1) for _ in range(parallelism)]
+		worker_ids = itertools.count()
+		worker = threading.local()
+
+		def assign_pool() -> None:
+			worker.pool = pools[next(worker_ids)]
+
+		def play(match_num: int, agent1: Agent, agent2: Agent) -> Tuple[bool, Agent, Agent]:
+			copy1 = agent1.copy_for_match(worker.pool)
+			copy2 = copy1 if agent2 is agent1 else agent2.copy_for_match(worker.pool)
+			try:
+				valid_pair = self._play_match(copy1, copy2, match_num)
+			except Exception as e:
+				logger.error(f"Match between {agent1.name} and {agent2.name} failed: {e}")
+				valid_pair = False
+			finally:
+				# Release the leases now, as merging only needs the moves and payoffs and a worker plays more
+				# matches than its server has leases
+				for agent_copy in (copy1, copy2):
+					agent_copy.close()
+			self._log_match_end(match_num, agent1, agent2, valid_pair)
+			return valid_pair, copy1, copy2
+
+		try:
+			with ThreadPoolExecutor(max_workers=parallelism, initializer=assign_pool) as executor:
+				matches = [executor.submit(play, match_num, agent1, agent2)
+						   for match_num, (agent1, agent2) in enumerate(agent_pairs)]
+				results = [match.result() for match in matches]
+
+			# Merge the per-match copies back in pair order
+			for (agent1, agent2), (valid_pair, copy1, copy2) in zip(agent_pairs, results):
+				agent1.merge_match(copy1)
+				if agent2 is not agent1:
+					agent2.merge_match(copy2)
+				if not valid_pair:
+					logger.debug(
+						f"Agent {agent1.name} or {agent2.name} not valid. Excluding the pair from the tournament.")
+					agent1.state = 'disqualified'
+					agent2.state = 'disqualified'
+		finally:
+			for pool in pools:
+				pool.shutdown()
+
+	def _play_match(self, agent1: Agent, agent2: Agent, match_num: Optional[int] = None) -> bool:
 		"""
 		Play a match between two agents for multiple rounds.
 
 		Args:
 			agent1 (Agent): The first agent.
 			agent2 (Agent): The second agent.
+			match_num (Optional[int]): The index of the agent pair, reported in the event log (default is None).
 
 		Returns:
 			bool: True if both agents are valid throughout the match, False otherwise.
 		"""
+		if self.in_engine_matches:
+			valid_pair = self._play_match_in_engine(agent1, agent2, match_num)
+			if valid_pair is not None:
+				return valid_pair
+
 		for round_num in range(self.num_rounds):
-			logger.debug(
-				f"\nAgent {agent1.name} with {agent1.strategy_name} vs {agent2.name} with {agent2.strategy_name}, Round {round_num}.")
+			logger.debug("\nAgent %s with %s vs %s with %s, Round %s.", agent1.name, agent1.strategy_name,
+						 agent2.name, agent2.strategy_name, round_num)
 
 			# Get moves from both agents
 			move_agent_1, move_agent_2 = agent1.play(), agent2.play()
 			if not (move_agent_1 and move_agent_2):
 				return False
 
-			# Update payoffs based on the opponents' moves
+			# Update payoffs based on the opponents' moves, reading each one before the other update, as an agent
+			# playing against itself records both
 			updated_1 = agent1.update_payoff(move_agent_2)
+			payoff_1 = agent1.payoffs[-1] if updated_1 else None
 			updated_2 = agent2.update_payoff(move_agent_1)
+			payoff_2 = agent2.payoffs[-1] if updated_2 else None
 			if not (updated_1 and updated_2):
 				return False
+			self._log_round(match_num, round_num, agent1, agent2, move_agent_1, move_agent_2, payoff_1, payoff_2)
 
 		return True
 
+	def _log_round(self, match_num: Optional[int], round_num: int, agent1: Agent, agent2: Agent,
+				   move_agent_1: str, move_agent_2: str, payoff_1: float, payoff_2: float) -> None:
+		"""
+		Stream a round to the event log, if there is one.
+
+		Args:
+			match_num (Optional[int]): The index of the agent pair.
+			round_num (int): The round number within the match.
+			agent1 (Agent): The first agent.
+			agent2 (Agent): The second agent.
+			move_agent_1 (str): The first agent's move.
+			move_agent_2 (str): The second agent's move.
+			payoff_1 (float): The first agent's payoff.
+			payoff_2 (float): The second agent's payoff.
+		"""
+		if self.event_log:
+			self.event_log.record_round(match_num, round_num, agent1.name, agent2.name,
+										move_agent_1, move_agent_2, payoff_1, payoff_2)
+
+	def _log_match_end(self, match_num: int, agent1: Agent, agent2: Agent, valid_pair: bool) -> None:
+		"""
+		Stream the end of a match to the event log, if there is one.
+
+		Args:
+			match_num (int): The index of the agent pair.
+			agent1 (Agent): The first agent.
+			agent2 (Agent): The second agent.
+			valid_pair (bool): Whether both agents stayed valid throughout the match.
+		"""
+		if self.event_log:
+			self.event_log.record("match_end", match=match_num, agent_1=agent1.name, agent_2=agent2.name,
+								  valid=valid_pair)
+
+	def _play_match_in_engine(self, agent1: Agent, agent2: Agent, match_num: Optional[int] = None) -> Optional[bool]:
+		"""
+		Play all rounds of a match inside Prolog with a single query.
+
+		Only agents using the solver's `select/4` (not overriding `Agent.play`) whose solvers share a server can be
+		matched in the engine; an agent playing against itself is always matched in Python.
+
+		Args:
+			agent1 (Agent): The first agent.
+			agent2 (Agent): The second agent.
+			match_num (Optional[int]): The index of the agent pair, reported in the event log (default is None).
+
+		Returns:
+			Optional[bool]: True if both agents are valid throughout the match, False otherwise,
+							or None if the match has to be played in Python.
+		"""
+		if agent1 is agent2 or type(agent1).play is not Agent.play or type(agent2).play is not Agent.play:
+			return None
+		if not (agent1.solver and agent2.solver and agent1.player_name and agent2.player_name):
+			return None
+
+		match = agent1.solver.play_match(agent2.solver, self.num_rounds,
+										 (agent1.player_name, agent1.opponent_name),
+										 (agent2.player_name, agent2.opponent_name))
+		if match is None:
+			return None
+
+		rounds, outcome = match
+		logger.debug(f"\nAgent {agent1.name} with {agent1.strategy_name} vs {agent2.name} with {agent2.strategy_name}, "
+					 f"{len(rounds)} rounds played in the engine: {outcome}.")
+		for round_num, (move_agent_1, move_agent_2, payoff_1, payoff_2) in enumerate(rounds):
+			agent1.record_round(move_agent_1, move_agent_2, float(payoff_1))
+			agent2.record_round(move_agent_2, move_agent_1, float(payoff_2))
+			self._log_round(match_num, round_num, agent1, agent2, move_agent_1, move_agent_2,
+							float(payoff_1), float(payoff_2))
+
+		if outcome == "completed":
+			return True
+
+		# A failed selection is a runtime error of the agent that did not move, and a step that ran out of
+		# inferences is one of the agent that took it
+		stage, agent_num = outcome["args"]
+		agent = agent1 if agent_num == 1 else agent2
+		if outcome["functor"] == "exceeded":
+			agent.solver.record_violation("inference_limit")
+			agent.set_runtime_error("inference_limit")
+		elif stage == "select":
+			agent.set_runtime_error()
+		return False
+
 	def get_winners(self) -> List[Agent]:
 		"""
 		Determine the winners of the tournament.
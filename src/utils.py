@@ -2,8 +2,11 @@ import os
 import random
 import re
 import json
+from collections import deque
+from functools import lru_cache
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Union, TYPE_CHECKING
+from src.columnar_log import write_tournament
 
 if TYPE_CHECKING:
     from src.tournament import Tournament
@@ -95,6 +98,31 @@ def read_file(filename: str) -> Optional[str]:
 		return None
 
 
+def read_file_cached(filename: str) -> Optional[str]:
+	"""
+	Reads the content of a file that is read repeatedly, e.g. the solver, and caches it until the file changes.
+
+	Args:
+		filename (str): The path to the file to be read.
+
+	Returns:
+		Optional[str]: The content of the file as a string if successful, or None if an error occurs.
+	"""
+	try:
+		stat = os.stat(filename)
+	except OSError:
+		return read_file(filename)
+	return _read_file_version(filename, stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=64)
+def _read_file_version(filename: str, mtime_ns: int, size: int) -> Optional[str]:
+	"""
+	Reads a version of a file, identified by its modification time and size, for `read_file_cached`.
+	"""
+	return read_file(filename)
+
+
 def set_normalized_path(path: Union[str, None]) -> Optional[str]:
 	"""
 	Normalizes the given file path if it's a string. If the input is not a string, returns it unchanged.
@@ -114,7 +142,8 @@ def set_normalized_path(path: Union[str, None]) -> Optional[str]:
 def log_tournament(
 	experiment_dir: str,
 	tournament: 'Tournament',
-	tournament_name: str = "tournament"
+	tournament_name: str = "tournament",
+	log_format: str = "json"
 ) -> None:
 	"""
 	Logs the details of a tournament, including its configuration and agents' information.
@@ -123,7 +152,15 @@ def log_tournament(
 		experiment_dir (str): The directory where the tournament logs will be saved.
 		tournament (Tournament): The tournament object containing all relevant data.
 		tournament_name (str): The name of the tournament (default is "tournament").
+		log_format (str): "json" for one file per agent, or "parquet" for the columnar tables of
+			`columnar_log.write_tournament` (default is "json").
 	"""
+	if log_format == "parquet":
+		write_tournament(experiment_dir, tournament, tournament_name)
+		return
+	if log_format != "json":
+		raise ValueError(f"Unknown log format '{log_format}'.")
+
 	timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 	tournament_dir = os.path.join(experiment_dir, f"{tournament_name}_{timestamp}")
 	os.makedirs(tournament_dir, exist_ok=True)
@@ -152,8 +189,11 @@ def log_tournament(
 			"game_moves": game.possible_moves,
 			"game_players": game.player_names,
 			"status": agent.status,
+			"runtime_error_type": agent.runtime_error_type,
 			"moves": agent.moves,
 			"payoffs": agent.payoffs,
+			# Without the full history, moves and payoffs only hold the last round
+			"history_complete": agent.keep_history,
 			"total_payoff": agent.get_total_payoff(),
 			"default_move": agent.default_move,
 			"trace_messages": agent.trace_messages,
@@ -167,8 +207,8 @@ def set_default(obj: Any) -> Any:
 	"""
 	Helper function for handling non-serializable objects during JSON serialization.
 
-	This function converts a set to a list for JSON serialization. If the object is not
-	a set, it raises a TypeError.
+	This function converts a set or a deque (e.g. the moves of an agent that does not keep its
+	history) to a list for JSON serialization. Otherwise, it raises a TypeError.
 
 	Args:
 		obj (Any): The object to serialize.
@@ -177,9 +217,9 @@ def set_default(obj: Any) -> Any:
 		Any: The object converted to a serializable format if possible.
 
 	Raises:
-		TypeError: If the object is not serializable (i.e., not a set).
+		TypeError: If the object is not serializable (i.e., not a set or a deque).
 	"""
-	if isinstance(obj, set):
+	if isinstance(obj, (set, deque)):
 		return list(obj)
 	raise TypeError
 
@@ -1,17 +1,30 @@
+import contextlib
+import itertools
 import os
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
+from src.prolog_pool import PrologServerPool
+from src.setup_logger import logger
 from src.solver import Solver
 from src.utils import read_file
+from src.verdict_cache import VerdictCache
 import re
 
+try:
+	from tqdm import tqdm
+except ImportError:  # The progress bar is optional
+	tqdm = None
+
 
 class Validator:
 	"""
 	A class to validate auto-formalized games.
 	"""
 
-	def __init__(self, agents_dir: str, matrices_file: str, payoffs_file: str, validators_dir: str):
+	def __init__(self, agents_dir: str, matrices_file: str, payoffs_file: str, validators_dir: str,
+				 verdict_cache_path: str = None):
 		"""
 		Initializes the Validator with the given directory and file paths.
 
@@ -19,6 +32,8 @@ class Validator:
 			agents_dir (str): Path to the directory containing agent files.
 			matrices_file (str): Path to the file containing matrix data.
 			validators_dir (str): Path to the directory containing validators.
+			verdict_cache_path (str): Path of a persistent cache of constraint and payoff sequence verdicts, so that
+				repeat validations do not query Prolog (default is None, i.e. no cache).
 		"""
 		self.agents_dir = agents_dir
 		with open(matrices_file, 'r') as file:
@@ -43,6 +58,23 @@ class Validator:
 								'sh': [('S', 'S'), ('S', 'H'), ('H', 'H'), ('H', 'S')],
 								'hd': [('S', 'S'), ('S', 'D'), ('D', 'D'), ('D', 'S')]}
 
+		# Indexes built once, so that per-agent bookkeeping is a dictionary lookup
+		self.target_payoff_index = {}  # game file -> target payoff of the row player
+		for game_file, target_payoff in zip(self.target_payoffs['Game File'],
+											self.target_payoffs['Row Player Payoff Sum']):
+			self.target_payoff_index.setdefault(game_file, target_payoff)
+		self.game_types = {}  # game file -> game type
+		self.payoff_assertions = {}  # game file -> assertz(payoff/4) goals of its matrix
+		for filename in self.matrices:
+			game_type_match = re.match(r"^([a-z]+)_", filename)
+			if game_type_match and game_type_match.group(1) in self.actions:
+				self.game_types[filename] = game_type_match.group(1)
+				self.payoff_assertions[filename] = self._render_payoff_array(filename)
+		self.payoff_templates = {}  # (game type, shift) -> payoff/4 queries with variable payoffs
+		self.verdict_cache = VerdictCache(verdict_cache_path) if verdict_cache_path else None
+		self.sources = {}  # path -> content of the Prolog files the checks consult
+		self.sources_lock = threading.Lock()
+
 	def get_validators(self, validators_dir):
 		validators_list = list(os.listdir(validators_dir))
 		validators = {filename.replace(".pl", ""): os.path.join(validators_dir, filename) for filename in
@@ -62,12 +94,33 @@ class Validator:
 		return lst[-positions:] + lst[:-positions]
 
 	def generate_payoff_array(self, filename, variables=False, shift=0):
-		# Extract game type from filename
+		# Look up the payoffs rendered at construction
+		if not variables and filename in self.payoff_assertions:
+			return self.payoff_assertions[filename]
+		if variables:
+			key = (self.get_game_type(filename), shift)
+			if key not in self.payoff_templates:
+				self.payoff_templates[key] = self._render_payoff_array(filename, variables, shift)
+			return self.payoff_templates[key]
+		return self._render_payoff_array(filename, variables, shift)
+
+	def get_game_type(self, filename):
+		"""
+		Get the game type of a game file, e.g. "pd" for "pd_..._1.txt".
+
+		Raises:
+			ValueError: If the filename does not start with a game type.
+		"""
+		if filename in self.game_types:
+			return self.game_types[filename]
 		game_type_match = re.match(r"^([a-z]+)_", filename)
 		if not game_type_match:
 			raise ValueError("Invalid filename format. Game type not found.")
+		return game_type_match.group(1)
 
-		game_type = game_type_match.group(1)
+	def _render_payoff_array(self, filename, variables=False, shift=0):
+		# Extract game type from filename
+		game_type = self.get_game_type(filename)
 
 		# Check if game type exists in actions
 		if game_type not in self.actions:
@@ -116,11 +169,12 @@ class Validator:
 
 		return True
 
-	def compare_payoff_sequence(self, filename, actual_sequence, shift=0):
+	def compare_payoff_sequence(self, filename, actual_sequence, shift=0, solver=None):
+		solver = solver if solver else self.solver
 		payoff_matrix_variables = self.generate_payoff_array(filename, variables=True, shift=shift)
 		target_sequence = []
 		for predicate in payoff_matrix_variables:
-			result = self.solver.get_variable_values(predicate)
+			result = solver.get_variable_values(predicate)
 			target_sequence += result
 		print((actual_sequence, target_sequence))
 		same = self.compare_sequences(actual_sequence, target_sequence)
@@ -142,87 +196,294 @@ class Validator:
 		if game_type in ['bs']:
 			return f"{game_type}({ms[0]},{ms[1]},{ms[2]},F,O)."
 
-	def check_constraints(self, game_type, filename, game_rules):
+	def release_solver(self):
+		"""
+		Return the Prolog thread of the current solver to the server pool.
+		"""
+		if self.solver:
+			self.solver.close()
+			self.solver = None
+
+	def read_source(self, path):
+		"""
+		Read a Prolog file the checks consult, once per validator.
+		"""
+		with self.sources_lock:
+			if path not in self.sources:
+				self.sources[path] = read_file(path)
+			return self.sources[path]
+
+	def verdict_key(self, kind, *parts, sources=()):
+		"""
+		Key of a verdict in the verdict cache, covering the contents of the Prolog files the check consults.
+		"""
+		return VerdictCache.key_for(kind, *parts, [self.read_source(path) for path in sources])
+
+	def check_constraints(self, game_type, filename, game_rules, pool=None):
 		validator = self.validators[game_type]
-		self.solver = Solver(read_file(self.solver_path), game_rules, read_file(self.strategy))
-		self.solver.consult_prolog_file(validator)
 		matrix = self.matrices[filename]
-		predicate = self.fill_numbers(matrix, game_type)
-		values = self.solver.get_variable_values(predicate)
-		if values:
-			return True
+		key = None
+		if self.verdict_cache:
+			key = self.verdict_key("constraints", game_type, VerdictCache.normalize_rules(game_rules), matrix,
+								   sources=(self.solver_path, self.strategy, validator))
+			verdict = self.verdict_cache.get(key)
+			if verdict is not None:
+				return verdict
+
+		solver = Solver(self.read_source(self.solver_path), game_rules, self.read_source(self.strategy), pool=pool)
+		try:
+			# The validator is compiled once per Prolog server and copied into the agent's module
+			solver.consult_shared_file(validator)
+			predicate = self.fill_numbers(matrix, game_type)
+			values = solver.get_variable_values(predicate)
+			# Verdicts cut short by a timeout or an inference limit in any of the solver's queries are not final
+			final = solver.prolog_thread is not None and not any(solver.violations.values())
+		finally:
+			solver.close()
+		verdict = bool(values)
+		if key and final:
+			self.verdict_cache.put(key, verdict)
+		return verdict
+
+	def check_payoff_sequence(self, filename, actual_sequence, pool=None):
+		"""
+		Check that a payoff sequence is the one tit-for-tat achieves against anti-tit-for-tat in the game, for either
+		default move.
+
+		Args:
+			filename (str): The game file name, e.g. "pd_..._1.txt".
+			actual_sequence (List[float]): The agent's payoffs.
+			pool (Optional[PrologServerPool]): The pool to lease the solver from (default is the shared pool).
+
+		Returns:
+			bool: True if the sequence matches, False otherwise.
+		"""
+		key = None
+		if self.verdict_cache:
+			key = self.verdict_key("payoff_sequence", self.matrices.get(filename), self.get_game_type(filename),
+								   actual_sequence, sources=(self.solver_path, self.general_agent_file, self.strategy))
+			verdict = self.verdict_cache.get(key)
+			if verdict is not None:
+				return verdict
+
+		solver = Solver(self.read_source(self.solver_path), self.read_source(self.general_agent_file),
+						self.read_source(self.strategy), pool=pool)
+		try:
+			payoff_matrix = self.generate_payoff_array(filename)
+			# load payoff matrix specific for the game
+			for predicate in payoff_matrix:
+				solver.apply_predicate(predicate)
+
+			same = self.compare_payoff_sequence(filename, actual_sequence, solver=solver)
+			if not same:  # may still be valid if default move different, we need to shift by two
+				same = self.compare_payoff_sequence(filename, actual_sequence, 2, solver=solver)
+			final = solver.prolog_thread is not None and not any(solver.violations.values())
+		finally:
+			solver.close()
+		if key and final:
+			self.verdict_cache.put(key, same)
+		return same
+
+	def validate_agent(self, agent_dir, agent, pool=None):
+		"""
+		Validates one auto-formalized agent.
+
+		Args:
+			agent_dir (str): The agent's tournament directory.
+			agent (str): The agent's JSON file name.
+			pool (Optional[PrologServerPool]): The pool to lease solvers from (default is the shared pool).
+
+		Returns:
+			Optional[list]: The agent's result row, or None if the file does not describe an agent.
+		"""
+		if "agent" not in agent:  # skip tournament.json
+			return None
+
+		# get filename and name
+		game_type = agent_dir[:2]
+		filename, name = self.agent_key(agent_dir, agent)
+		target_payoff = self.target_payoff_index[filename]
+
+		# parse status and rules
+		with open(os.path.join(self.agents_dir, agent_dir, agent), 'r') as file:
+			data = json.load(file)
+		print("Validating agent ", name)
+		result_row = [filename, name]
+		status = data['status']
+		result_row += [status]
+		if status != 'correct':
+			print("Agent ", name, " is ", status)
+			result_row += [False, False, False]
+			return result_row
+
+		# validate total payoff
+		total_payoff = data['total_payoff']
+		if total_payoff != target_payoff:
+			print("Agent ", name, " did not achieve target payoff")
+			tournament_status = False
+
+		# The sequence cannot be validated if the agent only logged its last round
+		elif not data.get('history_complete', True):
+			print("Agent ", name, " did not log its payoff sequence")
+			tournament_status = False
+
+		# If the total target payoff is correct, we validate the sequence
 		else:
-			return False
+			same = self.check_payoff_sequence(filename, data['payoffs'], pool)
+			print("Agent ", name, " achieved target payoff sequence:", same)
+			tournament_status = same
+		result_row += [tournament_status]
 
-	def validate_all(self):
+		# validate constraints
+		game_rules = data['game_rules']
+		constraint_status = self.check_constraints(game_type, filename, game_rules, pool)
+		print("Agent ", name, " satisfies constraints")
+		result_row += [constraint_status]
+
+		result_row += [tournament_status & constraint_status]
+		return result_row
+
+	def validate_all(self, parallelism=1, progress=True, results_path=None, resume=False):
 		"""
 		Validates auto-formalized code.
 
+		Args:
+			parallelism (int): Number of agents validated concurrently, each worker using its own Prolog server
+				(default is 1).
+			progress (bool): Whether to show a progress bar (default is True).
+			results_path (Optional[str]): JSONL file every result row is appended to as soon as the agent is validated
+				(default is None, i.e. results are only returned).
+			resume (bool): Whether to keep the rows already in `results_path` and skip validating those agents again;
+				otherwise the file is overwritten (default is False).
+
+		Returns:
+			pd.DataFrame: One result row per agent, in directory order regardless of parallelism.
+
 		Raises:
 			ValueError: If any validation fails.
 		"""
 		validator_types = list(self.validators.keys())
+		tasks = []
 		for i, agent_dir in enumerate(os.listdir(self.agents_dir)):
 			print("Instance", i, agent_dir)
 			game_type = agent_dir[:2]
 
 			if game_type in validator_types:
-				agent_path = os.listdir(os.path.join(self.agents_dir, agent_dir))
-				for agent in agent_path:
-					# get filename and name
-					filename = '_'.join(agent_dir.split('_')[:3]) + '.txt'
-					name = agent[6:-5]
-					target_payoff = self.target_payoffs.loc[
-						self.target_payoffs['Game File'] == filename, 'Row Player Payoff Sum'].values[0]
-
-					# parse status and rules
-					with open(os.path.join(self.agents_dir, agent_dir, agent), 'r') as file:
-						if "agent" in agent:  # skip tournament.json
-							print("Validating agent ", name)
-							result_row = [filename, name]
-							data = json.load(file)
-							status = data['status']
-							result_row += [status]
-							if status != 'correct':
-								print("Agent ", name, " is ", status)
-								result_row += [False, False, False]
-								self.results.append(result_row)
-								continue
-
-							# validate total payoff
-							total_payoff = data['total_payoff']
-							if total_payoff != target_payoff:
-								print("Agent ", name, " did not achieve target payoff")
-								tournament_status = False
-
-							# If the total target payoff is correct, we validate the sequence
-							else:
-								actual_sequence = data['payoffs']
-								self.solver = Solver(read_file(self.solver_path), read_file(self.general_agent_file),
-													 read_file(self.strategy))
-								payoff_matrix = self.generate_payoff_array(filename)
-								# load payoff matrix specific for the game
-								for predicate in payoff_matrix:
-									self.solver.apply_predicate(predicate)
-
-								same = self.compare_payoff_sequence(filename, actual_sequence)
-								if not same: # may still be valid if default move different, we need to shift by two
-									same = self.compare_payoff_sequence(filename, actual_sequence,2)
-								print("Agent ", name, " achieved target payoff sequence:", same)
-								tournament_status = same
-							result_row += [tournament_status]
-
-							# validate constraints
-							game_rules = data['game_rules']
-							constraint_status = self.check_constraints(game_type, filename, game_rules)
-							print("Agent ", name, " satisfies constraints")
-							result_row += [constraint_status]
-
-							result_row += [tournament_status&constraint_status]
-							self.results.append(result_row)
-
+				for agent in os.listdir(os.path.join(self.agents_dir, agent_dir)):
+					tasks.append((agent_dir, agent))
+
+		# Rows recorded by an earlier, interrupted run
+		rows = {}
+		if results_path and resume and os.path.exists(results_path):
+			for row in self.load_results(results_path).itertuples(index=False):
+				rows[(row.filename, row.agent_name)] = list(row)
+			print("Resuming with", len(rows), "validated agents")
+		elif results_path:
+			open(results_path, 'w').close()
+
+		pending = [task for task in tasks if self.agent_key(*task) not in rows]
+		with open(results_path, 'a') if results_path else contextlib.nullcontext() as results_file:
+			def record(row):
+				rows[(row[0], row[1])] = row
+				if results_file:
+					results_file.write(json.dumps(dict(zip(self.result_headers, row)), default=str) + "\n")
+					results_file.flush()
+
+			if parallelism > 1:
+				self._validate_in_parallel(pending, parallelism, progress, record)
+			else:
+				for agent_dir, agent in with_progress(pending, len(pending), progress):
+					row = self.validate_agent(agent_dir, agent)
+					if row is not None:
+						record(row)
+
+		# Order the rows like the agents, whether they were validated now or resumed
+		keys = list(dict.fromkeys(self.agent_key(*task) for task in tasks))
+		self.results += [rows.pop(key) for key in keys if key in rows] + list(rows.values())
+		self.release_solver()
 		df = pd.DataFrame(self.results, columns=self.result_headers)
 		return df
 
+	def agent_key(self, agent_dir, agent):
+		"""
+		Get the (game file, agent name) pair identifying an agent's result row.
+
+		Args:
+			agent_dir (str): The agent's tournament directory.
+			agent (str): The agent's JSON file name.
+
+		Returns:
+			Tuple[str, str]: The game file and agent name.
+		"""
+		return '_'.join(agent_dir.split('_')[:3]) + '.txt', agent[6:-5]
+
+	def load_results(self, results_path):
+		"""
+		Reads result rows streamed by `validate_all`.
+
+		Args:
+			results_path (str): The JSONL results file.
+
+		Returns:
+			pd.DataFrame: The result rows. A partially written last line is ignored.
+		"""
+		records = []
+		with open(results_path, 'r') as file:
+			for line in file:
+				try:
+					records.append(json.loads(line))
+				except json.JSONDecodeError:
+					logger.warning(f"Skipping a malformed line in {results_path}.")
+		return pd.DataFrame(records, columns=self.result_headers)
+
+	def _validate_in_parallel(self, tasks, parallelism, progress, record):
+		"""
+		Validates agents concurrently, each worker thread leasing solvers from its own Prolog server.
 
+		Args:
+			tasks (List[Tuple[str, str]]): (agent directory, agent file) pairs.
+			parallelism (int): Number of worker threads and Prolog servers.
+			progress (bool): Whether to show a progress bar.
+			record (Callable[[list], None]): Called with every result row, in completion order.
+		"""
+		pools = [PrologServerPool(max_servers=1) for _ in range(parallelism)]
+		worker_ids = itertools.count()
+		worker = threading.local()
+
+		def assign_pool():
+			worker.pool = pools[next(worker_ids)]
+
+		def validate(agent_dir, agent):
+			try:
+				return self.validate_agent(agent_dir, agent, worker.pool)
+			except Exception as e:
+				logger.error(f"Validation of {agent} in {agent_dir} failed: {e}")
+				raise
+
+		try:
+			with ThreadPoolExecutor(max_workers=parallelism, initializer=assign_pool) as executor:
+				futures = [executor.submit(validate, agent_dir, agent) for agent_dir, agent in tasks]
+				for future in with_progress(as_completed(futures), len(futures), progress):
+					row = future.result()
+					if row is not None:
+						record(row)
+		finally:
+			for pool in pools:
+				pool.shutdown()
+
+
+def with_progress(iterable, total, enabled=True):
+	"""
+	Wrap an iterable in a tqdm progress bar if tqdm is installed and the bar is enabled.
+
+	Args:
+		iterable (Iterable): The iterable.
+		total (int): The number of items.
+		enabled (bool): Whether to show the bar (default is True).
 
+	Returns:
+		Iterable: The wrapped or original iterable.
+	"""
+	if enabled and tqdm is not None:
+		return tqdm(iterable, total=total, desc="Validating agents")
+	return iterable
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+
+class VerdictCache:
+	"""
+	A persistent, SQLite-backed cache of validation verdicts.
+
+	Verdicts are keyed on a hash of everything they depend on, e.g. the game type, the normalized game rules, the
+	payoff matrix and the sources of the checking program, so repeat validations need no solver at all.
+
+	Attributes:
+		path (str): Path of the SQLite database.
+	"""
+
+	def __init__(self, path: str = "LOGS/verdict_cache.sqlite"):
+		"""
+		Open (or create) the cache.
+
+		Args:
+			path (str): Path of the SQLite database (default is "LOGS/verdict_cache.sqlite").
+		"""
+		self.path = path
+		directory = os.path.dirname(path)
+		if directory and not os.path.exists(directory):
+			os.makedirs(directory)
+
+		self._lock = threading.Lock()
+		self._connection = sqlite3.connect(path, check_same_thread=False)
+		self._connection.execute("CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, verdict INTEGER)")
+		self._connection.commit()
+		self.hits = 0
+		self.misses = 0
+
+	@staticmethod
+	def normalize_rules(rules: str) -> str:
+		"""
+		Normalize Prolog rules so that textually equivalent rule sets hash the same: full-line comments and blank lines
+		are dropped, and runs of whitespace are collapsed.
+
+		Args:
+			rules (str): The Prolog rules.
+
+		Returns:
+			str: The normalized rules.
+		"""
+		lines = (line.strip() for line in (rules or "").splitlines())
+		return "\n".join(re.sub(r"\s+", " ", line) for line in lines if line and not line.startswith("%"))
+
+	@staticmethod
+	def key_for(kind: str, *parts: Any) -> str:
+		"""
+		Compute the key of a verdict.
+
+		Args:
+			kind (str): The kind of check, e.g. "constraints".
+			*parts (Any): JSON-serializable values the verdict depends on.
+
+		Returns:
+			str: The hexadecimal SHA-256 digest.
+		"""
+		return hashlib.sha256(json.dumps([kind, *parts], sort_keys=True).encode()).hexdigest()
+
+	def get(self, key: str) -> Optional[bool]:
+		"""
+		Look up a verdict.
+
+		Args:
+			key (str): The verdict key.
+
+		Returns:
+			Optional[bool]: The verdict, or None on a miss.
+		"""
+		with self._lock:
+			row = self._connection.execute("SELECT verdict FROM verdicts WHERE key = ?", (key,)).fetchone()
+			if row is None:
+				self.misses += 1
+				return None
+			self.hits += 1
+			return bool(row[0])
+
+	def put(self, key: str, verdict: bool) -> None:
+		"""
+		Store a verdict.
+
+		Args:
+			key (str): The verdict key.
+			verdict (bool): The verdict.
+		"""
+		with self._lock:
+			self._connection.execute("INSERT OR REPLACE INTO verdicts VALUES (?, ?)", (key, int(bool(verdict))))
+			self._connection.commit()
+
+	def metrics(self) -> Dict[str, int]:
+		"""
+		Get the cache's size and hit/miss counters.
+
+		Returns:
+			Dict[str, int]: Cache metrics.
+		"""
+		with self._lock:
+			entries = self._connection.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+			return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+	def close(self) -> None:
+		"""
+		Close the database connection.
+		"""
+		with self._lock:
+			self._connection.close()